@@ -25,9 +25,29 @@ default:
     servers:
       default:
         server_url: "{DEFAULT_OPENSHIFT_URL}"
+        kind: "OpenShiftClient"  # RestOpenShiftClient talks to API server directly instead of spawning oc
+        cache: false  # RestOpenShiftClient only; keep routes, secrets and configmaps in memory updated by watch
     projects:
       threescale:
         name: "{DEFAULT_OPENSHIFT_THREESCALE_PROJECT}"
+  threescale_cache:  # cache GET requests of threescale client fixture, writes of the same client invalidate it
+    enabled: false  # polling of changes done by 3scale itself doesn't work within ttl
+    ttl: 60  # seconds
+  deletion_queue:  # 3scale objects are deleted in background while next modules run
+    enabled: true  # false deletes everything immediately in the finalizers
+    max_workers: 4
+  gateway_pool:  # self-managed gateways reused by modules needing own gateway
+    max_idle: 3  # how many idle gateways are kept running, 0 disables reuse
+  httpx_transports:  # connection pools shared by httpx clients of the same gateway route
+    enabled: false  # true makes clients reuse keep-alive connections across applications and tests
+    max_connections: 100  # per route
+    max_keepalive_connections: 20  # per route
+    keepalive_expiry: 5  # seconds
+  discovery_cache:  # values discovered from openshift are cached on disk and shared by all pytest processes
+    enabled: false  # the cache contains admin and master credentials
+    ttl: 600  # seconds
+    refresh: false  # force new discovery, e.g. _3SCALE_TESTS_discovery_cache__refresh=true
+    path: ""  # directory for the cache, must be accessible only by the user, defaults to <tmpdir>/3scale-tests-<user>
   rhsso:
     test_user:
       username: testUser
@@ -38,6 +58,27 @@ default:
     https: http://tinyproxy-service.tiny-proxy.svc:8888
   reporting:
     print_app_logs: true # whether to print application logs during testing
+    gateway_logs:  # logs of gateways in OpenShift are followed in background instead of fetched in every test phase
+      follow: true  # if false, logs are fetched with oc logs in every test phase
+      max_lines: 100000  # lines per pod kept in memory
+      section_limit: 65536  # characters of the logs in single report section, older lines are cut off
+      path: ""  # directory for complete logs rewritten every session, defaults to <tmpdir>/3scale-tests/gateway-logs
+    request_timing: true  # measure requests of api clients, percentiles are added to junit properties
+    correlation: false  # stamp requests of api clients with X-Request-Id and testctx-request-id jaeger baggage, needed by testsuite.correlation
+    latency_attribution:  # split latency of requests into gateway, upstream and client time using APIcast access logs
+      enabled: false  # adds X-Request-Id to requests and logging policy with parsed access log format to services
+      outlier_factor: 3  # requests slower than outlier_factor * median of the module are reported
+      outlier_min_ms: 200  # requests faster than this are never reported as outliers
+      path: ""  # file the report is written to as json
+    httpx_bodies:  # request and response bodies logged by httpx clients
+      limit: 1024  # bytes of the body in the log, longer bodies are truncated and identified by sha256
+      spill_on_failure: false  # write full bodies to a file per test, kept only for failed tests
+      path: ""  # directory for the files, defaults to <tmpdir>/3scale-tests/httpx
+    tracer:  # count and time calls to 3scale admin API, oc, RHSSO and toolbox per fixture and test
+      enabled: false
+      top: 20  # calls and fixtures/tests printed in the terminal summary
+      path: ""  # file the full report is written to as json
+      speedscope: ""  # file the timeline is written to, open it in https://www.speedscope.app
     testsuite_properties:
       polarion_project_id: PROJECTID
       polarion_response_myteamsname: teamname
@@ -111,6 +152,9 @@ development:
     url: redis://apicast-testing-redis:6379/1
   prometheus:
     url: "{PROMETHEUS_URL}"
+    direct_scrape:  # scrape /metrics of 3scale pods through OpenShift API instead of waiting for Prometheus scrapes
+      enabled: false
+      ports: {}  # metrics ports by container name, when the container doesn't have port named *metrics*
   toolbox:
     # rpm/gem/podman; rpm = command from rpm package, gem = command from gem
     # 'ruby_version' should be defined for "gem" option
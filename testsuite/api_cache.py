@@ -0,0 +1,87 @@
+"""
+Read-through cache of 3scale admin API responses
+
+Test helpers read the same proxies, keys, metrics and plans over and over.
+CachedThreeScaleClient memoizes GET responses per url and query for a limited
+time. Any write issued by the same client (create, update, delete, deploy...)
+drops the cached entries, changes done by anybody else are visible after TTL
+expires. Polling for changes done asynchronously by 3scale doesn't work within
+TTL, therefore the cache is opt-in.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urljoin
+
+import requests
+from threescale_api.client import RestApiClient, ThreeScaleClient
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# Responses of these are never cached as they change on their own
+UNCACHED = ("/stats/", "/analytics/", "/usage")
+
+
+class CachingRestApiClient(RestApiClient):
+    """RestApiClient caching successful GET responses"""
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, url: str, token: str, throws: bool = True, ssl_verify: bool = True, ttl: float = 60) -> None:
+        super().__init__(url=url, token=token, throws=throws, ssl_verify=ssl_verify)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cache: Dict[Tuple, Tuple[float, requests.Response]] = {}
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    # pylint: disable=too-many-arguments
+    def request(self, method="GET", url=None, path="", params: Optional[dict] = None, headers: Optional[dict] = None,
+                throws=None, **kwargs):
+        if method != "GET":
+            self.invalidate()
+            return super().request(method, url, path, params, headers, throws, **kwargs)
+
+        full_url = url if url else urljoin(self.url, path)
+        if headers or kwargs or any(i in full_url for i in UNCACHED):
+            return super().request(method, url, path, params, headers, throws, **kwargs)
+
+        key = (full_url, tuple(sorted((params or {}).items())))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < self.ttl:
+                self.stats["hits"] += 1
+                return cached[1]
+            self.stats["misses"] += 1
+
+        response = super().request(method, url, path, dict(params or {}), headers, throws)
+        if response.ok:
+            with self._lock:
+                self._cache[key] = (time.monotonic(), response)
+        return response
+
+    def invalidate(self):
+        """Drops all the cached responses"""
+        with self._lock:
+            if self._cache:
+                self.stats["invalidations"] += 1
+                self._cache.clear()
+
+
+class CachedThreeScaleClient(ThreeScaleClient):
+    """ThreeScaleClient with read-through cache of GET requests"""
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, url: str, token: str, throws: bool = True, ssl_verify: bool = True, wait: int = -1,
+                 ttl: float = 60) -> None:
+        super().__init__(url, token, throws=throws, ssl_verify=ssl_verify, wait=wait)
+        self._caching_rest = CachingRestApiClient(url=url, token=token, throws=throws, ssl_verify=ssl_verify, ttl=ttl)
+        self._rest = self._caching_rest
+
+    @property
+    def cache_stats(self) -> Dict[str, int]:
+        """Counters of cache hits, misses and invalidations"""
+        return self._caching_rest.stats
+
+    def log_stats(self):
+        """Logs the counters"""
+        log.info("3scale API cache: %s", ", ".join(f"{k}={v}" for k, v in self.cache_stats.items()))
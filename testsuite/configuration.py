@@ -7,6 +7,7 @@ from weakget import weakget
 from testsuite.config import settings
 from testsuite.capabilities import Singleton
 from testsuite.openshift.client import OpenShiftClient
+from testsuite.openshift.rest import RestOpenShiftClient
 
 
 def openshift(server="default", project="threescale") -> OpenShiftClient:
@@ -18,9 +19,9 @@ def openshift(server="default", project="threescale") -> OpenShiftClient:
     except KeyError:
         server = {}
 
-    return OpenShiftClient(project_name=project_name,
-                           server_url=server.get("server_url", None),
-                           token=server.get("token", None))
+    kind = server.get("kind", "OpenShiftClient")
+    params = {k: v for k, v in server.items() if k != "kind"}
+    return SettingsParser().process(kind, **params, project_name=project_name)
 
 
 def call(method, **kwargs):
@@ -71,3 +72,4 @@ class SettingsParser(metaclass=Singleton):
 
 
 SettingsParser().register_kind(provider=OpenShiftClient)
+SettingsParser().register_kind(provider=RestOpenShiftClient)
@@ -0,0 +1,183 @@
+"""
+Following single request from the client through APIcast to the upstream
+
+Every request of the instrumented api clients carries unique id (see
+testsuite.timing) in X-Request-Id header and as testctx-request-id Jaeger
+baggage. trace_request() gathers the client timing, the gateway log lines and
+the Jaeger spans of the request in one call and puts them on single timeline.
+Gateway log lines can be matched only if the gateway logs the request id, e.g.
+with log_parser.logging_policy(). Clocks of the client and the cluster are not
+synchronized, so the offsets of the gateway events are approximate.
+
+Usage:
+    for timing in slow_requests(0.5, request.node.nodeid):
+        print(trace_request(timing.request_id, staging_gateway, jaeger, jaeger_randomized_name))
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from testsuite.gateway_logs import gateway_log
+from testsuite.gateways.apicast.log_parser import parse_access_line
+from testsuite.timing import REQUEST_ID_BAGGAGE, RequestTiming, collector as request_timing
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# How far back the gateway logs are searched if the request wasn't measured by the client
+LOG_WINDOW = timedelta(minutes=10)
+
+
+class TimelineEvent:  # pylint: disable=too-few-public-methods
+    """Single interval of the request timeline, offsets and durations in milliseconds"""
+
+    def __init__(self, source: str, name: str, start: float, duration: float) -> None:
+        self.source = source
+        self.name = name
+        self.start = start
+        self.duration = duration
+
+    def __repr__(self):
+        return f"TimelineEvent({self.source}, {self.name}, +{self.start:.1f}ms, {self.duration:.1f}ms)"
+
+
+class RequestTrace:
+    """Everything known about single request"""
+
+    def __init__(self, request_id: str, timing: Optional[RequestTiming] = None,
+                 log_lines: Optional[List[str]] = None, spans: Optional[List[Dict[str, Any]]] = None) -> None:
+        self.request_id = request_id
+        self.timing = timing
+        self.log_lines = log_lines or []
+        self.spans = spans or []
+        self.errors: List[str] = []
+
+    @property
+    def access(self) -> Optional[Dict[str, Any]]:
+        """Parsed access log row of the request"""
+        for line in self.log_lines:
+            row = parse_access_line(line)
+            if row is not None:
+                return row
+        return None
+
+    def _origin(self) -> Optional[float]:
+        """Wall clock time in seconds all the offsets are relative to"""
+        if self.timing is not None and self.timing.started is not None:
+            return self.timing.started
+        if self.spans:
+            return min(span["startTime"] for span in self.spans) / 1_000_000
+        return None
+
+    def _client(self) -> List[TimelineEvent]:
+        timing = self.timing
+        if timing is None:
+            return []
+        events = []
+        offset = 0.0
+        for phase in ("connect", "tls"):
+            value = getattr(timing, phase)
+            if value is not None:
+                events.append(TimelineEvent("client", phase, offset, value * 1000))
+                offset += value * 1000
+        if timing.ttfb is not None:
+            events.append(TimelineEvent("client", "ttfb", 0, timing.ttfb * 1000))
+        if timing.total is not None:
+            events.append(TimelineEvent("client", "total", 0, timing.total * 1000))
+        return events
+
+    def _gateway(self) -> List[TimelineEvent]:
+        """Gateway and upstream from the access log, centered within the client time"""
+        access = self.access
+        if access is None or access["request_time"] is None:
+            return []
+        gateway = access["request_time"] * 1000
+        total = self.timing.total * 1000 if self.timing is not None and self.timing.total is not None else gateway
+        start = max(0.0, (total - gateway) / 2)
+        events = [TimelineEvent("access log", "gateway", start, gateway)]
+        if access["upstream_response_time"] is not None:
+            upstream = access["upstream_response_time"] * 1000
+            name = f"upstream {access['upstream_addr']}" if access["upstream_addr"] else "upstream"
+            events.append(TimelineEvent("access log", name, start + max(0.0, gateway - upstream), upstream))
+        return events
+
+    def timeline(self) -> List[TimelineEvent]:
+        """Client phases, Jaeger spans (policy phases, upstream) or access log times ordered by start"""
+        origin = self._origin()
+        events = self._client()
+        if self.spans and origin is not None:
+            for span in self.spans:
+                events.append(TimelineEvent("jaeger", span["operationName"],
+                                            (span["startTime"] / 1_000_000 - origin) * 1000, span["duration"] / 1000))
+        else:
+            events.extend(self._gateway())
+        return sorted(events, key=lambda event: (event.start, -event.duration))
+
+    def format(self) -> str:
+        """Human readable timeline with the log lines"""
+        lines = [f"request {self.request_id}"]
+        if self.timing is not None:
+            timing = self.timing
+            lines.append(f"  {timing.method} {timing.endpoint} -> {timing.status} ({timing.nodeid})")
+        for event in self.timeline():
+            lines.append(f"  +{event.start:9.1f}ms {event.duration:9.1f}ms  {event.source:<10} {event.name}")
+        if self.log_lines:
+            lines.append("  gateway log:")
+            lines.extend(f"    {line}" for line in self.log_lines)
+        lines.extend(f"  unavailable: {error}" for error in self.errors)
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.format()
+
+
+def _timing(request_id: str) -> Optional[RequestTiming]:
+    for timing in request_timing.timings():
+        if timing.request_id == request_id:
+            return timing
+    return None
+
+
+def trace_request(request_id: str, gateway=None, jaeger=None, jaeger_service: Optional[str] = None) -> RequestTrace:
+    """
+    Gathers client timing, gateway log lines and Jaeger spans of the request
+    Sources that fail are listed in errors of the result, so it can be used while handling failures.
+    Args:
+        :param request_id: Value of X-Request-Id of the request
+        :param gateway: Gateway the request went through, its logs are searched
+        :param jaeger: Jaeger client, spans are fetched if jaeger_service is set too
+        :param jaeger_service: Service name of APIcast in Jaeger
+    """
+    trace = RequestTrace(request_id, _timing(request_id))
+    if gateway is not None:
+        if trace.timing is not None and trace.timing.started is not None:
+            since = datetime.utcfromtimestamp(trace.timing.started) - timedelta(seconds=1)
+        else:
+            since = datetime.utcnow() - LOG_WINDOW
+        try:
+            trace.log_lines = [line for line in gateway_log(gateway, since).splitlines() if request_id in line]
+        # pylint: disable=broad-except
+        except Exception as error:
+            trace.errors.append(f"gateway logs: {error}")
+    if jaeger is not None and jaeger_service is not None:
+        try:
+            trace.spans = jaeger.request_spans(jaeger_service, REQUEST_ID_BAGGAGE, request_id)
+        # pylint: disable=broad-except
+        except Exception as error:
+            trace.errors.append(f"jaeger: {error}")
+    log.debug("Traced request %s: %s", request_id, trace)
+    return trace
+
+
+def slow_requests(threshold: float, nodeid: Optional[str] = None) -> List[RequestTiming]:
+    """Requests with id that took longer than threshold seconds, the slowest first"""
+    timings = [i for i in request_timing.timings()
+               if i.request_id is not None and i.total is not None and i.total > threshold
+               and (nodeid is None or i.nodeid == nodeid)]
+    return sorted(timings, key=lambda timing: timing.total or 0, reverse=True)
+
+
+def failed_requests(nodeid: Optional[str] = None, min_status: int = 500) -> List[RequestTiming]:
+    """Requests with id that got response with status min_status or higher"""
+    return [i for i in request_timing.timings()
+            if i.request_id is not None and i.status is not None and i.status >= min_status
+            and (nodeid is None or i.nodeid == nodeid)]
@@ -0,0 +1,98 @@
+"""
+Deferred deletion of 3scale objects
+
+Finalizers enqueue deletions instead of waiting for them, background workers
+drain the queue while the next modules are already running. Deletions from the
+same scope (module) are executed in the order they were enqueued, consecutive
+deletions of the same kind (e.g. all the applications of a module) are
+independent and they run concurrently. Failures are reported at the end.
+"""
+import logging
+import threading
+import warnings
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class _Stages:  # pylint: disable=too-few-public-methods
+    """Ordering of deletions within one scope"""
+
+    def __init__(self) -> None:
+        self.kind: Optional[str] = None
+        self.current: List[Future] = []
+        self.previous: List[Future] = []
+
+    def add(self, kind: str) -> List[Future]:
+        """Returns deletions that have to finish before the next one of given kind"""
+        if kind != self.kind:
+            self.kind = kind
+            self.previous = self.current
+            self.current = []
+        return self.previous
+
+
+class DeletionQueue:
+    """
+    Deletes objects in background
+
+    Usage:
+        deletion_queue.defer(request.node.nodeid, "application", app.delete)
+    """
+
+    def __init__(self, max_workers: int = 4, enabled: bool = True) -> None:
+        """
+        Args:
+            :param max_workers: Number of deletions running at once
+            :param enabled: If False, deletions are done immediately
+        """
+        self.enabled = enabled
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="deletion")
+        self._lock = threading.Lock()
+        self._scopes: Dict[str, _Stages] = {}
+        self._futures: List[Future] = []
+        self.failures: List[Tuple[str, Exception]] = []
+
+    def defer(self, scope: str, kind: str, func: Callable, *args, description: Optional[str] = None):
+        """
+        Enqueues deletion
+        Args:
+            :param scope: Deletions of the same scope are ordered, e.g. module nodeid
+            :param kind: Kind of the object, consecutive deletions of the same kind may run concurrently
+            :param func: Callable doing the deletion
+            :param description: Identification of the object in the report
+        """
+        description = description or kind
+        if not self.enabled:
+            func(*args)
+            return
+
+        with self._lock:
+            previous = self._scopes.setdefault(scope, _Stages()).add(kind)
+            future = self._pool.submit(self._delete, previous, description, func, *args)
+            self._scopes[scope].current.append(future)
+            self._futures.append(future)
+
+    def _delete(self, previous: List[Future], description: str, func: Callable, *args):
+        wait(previous)
+        try:
+            func(*args)
+        except Exception as err:  # pylint: disable=broad-except
+            log.debug("Deferred deletion of %s failed: %s", description, err)
+            with self._lock:
+                self.failures.append((description, err))
+
+    def join(self):
+        """Waits for all the deletions enqueued so far"""
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures)
+
+    def barrier(self):
+        """Waits for all the deletions and reports failures, meant to be called at the end of the session"""
+        self.join()
+        self._pool.shutdown()
+        if self.failures:
+            report = "\n".join(f"  {description}: {err}" for description, err in self.failures)
+            warnings.warn(f"{len(self.failures)} deferred deletion(s) failed:\n{report}")
@@ -0,0 +1,231 @@
+"""
+Pytest plugin scheduling test modules across xdist workers by their historical duration
+
+Durations of setup, call and teardown of every test are stored in the pytest
+cache after each run. With --duration-aware the tests are distributed by
+modules, so module scoped fixtures are set up only once, and the modules are
+handed out by their predicted duration, the longest first. Modules without
+history are predicted from the number of their tests and their expected waits
+(see testsuite.wait_scheduler). Disruptive modules are kept apart, they are
+handed out to single worker once all the other modules are finished, the other
+workers stop after their work. Predicted and actual makespan of the run are
+printed at the end of the session.
+"""
+import ast
+import functools
+import logging
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytest
+
+from testsuite.wait_scheduler import WaitAwareScheduling
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+CACHE_KEY = "3scale/durations"
+PHASES = ("setup", "call", "teardown")
+# Weight of the latest run in the stored durations, the rest is the history
+LATEST_WEIGHT = 0.5
+# Duration of a test without history when there is no history at all
+DEFAULT_DURATION = 5.0
+
+
+class DurationStore:
+    """
+    Durations of the test phases by nodeid, exponentially averaged over the runs
+
+    Usage:
+        store = DurationStore.load(config)
+        store.record(report.nodeid, report.when, report.duration)
+        store.save(config)
+    """
+
+    def __init__(self, history: Optional[Dict[str, Dict[str, float]]] = None) -> None:
+        self.history = history or {}
+        self.latest: Dict[str, Dict[str, float]] = {}
+
+    @classmethod
+    def load(cls, config) -> "DurationStore":
+        """Durations stored in the pytest cache, empty if the cache is disabled"""
+        cache = getattr(config, "cache", None)
+        return cls(cache.get(CACHE_KEY, {}) if cache is not None else {})
+
+    def save(self, config):
+        """Merges durations of this run into the history and stores it in the pytest cache"""
+        cache = getattr(config, "cache", None)
+        if cache is None or not self.latest:
+            return
+        for nodeid, phases in self.latest.items():
+            previous = self.history.get(nodeid, {})
+            self.history[nodeid] = {
+                phase: LATEST_WEIGHT * value + (1 - LATEST_WEIGHT) * previous[phase] if phase in previous else value
+                for phase, value in phases.items()}
+        cache.set(CACHE_KEY, self.history)
+
+    def record(self, nodeid: str, phase: str, duration: float):
+        """Stores duration of the test phase of this run"""
+        self.latest.setdefault(nodeid, {})[phase] = duration
+
+    def duration(self, nodeid: str) -> Optional[float]:
+        """Total predicted duration of the test, None if it has no history"""
+        phases = self.history.get(nodeid)
+        return sum(phases.get(i, 0.0) for i in PHASES) if phases else None
+
+    @functools.cached_property
+    def typical(self) -> float:
+        """Median duration of the tests with history, used for the tests without it"""
+        durations = [self.duration(i) or 0.0 for i in self.history]
+        return statistics.median(durations) if durations else DEFAULT_DURATION
+
+
+@functools.lru_cache(maxsize=None)
+def is_disruptive(path: Path) -> bool:
+    """True if the module uses pytest.mark.disruptive anywhere"""
+    try:
+        tree = ast.parse(path.read_text(encoding="utf-8"))
+    except (OSError, SyntaxError, ValueError):
+        return False
+    return any(isinstance(node, ast.Attribute) and node.attr == "disruptive"
+               and isinstance(node.value, ast.Attribute) and node.value.attr == "mark"
+               for node in ast.walk(tree))
+
+
+def makespan(durations: List[float], workers: int) -> float:
+    """Makespan of the durations handed out in the given order to the first free worker"""
+    loads = [0.0] * max(workers, 1)
+    for duration in durations:
+        loads[loads.index(min(loads))] += duration
+    return max(loads)
+
+
+class DurationAwareScheduling(WaitAwareScheduling):  # pylint: disable=abstract-method
+    """
+    Distributes modules to the workers, the longest predicted duration first, disruptive modules last on one worker
+    """
+
+    # pylint: disable=redefined-outer-name
+    def __init__(self, config, log=None, store: Optional[DurationStore] = None):
+        super().__init__(config, log)
+        self.store = store or DurationStore.load(config)
+        self.predictions: Dict[str, float] = {}
+        self.predicted: Optional[float] = None
+        self.started = time.monotonic()
+        self.finished: Dict[str, float] = {}
+        self.disruptive_node = None
+
+    def predict(self, scope: str, nodeids: List[str]) -> float:
+        """Predicted duration of the work unit in seconds"""
+        known = [self.store.duration(i) for i in nodeids]
+        if all(i is None for i in known):
+            # module without history
+            return len(known) * self.store.typical + self.profile(scope).seconds
+        return sum(self.store.typical if i is None else i for i in known)
+
+    def disruptive(self, scope: str) -> bool:
+        """True if the work unit has to run alone"""
+        return is_disruptive(self.rootpath / scope)
+
+    def _priority(self, scope: str):
+        return self.predictions.get(scope, 0.0)
+
+    def _next_scope(self, node) -> Optional[str]:
+        regular = [i for i in self.workqueue if not self.disruptive(i)]
+        if regular:
+            return max(regular, key=self._priority)
+        # disruptive modules run one after another on the first worker that runs out of regular work,
+        # the other workers finish their work and stop, the disruptive modules wait for them
+        if self.disruptive_node is None:
+            self.disruptive_node = node
+        if node is not self.disruptive_node:
+            node.shutdown()
+            return None
+        if not self._others_idle(node):
+            return None
+        return max(self.workqueue, key=self._priority)
+
+    def _others_idle(self, node) -> bool:
+        """True if no other node has pending tests, nodes that went down are removed from assigned_work"""
+        return not any(self._pending_of(work) for other, work in self.assigned_work.items() if other is not node)
+
+    def _resume_disruptive(self):
+        """Hands out the disruptive modules held back until the other nodes finish"""
+        node = self.disruptive_node
+        if node is not None and node in self.assigned_work and self.workqueue:
+            self._reschedule(node)
+
+    def schedule(self):
+        if self.collection is None and self.collection_is_completed and self.registered_collections:
+            self._predict(next(iter(self.registered_collections.values())))
+        super().schedule()
+
+    def _predict(self, collection: List[str]):
+        """Predicts duration of all the work units and makespan of the whole run"""
+        scopes: Dict[str, List[str]] = {}
+        for nodeid in collection:
+            scopes.setdefault(self._split_scope(nodeid), []).append(nodeid)
+        self.predictions = {scope: self.predict(scope, nodeids) for scope, nodeids in scopes.items()}
+        regular = sorted((value for scope, value in self.predictions.items() if not self.disruptive(scope)),
+                         reverse=True)
+        disruptive = sum(value for scope, value in self.predictions.items() if self.disruptive(scope))
+        self.predicted = makespan(regular, len(self.nodes)) + disruptive
+        self.started = time.monotonic()
+
+    def mark_test_complete(self, node, item_index, duration=0):
+        self.finished[node.gateway.id] = time.monotonic() - self.started
+        super().mark_test_complete(node, item_index, duration)
+        if node is not self.disruptive_node:
+            self._resume_disruptive()
+
+    def remove_node(self, node):
+        crashitem = super().remove_node(node)
+        if node is self.disruptive_node:
+            self.disruptive_node = None
+        self._resume_disruptive()
+        return crashitem
+
+
+_store: Optional[DurationStore] = None  # pylint: disable=invalid-name
+_scheduler: Optional[DurationAwareScheduling] = None  # pylint: disable=invalid-name
+
+
+def pytest_configure(config):
+    """Loads the stored durations, only the controller (or single process) records them"""
+    global _store  # pylint: disable=global-statement
+    if not hasattr(config, "workerinput"):
+        _store = DurationStore.load(config)
+
+
+def pytest_runtest_logreport(report):
+    """Records duration of the test phase"""
+    if _store is not None:
+        _store.record(report.nodeid, report.when, report.duration)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_make_scheduler(config, log):  # pylint: disable=redefined-outer-name
+    """Duration aware scheduler when --duration-aware is set"""
+    global _scheduler  # pylint: disable=global-statement
+    if not config.getoption("--duration-aware", default=False):
+        return None
+    _scheduler = DurationAwareScheduling(config, log, _store)
+    return _scheduler
+
+
+def pytest_sessionfinish(session):
+    """Stores the durations of this run"""
+    if _store is not None:
+        _store.save(session.config)
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Prints predicted and actual makespan of the duration aware run"""
+    if _scheduler is None or _scheduler.predicted is None or not _scheduler.finished:
+        return
+    finished = sorted(_scheduler.finished.values())
+    terminalreporter.section("duration aware scheduling")
+    terminalreporter.write_line(
+        f"predicted makespan {_scheduler.predicted:.0f}s, actual {finished[-1]:.0f}s, "
+        f"workers finished at {', '.join(f'{i:.0f}s' for i in finished)}")
@@ -16,19 +16,31 @@ openshift deployment. That's true for both files and env loader (order of env
 loader is defined in config/.env file). At same moment this has to be
 overwritten by values from config and env. Therefore the update at the end of
 load() is doubled.
+
+Discovery is expensive and it runs in every pytest process including each
+xdist worker, therefore the discovered values can be cached on disk for
+`discovery_cache.ttl` seconds. The cache holds credentials, so it is opt-in
+and it is used only from a directory no other user can access. The cache is
+keyed by server url, project and fingerprint of the credentials,
+`discovery_cache.refresh` forces new discovery.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import getpass
+import hashlib
+import json
 import logging
 import os
 import os.path
+import tempfile
+import time
 
 from packaging.version import Version, InvalidVersion
 
-import yaml
-
 from openshift import OpenShiftPythonException
-from testsuite.openshift.client import OpenShiftClient
+from testsuite.configuration import SettingsParser
+from testsuite.openshift.objects import routes_for_service
 
 identifier = "threescale"  # pylint: disable=invalid-name
 log = logging.getLogger(__name__)  # pylint: disable=invalid-name
@@ -63,120 +75,212 @@ def _guess_version(ocp):
 
 def _apicast_image(ocp):
     """Find source of amp-apicast image"""
-    lookup = ocp.do_action("get", ["dc/apicast-production", "-o", "yaml"])
-    lookup = yaml.safe_load(lookup.out())
+    lookup = ocp.get_resource("dc", "apicast-production")
     return lookup["spec"]["template"]["spec"]["containers"][0]["image"]
 
 
-def _rhsso_password(server_url, token):
+def _catalogsource(ocp):
+    """Find image of the catalogsource 3scale was installed from"""
+    try:
+        return ocp.do_action("get", ["catalogsource", "-o=jsonpath={.items[0].spec.image}"]).out().strip()
+    except OpenShiftPythonException:
+        return "UNKNOWN"
+
+
+def _openshift(ocp_setup, project):
+    """Client of the configured kind for the project"""
+    return SettingsParser().process(
+        ocp_setup.get("kind", "OpenShiftClient"),
+        **{k: v for k, v in ocp_setup.items() if k != "kind"},
+        project_name=project)
+
+
+def _rhsso_password(ocp_setup):
     """Search for SSO admin password"""
     try:
         # is this RHOAM?
-        tools = OpenShiftClient(
-            project_name="redhat-rhoam-user-sso", server_url=server_url, token=token)
+        tools = _openshift(ocp_setup, "redhat-rhoam-user-sso")
         return tools.secrets["credential-rhssouser"]["ADMIN_PASSWORD"].decode("utf-8")
     except (OpenShiftPythonException, KeyError):
         try:
             # was it deployed as part of tools?
-            tools = OpenShiftClient(
-                project_name="tools", server_url=server_url, token=token)
+            tools = _openshift(ocp_setup, "tools")
             return tools.environ("sso")["SSO_ADMIN_PASSWORD"]
         except (OpenShiftPythonException, KeyError):
             return None
 
 
-# pylint: disable=unused-argument,too-many-locals
-def load(obj, env=None, silent=None, key=None):
-    """Reads and loads in to "settings" a single key or all keys from vault
+def _credentials_fingerprint(ocp_setup):
+    """Fingerprint of the token or of the kubeconfig holding the oc session"""
+    digest = hashlib.sha256()
+    if ocp_setup.get("token"):
+        digest.update(ocp_setup["token"].encode("utf-8"))
+    else:
+        kubeconfig = os.environ.get("KUBECONFIG", os.path.expanduser("~/.kube/config"))
+        for path in kubeconfig.split(os.pathsep):
+            if os.path.isfile(path):
+                digest.update(Path(path).read_bytes())
+    return digest.hexdigest()
 
-    :param obj: the settings instance
-    :param env: settings env default='DYNACONF'
-    :param silent: if errors should raise
-    :param key: if defined load a single key, else load all in env
-    :return: None
-    """
 
-    try:  # one large try/except block for now with logging at the end
-        # openshift project: if not set use ENV_FOR_DYNACONF, env NAMESPACE overwrites everything
-        project = obj.get("env_for_dynaconf")
-        project = obj.get("openshift", {}).get("projects", {}).get("threescale", {}).get("name", project)
-        project = os.environ.get("NAMESPACE", project)
+def _cache_path(obj, project, ocp_setup):
+    """Path to the cache file for this deployment, the default directory is per user"""
+    directory = obj.get("discovery_cache", {}).get("path") \
+        or os.path.join(tempfile.gettempdir(), f"3scale-tests-{getpass.getuser()}")
+    key = "|".join((str(ocp_setup.get("server_url")), str(project), _credentials_fingerprint(ocp_setup)))
+    return Path(os.path.expanduser(directory)) / f"discovery-{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json"
 
-        ocp_setup = obj.get("openshift", {}).get("servers", {}).get("default", {})
 
-        ocp = OpenShiftClient(
-            project_name=project,
-            server_url=ocp_setup.get("server_url"),
-            token=ocp_setup.get("token"))
-
-        admin_url = _route2url(ocp.routes.for_service("system-provider")[0])
-        admin_token = ocp.secrets["system-seed"]["ADMIN_ACCESS_TOKEN"].decode("utf-8")
-        master_url = _route2url(ocp.routes.for_service("system-master")[0])
-        master_token = ocp.secrets["system-seed"]["MASTER_ACCESS_TOKEN"].decode("utf-8")
-        devel_url = _route2url(ocp.routes.for_service("system-developer")[0])
-        superdomain = ocp.config_maps["system-environment"]["THREESCALE_SUPERDOMAIN"]
-        try:
-            backend_route = ocp.routes.for_service("backend-listener")[0]
-        except IndexError:
-            # RHOAM changed service name owning the route
-            backend_route = ocp.routes.for_service("backend-listener-proxy")[0]
-        catalogsource = "UNKNOWN"
-        try:
-            catalogsource = ocp.do_action("get", ["catalogsource", "-o=jsonpath={.items[0].spec.image}"]).out().strip()
-        except OpenShiftPythonException:
-            pass
+def _private(directory):
+    """True if the directory is accessible only by its owner, who is the current user"""
+    stat = directory.stat()
+    return stat.st_mode & 0o077 == 0 and (not hasattr(os, "getuid") or stat.st_uid == os.getuid())
 
-        # all this or nothing
-        if None in (project, admin_url, admin_token, master_url, master_token, devel_url):
+
+def _read_cache(path, ttl):
+    """Returns cached data if they are fresh enough and nobody else could have written them"""
+    try:
+        if not _private(path.parent) or time.time() - path.stat().st_mtime > ttl:
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(path, data):
+    """Atomically stores data readable only by the owner as they contain credentials"""
+    try:
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if not _private(path.parent):
+            log.warning("Discovery cache is not written, %s is accessible by other users", path.parent)
             return
+        descriptor, tmp = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(descriptor, "w", encoding="utf-8") as tmpfile:
+            json.dump(data, tmpfile)
+        os.replace(tmp, path)
+    except OSError as err:
+        log.debug("Unable to write discovery cache %s: %s", path, err)
+
+
+# pylint: disable=too-many-locals
+def _discover(ocp, project, ocp_setup):
+    """Discovers all the data from openshift, independent lookups are done concurrently"""
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        routes = pool.submit(ocp.list_resources, "route")
+        seed = pool.submit(lambda: ocp.secrets["system-seed"])
+        backend_api = pool.submit(lambda: ocp.secrets["backend-internal-api"])
+        environment = pool.submit(lambda: ocp.config_maps["system-environment"])
+        catalogsource = pool.submit(_catalogsource, ocp)
+        server_url = pool.submit(lambda: ocp.do_action("whoami", ["--show-server"]).out().strip())
+        version = pool.submit(_guess_version, ocp)
+        apicast_image = pool.submit(_apicast_image, ocp)
+        rhsso_password = pool.submit(_rhsso_password, ocp_setup)
+
+        routes = routes.result()
+        seed = seed.result()
+        admin_url = _route2url(routes_for_service(routes, "system-provider")[0])
+        admin_token = seed["ADMIN_ACCESS_TOKEN"].decode("utf-8")
+        master_url = _route2url(routes_for_service(routes, "system-master")[0])
+        master_token = seed["MASTER_ACCESS_TOKEN"].decode("utf-8")
+        devel_url = _route2url(routes_for_service(routes, "system-developer")[0])
+        superdomain = environment.result()["THREESCALE_SUPERDOMAIN"]
+        # RHOAM changed service name owning the route
+        backend_route = (routes_for_service(routes, "backend-listener")
+                         or routes_for_service(routes, "backend-listener-proxy"))[0]
 
-        # Values gathered in this loader are just fallback defaults, current
-        # settings needs to be dumped and written again, because a) it doesn't seem
-        # to be possible to change order of builtin loaders to make this one first;
-        # b) values from file(s) are needed here anyway. Therefore dump & update
-        settings = obj.to_dict()
+        # all this or nothing
+        if None in (project, admin_url, admin_token, master_url, master_token, devel_url):
+            return None
 
-        data = {
+        return {
             "openshift": {
                 "projects": {
                     "threescale": {
                         "name": project}},
                 "servers": {
                     "default": {
-                        "server_url": ocp.do_action("whoami", ["--show-server"]).out().strip()}}},
+                        "server_url": server_url.result()}}},
             "threescale": {
-                "version": _guess_version(ocp),
+                "version": version.result(),
                 "superdomain": superdomain,
-                "catalogsource": catalogsource,
+                "catalogsource": catalogsource.result(),
                 "admin": {
                     "url": admin_url,
-                    "username": ocp.secrets["system-seed"]["ADMIN_USER"].decode("utf-8"),
-                    "password": ocp.secrets["system-seed"]["ADMIN_PASSWORD"].decode("utf-8"),
+                    "username": seed["ADMIN_USER"].decode("utf-8"),
+                    "password": seed["ADMIN_PASSWORD"].decode("utf-8"),
                     "token": admin_token},
                 "master": {
                     "url": master_url,
-                    "username": ocp.secrets["system-seed"]["MASTER_USER"].decode("utf-8"),
-                    "password": ocp.secrets["system-seed"]["MASTER_PASSWORD"].decode("utf-8"),
+                    "username": seed["MASTER_USER"].decode("utf-8"),
+                    "password": seed["MASTER_PASSWORD"].decode("utf-8"),
                     "token": master_token},
                 "devel": {
                     "url": devel_url},
                 "gateway": {
                     "default": {
                         "portal_endpoint": f"https://{admin_token}@3scale-admin.{superdomain}",
-                        "image": _apicast_image(ocp),
-                        "openshift": ocp
+                        "image": apicast_image.result(),
                     }
                 },
                 "backend_internal_api": {
                     "route": backend_route,
-                    "username": ocp.secrets["backend-internal-api"]["username"],
-                    "password": ocp.secrets["backend-internal-api"]["password"]
+                    "username": backend_api.result()["username"].decode("utf-8"),
+                    "password": backend_api.result()["password"].decode("utf-8")
                 }
             },
             "rhsso": {
-                "password": _rhsso_password(ocp_setup.get("server_url"), ocp_setup.get("token"))
+                "password": rhsso_password.result()
             }}
 
+
+# pylint: disable=unused-argument
+def load(obj, env=None, silent=None, key=None):
+    """Reads and loads in to "settings" a single key or all keys from vault
+
+    :param obj: the settings instance
+    :param env: settings env default='DYNACONF'
+    :param silent: if errors should raise
+    :param key: if defined load a single key, else load all in env
+    :return: None
+    """
+
+    try:  # one large try/except block for now with logging at the end
+        # openshift project: if not set use ENV_FOR_DYNACONF, env NAMESPACE overwrites everything
+        project = obj.get("env_for_dynaconf")
+        project = obj.get("openshift", {}).get("projects", {}).get("threescale", {}).get("name", project)
+        project = os.environ.get("NAMESPACE", project)
+
+        ocp_setup = obj.get("openshift", {}).get("servers", {}).get("default", {})
+
+        ocp = _openshift(ocp_setup, project)
+
+        cache = obj.get("discovery_cache", {})
+        cache_path = _cache_path(obj, project, ocp_setup)
+        data = None
+        if cache.get("enabled", False) and not cache.get("refresh", False):
+            data = _read_cache(cache_path, cache.get("ttl", 600))
+        if data is None:
+            data = _discover(ocp, project, ocp_setup)
+            if data is None:
+                return
+            if cache.get("enabled", False):
+                _write_cache(cache_path, data)
+        else:
+            log.info("dynamic dynaconf loader uses cached data from %s", cache_path)
+
+        # client can't be cached, it is always added
+        data["threescale"]["gateway"]["default"]["openshift"] = ocp
+        # cache holds only strings, but the secret values are expected raw
+        backend_api = data["threescale"]["backend_internal_api"]
+        backend_api["username"] = backend_api["username"].encode("utf-8")
+        backend_api["password"] = backend_api["password"].encode("utf-8")
+
+        # Values gathered in this loader are just fallback defaults, current
+        # settings needs to be dumped and written again, because a) it doesn't seem
+        # to be possible to change order of builtin loaders to make this one first;
+        # b) values from file(s) are needed here anyway. Therefore dump & update
+        settings = obj.to_dict()
+
         # this overwrites what's already in settings to ensure NAMESPACE is propagated
         project_data = {
             "openshift": {
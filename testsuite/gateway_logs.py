@@ -1,13 +1,38 @@
-"""Pytest plugin for collecting gateway logs"""
+"""
+Pytest plugin for collecting gateway logs
+
+Logs of the gateways running in OpenShift are followed in the background and
+each test phase takes its slice from memory, gateways that can't be followed
+fetch their logs on every phase.
+"""
+import logging
+import os
+import tempfile
 from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
 
 import pytest
 from weakget import weakget
 
 from testsuite.config import settings
 from testsuite.gateways.gateways import Capability
+from testsuite.openshift.logs import DeploymentLogs
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
 PRINT_LOGS = weakget(settings)["reporting"]["print_app_logs"] % True
+FOLLOW = weakget(settings)["reporting"]["gateway_logs"]["follow"] % True
+MAX_LINES = weakget(settings)["reporting"]["gateway_logs"]["max_lines"] % 100_000
+SECTION_LIMIT = weakget(settings)["reporting"]["gateway_logs"]["section_limit"] % 65536
+LOGS_PATH = weakget(settings)["reporting"]["gateway_logs"]["path"] % ""
+
+# id of the gateway: (gateway, its followed logs or None if it can't be followed)
+# gateway is kept so its id can't be reused by another object
+_followed: Dict[int, Tuple[Any, Optional[DeploymentLogs]]] = {}
+# ids of followed gateways whose fixture was finalized, their logs are still needed by the teardown reports
+_released: Set[int] = set()
+# log files written in this session
+_log_files: Set[str] = set()
 
 
 @pytest.hookimpl(trylast=True)
@@ -42,8 +67,26 @@ def pytest_runtest_teardown(item):
         _print_logs(item, item.gateways, item.start_time, "teardown", "test-run")
 
 
-def _gather_data(item):
-    """Gathers gateways used and start_time"""
+def pytest_fixture_post_finalizer(fixturedef, request):  # pylint: disable=unused-argument
+    """Marks logs of the gateway to be freed once the fixture providing it is finalized"""
+    if fixturedef.cached_result is not None and id(fixturedef.cached_result[0]) in _followed:
+        _released.add(id(fixturedef.cached_result[0]))
+
+
+def pytest_runtest_logfinish(nodeid, location):  # pylint: disable=unused-argument
+    """Stops following logs of the gateways finalized during the test, all its reports are done by now"""
+    for key in list(_released):
+        unfollow(_followed[key][0])
+
+
+def pytest_sessionfinish(session):  # pylint: disable=unused-argument
+    """Stops following the gateway logs"""
+    for gateway, _ in list(_followed.values()):
+        unfollow(gateway)
+
+
+def used_gateways(item) -> Dict[str, Any]:
+    """Gateways used by the test by their fixture name"""
     # pylint: disable=protected-access
     request = item._request
     gateways = {}
@@ -53,10 +96,65 @@ def _gather_data(item):
         gateways["staging_gateway"] = request.getfixturevalue("staging_gateway")
     if "prod_client" in request.fixturenames:
         gateways["production_gateway"] = request.getfixturevalue("production_gateway")
+    return gateways
+
+
+def _gather_data(item):
+    """Gathers gateways used and start_time"""
+    gateways = used_gateways(item)
+    if FOLLOW:
+        for gateway in gateways.values():
+            _follow(gateway)
     item.start_time = datetime.utcnow()
     item.gateways = gateways
 
 
+def _log_path(name: str) -> str:
+    """File for complete logs of the gateway, every xdist worker has its own, it is truncated once per session"""
+    directory = LOGS_PATH or os.path.join(tempfile.gettempdir(), "3scale-tests", "gateway-logs")
+    os.makedirs(directory, exist_ok=True)
+    worker = os.environ.get("PYTEST_XDIST_WORKER")
+    path = os.path.join(directory, f"{name}-{worker}.log" if worker else f"{name}.log")
+    if path not in _log_files:
+        _log_files.add(path)
+        with open(path, "w", encoding="utf-8"):
+            pass
+    return path
+
+
+def _follow(gateway) -> Optional[DeploymentLogs]:
+    """Starts following logs of the gateway unless it is followed already or can't be followed"""
+    if id(gateway) not in _followed:
+        logs = None
+        if Capability.LOGS in gateway.CAPABILITIES:
+            name = getattr(gateway, "deployment", type(gateway).__name__)
+            try:
+                logs = gateway.follow_logs(max_lines=MAX_LINES, path=_log_path(name))
+            except NotImplementedError:
+                pass
+            # pylint: disable=broad-except
+            except Exception as error:
+                log.warning("Following logs of %s failed, falling back to fetching them: %s", name, error)
+        _followed[id(gateway)] = (gateway, logs)
+    return _followed[id(gateway)][1]
+
+
+def unfollow(gateway):
+    """Stops following logs of the gateway and frees them, no-op if the gateway isn't followed"""
+    _released.discard(id(gateway))
+    _, logs = _followed.pop(id(gateway), (None, None))
+    if logs is not None:
+        logs.close()
+
+
+def gateway_log(gateway, start_time: datetime, limit: Optional[int] = None) -> str:
+    """Logs of the gateway since start_time, from memory if the gateway is followed"""
+    logs = _follow(gateway) if FOLLOW else None
+    if logs is not None:
+        return logs.since(start_time, limit=limit)
+    return gateway.get_logs(since_time=start_time)
+
+
 def _print_logs(item, gateways, start_time, phase, suffix):
     """Appends logs to the stdout"""
     # This cannot ever fail or it will cause chain reaction
@@ -67,7 +165,7 @@ def _print_logs(item, gateways, start_time, phase, suffix):
             if Capability.LOGS in gateway.CAPABILITIES:
                 item.add_report_section(phase,
                                         "stdout",
-                                        _generate_log_section(name, gateway.get_logs(since_time=start_time)))
+                                        _generate_log_section(name, gateway_log(gateway, start_time, SECTION_LIMIT)))
             else:
                 item.add_report_section(phase,
                                         "stdout",
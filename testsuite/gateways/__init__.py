@@ -4,14 +4,14 @@ Sets up gateway defined in testsuite settings
 import importlib
 import inspect
 import pkgutil
-from typing import Type, TypeVar, Union
+from typing import Any, Dict, Type, TypeVar, Union
 
 from testsuite.config import settings
 from testsuite.configuration import SettingsParser
 from testsuite.gateways.gateways import AbstractGateway
 
 # walk through all sub-packages and import all gateway classes
-__all__ = ["gateway", "default"]
+__all__ = ["gateway", "gateway_settings", "default"]
 
 Gateway = TypeVar("Gateway", bound=AbstractGateway)
 
@@ -44,6 +44,11 @@ def gateway(kind: Union[Type[Gateway], str] = None, staging: bool = True, **kwar
     2. Settings block named after the class name (TemplateApicast)
     3. default settings block
     """
+    return SettingsParser().process(global_kwargs={"staging": staging}, **gateway_settings(kind, **kwargs))
+
+
+def gateway_settings(kind: Union[Type[Gateway], str] = None, **kwargs) -> Dict[str, Any]:
+    """Settings the gateway of given kind would be constructed from, the resolved class is under the kind key"""
     configuration = settings["threescale"]["gateway"]["default"].copy()
     kind = kind or configuration["kind"]
     clazz = globals()[kind] if not inspect.isclass(kind) else kind  # type: ignore
@@ -58,5 +63,4 @@ def gateway(kind: Union[Type[Gateway], str] = None, staging: bool = True, **kwar
     configuration.update(named_settings)
     configuration.update(kwargs)
     configuration["kind"] = clazz
-
-    return SettingsParser().process(global_kwargs={"staging": staging}, **configuration)
+    return configuration
@@ -1,11 +1,14 @@
 """Module containing all APIcast gateways"""
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 from testsuite.capabilities import Capability
 from testsuite.gateways import AbstractGateway
 
+if TYPE_CHECKING:
+    from testsuite.openshift.logs import DeploymentLogs
+
 
 class AbstractApicast(AbstractGateway, ABC):
     """Interface defining basic functionality of an APIcast gateway"""
@@ -20,6 +23,10 @@ class AbstractApicast(AbstractGateway, ABC):
     def get_logs(self, since_time: Optional[datetime] = None) -> str:
         """Gets the logs of the active Apicast pod from specific time"""
 
+    def follow_logs(self, **kwargs) -> "DeploymentLogs":
+        """Follows the logs of the active Apicast pods in the background, see DeploymentLogs for kwargs"""
+        raise NotImplementedError(f"{type(self).__name__} doesn't support following logs")
+
     def create(self):
         pass
 
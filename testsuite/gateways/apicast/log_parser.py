@@ -0,0 +1,155 @@
+"""
+Parser of APIcast access and error logs
+
+APIcast by default logs access in its `time` format which has status and
+request_time, but neither request id nor upstream timing. ACCESS_LOG_FORMAT
+used by logging_policy() adds them as key=value pairs, so the access log can
+be joined with the requests sent by the clients by X-Request-Id header.
+Error log lines are recognized in the nginx error log format, policy and
+nginx phase they come from are extracted when present.
+"""
+import re
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from testsuite import rawobj
+from testsuite.lifecycle_hook import LifecycleHook
+
+# Marker of access log lines in ACCESS_LOG_FORMAT
+ACCESS_LOG_MARKER = "apicast_access"
+
+ACCESS_LOG_FORMAT = (
+    f'{ACCESS_LOG_MARKER} request_id="{{{{http_x_request_id}}}}" status={{{{status}}}} '
+    'request_time={{request_time}} upstream_response_time="{{upstream_response_time}}" '
+    'upstream_addr="{{upstream_addr}}" request="{{request}}"'
+)
+
+ACCESS_COLUMNS = ("request_id", "status", "request_time", "upstream_response_time", "upstream_addr", "request")
+ERROR_COLUMNS = ("level", "policy", "phase", "message", "request")
+
+_FIELD = re.compile(r'(\w+)=(?:"([^"]*)"|(\S*))')
+# [time_local] host:port remote_addr:remote_port "request" status body_bytes_sent (request_time) post_action_impact
+_TIME_FORMAT = re.compile(
+    r'\[[^\]]+\] \S+ \S+ "(?P<request>[^"]*)" (?P<status>\d{3}) \d+ \((?P<request_time>[\d.]+)\)')
+_ERROR = re.compile(r"\d{4}/\d\d/\d\d \d\d:\d\d:\d\d \[(?P<level>\w+)\] \d+#\d+: (?:\*\d+ )?(?P<message>.*)")
+_POLICY = re.compile(r"policy/([\w-]+)/")
+_PHASE = re.compile(r"(\w+)_by_lua|context: (\w+)")
+_ERROR_REQUEST = re.compile(r', request: "([^"]*)"')
+
+
+def logging_policy():
+    """Logging policy making APIcast log access in ACCESS_LOG_FORMAT"""
+    return rawobj.PolicyConfig("logging", {
+        "condition": {"combine_op": "and"},
+        "custom_logging": ACCESS_LOG_FORMAT,
+    })
+
+
+class AccessLogHook(LifecycleHook):
+    """Adds logging_policy() to every created service, so its access log can be parsed"""
+
+    def on_service_create(self, service):
+        service.proxy.list().policies.append(logging_policy())
+
+
+def upstream_time(value: Optional[str]) -> Optional[float]:
+    """
+    Total of nginx upstream time variable in seconds
+    Multiple upstreams are separated by commas and internal redirects by colons, "-" means unknown
+    """
+    if not value:
+        return None
+    times = [float(i) for i in re.split(r"[,:]\s*", value.strip()) if i.strip() not in ("", "-")]
+    return sum(times) if times else None
+
+
+class LogTable:
+    """
+    Columnar table of parsed log lines
+
+    Usage:
+        access, errors = parse_logs(gateway.get_logs())
+        access.column("request_time")
+    """
+
+    def __init__(self, columns: Sequence[str]) -> None:
+        self.columns: Dict[str, List[Any]] = {name: [] for name in columns}
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()), []))
+
+    def append(self, row: Dict[str, Any]):
+        """Adds row, missing values are None"""
+        for name, values in self.columns.items():
+            values.append(row.get(name))
+
+    def extend(self, other: "LogTable"):
+        """Adds all rows of table with the same columns"""
+        for name, values in self.columns.items():
+            values.extend(other.columns[name])
+
+    def column(self, name: str) -> List[Any]:
+        """Values of the column"""
+        return self.columns[name]
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Rows as dicts"""
+        names = list(self.columns)
+        for values in zip(*self.columns.values()):
+            yield dict(zip(names, values))
+
+
+def parse_access_line(line: str) -> Optional[Dict[str, Any]]:
+    """Access log row of ACCESS_LOG_FORMAT or APIcast default format line, None for other lines"""
+    if ACCESS_LOG_MARKER in line:
+        fields = {match.group(1): match.group(2) if match.group(2) is not None else match.group(3)
+                  for match in _FIELD.finditer(line.split(ACCESS_LOG_MARKER, 1)[1])}
+        status = fields.get("status", "")
+        return {
+            "request_id": fields.get("request_id") or None,
+            "status": int(status) if status.isdigit() else None,
+            "request_time": upstream_time(fields.get("request_time")),
+            "upstream_response_time": upstream_time(fields.get("upstream_response_time")),
+            "upstream_addr": fields.get("upstream_addr") or None,
+            "request": fields.get("request"),
+        }
+    match = _TIME_FORMAT.search(line)
+    if match is not None:
+        return {
+            "status": int(match.group("status")),
+            "request_time": float(match.group("request_time")),
+            "request": match.group("request"),
+        }
+    return None
+
+
+def parse_error_line(line: str) -> Optional[Dict[str, Any]]:
+    """Error log row of nginx error log line, None for other lines"""
+    match = _ERROR.search(line)
+    if match is None:
+        return None
+    message = match.group("message")
+    policy = _POLICY.search(message)
+    phase = _PHASE.search(message)
+    request = _ERROR_REQUEST.search(message)
+    return {
+        "level": match.group("level"),
+        "policy": policy.group(1) if policy else None,
+        "phase": (phase.group(1) or phase.group(2)) if phase else None,
+        "message": message,
+        "request": request.group(1) if request else None,
+    }
+
+
+def parse_logs(content: str) -> Tuple[LogTable, LogTable]:
+    """Access and error log tables of APIcast logs"""
+    access = LogTable(ACCESS_COLUMNS)
+    errors = LogTable(ERROR_COLUMNS)
+    for line in content.splitlines():
+        row = parse_access_line(line)
+        if row is not None:
+            access.append(row)
+            continue
+        row = parse_error_line(line)
+        if row is not None:
+            errors.append(row)
+    return access, errors
@@ -1,6 +1,6 @@
 """Apicast deployed with ApicastOperator"""
 import time
-from typing import Dict
+from typing import Dict, Optional
 
 from testsuite.capabilities import Capability, CapabilityRegistry
 from testsuite.openshift.client import OpenShiftClient
@@ -63,15 +63,29 @@ class OperatorEnviron(Properties):
         else:
             raise NotImplementedError(f"Env variable {name} doesn't exists or is not yet implemented in operator")
 
+    def snapshot(self) -> Dict[str, str]:
+        return {name: str(self.apicast[key]) for name, key in self.NAMES.items()
+                if not callable(key) and self.apicast[key] is not None}
+
     def set_many(self, envs: Dict[str, str]):
-        def _update(apicast):
+        with self.batch():
             for name, value in envs.items():
-                self._set(apicast, name, value)
+                self[name] = value
+
+    def _apply(self, changes: Dict[str, Optional[str]]):
+        def _update(apicast):
+            for name, value in changes.items():
+                if value is None:
+                    self._delete(apicast, name)
+                else:
+                    self._set(apicast, name, value)
         result, _ = self.apicast.modify_and_apply(_update)
         assert not result.err(), result.err()
         self.wait_function()
 
     def __getitem__(self, name):
+        if self._batch is not None and name in self._batch.changes:
+            return self._batch.get(name)
         if name in self.NAMES:
             key = self.NAMES[name]
             if callable(key):
@@ -80,11 +94,17 @@ class OperatorEnviron(Properties):
         raise NotImplementedError(f"Env variable {name} doesn't exists or is not yet implemented in operator")
 
     def __setitem__(self, name, value):
+        if self._batch is not None:
+            self._batch.set(name, value)
+            return
         result, _ = self.apicast.modify_and_apply(lambda apicast: self._set(apicast, name, value))
         assert not result.err(), result.err()
         self.wait_function()
 
     def __delitem__(self, name):
+        if self._batch is not None:
+            self._batch.delete(name)
+            return
         self.apicast.modify_and_apply(lambda apicast: self._delete(apicast, name))
         self.wait_function()
 
@@ -92,6 +112,7 @@ class OperatorEnviron(Properties):
 class OperatorApicast(SelfManagedApicast):
     """Gateway for use with APIcast deployed by operator"""
     CAPABILITIES = {Capability.APICAST, Capability.PRODUCTION_GATEWAY, Capability.CUSTOM_ENVIRONMENT}
+    RESOURCE_TYPE = "deployment"
 
     # pylint: disable=too-many-arguments
     def __init__(self, staging: bool, openshift: OpenShiftClient, name, portal_endpoint, generate_name=False) -> None:
@@ -150,6 +171,9 @@ class OperatorApicast(SelfManagedApicast):
     def get_logs(self, since_time=None):
         raise NotImplementedError()
 
+    def follow_logs(self, **kwargs):
+        raise NotImplementedError()
+
     def set_image(self, image):
         def _update(apicast):
             apicast["image"] = image
@@ -27,6 +27,8 @@ class SelfManagedApicast(AbstractApicast):
                     Capability.LOGS,
                     Capability.JAEGER}
     HAS_PRODUCTION = True
+    # Type of the resource running the APIcast
+    RESOURCE_TYPE = "dc"
 
     # pylint: disable=unused-argument
     def __new__(cls, *args, **kwargs):
@@ -79,6 +81,11 @@ class SelfManagedApicast(AbstractApicast):
             route = f"{route}-stage"
         return route
 
+    @property
+    def routes(self) -> List[str]:
+        """Names of the routes created for this APIcast"""
+        return list(self._routes)
+
     @property
     def base_route(self):
         """Route that points at the APIcast itself"""
@@ -148,6 +155,9 @@ class SelfManagedApicast(AbstractApicast):
     def get_logs(self, since_time=None):
         return self.openshift.get_logs(self.deployment, since_time=since_time)
 
+    def follow_logs(self, **kwargs):
+        return self.openshift.follow_logs(self.deployment, **kwargs)
+
     def set_image(self, image):
         """Sets specific image to the deployment config and redeploys it"""
         self.openshift.patch("dc", self.deployment, [
@@ -157,5 +167,4 @@ class SelfManagedApicast(AbstractApicast):
                     "value": image
                 }
             ], patch_type="json")
-        # pylint: disable=protected-access
-        self.openshift._wait_for_deployment(self.deployment)
+        self.openshift.wait_for_deployments(self.deployment)
@@ -37,6 +37,9 @@ class SystemApicast(AbstractApicast):
     def get_logs(self, since_time=None):
         return self.openshift.get_logs(self.deployment, since_time=since_time)
 
+    def follow_logs(self, **kwargs):
+        return self.openshift.follow_logs(self.deployment, **kwargs)
+
     def connect_jaeger(self, jaeger, jaeger_randomized_name):
         """
         Modifies the apicast to send information to jaeger.
@@ -40,6 +40,11 @@ class TemplateApicast(SelfManagedApicast):
     def fits():
         return Capability.OCP3 in CapabilityRegistry()
 
+    @property
+    def image(self):
+        """Image the APIcast is deployed from"""
+        return self._image
+
     def _create_configuration_url_secret(self):
         self.openshift.secrets.create(
             name=self.template_parameters["CONFIGURATION_URL_SECRET"],
@@ -57,8 +62,7 @@ class TemplateApicast(SelfManagedApicast):
 
         self.openshift.new_app(self._template, self.template_parameters)
 
-        # pylint: disable=protected-access
-        self.openshift._wait_for_deployment(self.deployment)
+        self.openshift.wait_for_deployments(self.deployment)
         super().create()
 
     def destroy(self):
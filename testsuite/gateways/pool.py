@@ -0,0 +1,202 @@
+"""
+Pool of ready self-managed APIcast gateways
+
+Deploying a gateway with its secret and waiting for the rollout takes minutes,
+while most modules just need a staging gateway of some kind with some
+environment. Gateways returned to the pool keep running and they are leased
+again to modules asking for the same kind, image and options. Exact match of the
+environment is preferred, otherwise the closest idle gateway is reconfigured with
+a single rollout. Gateways modified in any other way (routes, volumes, image...)
+are destroyed on return, the rest is reaped at the end of the session.
+"""
+import hashlib
+import json
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from openshift import OpenShiftPythonException
+
+from testsuite import gateways
+from testsuite.gateways.apicast.selfmanaged import SelfManagedApicast
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def _hash(data) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+
+
+def _diff(current: Dict[str, str], target: Dict[str, str]) -> Dict[str, Optional[str]]:
+    """Changes turning current properties into the target ones, None stands for deletion"""
+    changes: Dict[str, Optional[str]] = {name: value for name, value in target.items() if current.get(name) != value}
+    changes.update({name: None for name in current if name not in target})
+    return changes
+
+
+class PooledGateway:
+    """Gateway owned by the pool together with the state it was deployed in"""
+
+    def __init__(self, gateway: SelfManagedApicast, key: Tuple) -> None:
+        self.gateway = gateway
+        self.key = key
+        self.baseline: Dict[str, str] = {}
+        self.environ: Dict[str, str] = {}
+        self.routes: List[str] = []
+        self.fingerprint: Optional[str] = None
+        self.leases = 0
+
+    def deployed(self):
+        """Records state of freshly created gateway"""
+        self.baseline = self.gateway.environ.snapshot()
+        self.environ = dict(self.baseline)
+        self.routes = self.gateway.routes
+        self.fingerprint = self.template_fingerprint()
+
+    def template_fingerprint(self) -> Optional[str]:
+        """
+        Hash of the pod template, plain env variables are excluded as they are reconfigured by the pool.
+        Changes of the volumes, image or env variables from secrets and configmaps make the gateway unusable.
+        """
+        resource = self.gateway.openshift.get_resource(self.gateway.RESOURCE_TYPE, self.gateway.deployment)
+        if resource is None:
+            return None
+        spec = resource["spec"]["template"]["spec"]
+        containers = [
+            {**container, "env": [i for i in container.get("env", []) if "valueFrom" in i]}
+            for container in spec.get("containers", [])]
+        return _hash({**spec, "containers": containers})
+
+    def target(self, environment: Dict[str, str]) -> Dict[str, str]:
+        """Properties the gateway should have for given environment"""
+        return {**self.baseline, **{name: str(value) for name, value in environment.items()}}
+
+    def distance(self, environment: Dict[str, str]) -> int:
+        """Number of properties that have to be changed to get given environment"""
+        return len(_diff(self.environ, self.target(environment)))
+
+    def configure(self, environment: Dict[str, str]):
+        """Changes properties of the gateway to match environment, all at once"""
+        changes = _diff(self.environ, self.target(environment))
+        if changes:
+            environ = self.gateway.environ
+            with environ.batch():
+                for name, value in changes.items():
+                    if value is None:
+                        del environ[name]
+                    else:
+                        environ[name] = value
+        self.environ = self.target(environment)
+
+
+class GatewayPool:
+    """
+    Leases ready staging self-managed gateways instead of deploying new ones
+
+    Usage:
+        gw = gateway_pool.lease(TemplateApicast, {"APICAST_LOG_LEVEL": "debug"}, name=blame(request, "gw"))
+        request.addfinalizer(lambda: gateway_pool.release(gw))
+    """
+
+    def __init__(self, max_idle: int = 3) -> None:
+        """
+        Args:
+            :param max_idle: How many idle gateways are kept running, 0 disables reuse
+        """
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle: List[PooledGateway] = []
+        self._leased: Dict[int, PooledGateway] = {}
+        self.stats = {"created": 0, "reused": 0, "reconfigured": 0, "discarded": 0}
+
+    def lease(self, kind, environment: Optional[Dict[str, str]] = None, name: Optional[str] = None,
+              **options) -> SelfManagedApicast:
+        """
+        Returns ready gateway with given environment, the gateway has to be released afterwards
+        Args:
+            :param kind: Gateway class, e.g. TemplateApicast
+            :param environment: Environment the gateway should have
+            :param name: Name used if new gateway has to be deployed
+            :param options: Additional options for the gateway constructor
+        """
+        environment = environment or {}
+        configuration = gateways.gateway_settings(kind, **options)
+        key = (configuration["kind"].__name__, configuration.get("image"), _hash(options))
+
+        with self._lock:
+            candidates = [i for i in self._idle if i.key == key]
+            entry = min(candidates, key=lambda i: i.distance(environment), default=None)
+            if entry is not None:
+                self._idle.remove(entry)
+
+        if entry is not None:
+            distance = entry.distance(environment)
+            log.info("Reusing gateway %s for environment %s (%s changes)",
+                     entry.gateway.deployment, _hash(environment), distance)
+            try:
+                entry.configure(environment)
+                self.stats["reconfigured" if distance else "reused"] += 1
+            except (OpenShiftPythonException, NotImplementedError, KeyError) as err:
+                log.warning("Unable to reconfigure gateway %s: %s", entry.gateway.deployment, err)
+                self._discard(entry)
+                entry = None
+
+        if entry is None:
+            entry = self._create(gateways.gateway(kind=kind, staging=True, name=name, **options), key, environment)
+
+        entry.leases += 1
+        with self._lock:
+            self._leased[id(entry.gateway)] = entry
+        return entry.gateway
+
+    def _create(self, gateway: SelfManagedApicast, key: Tuple, environment: Dict[str, str]) -> PooledGateway:
+        """Deploys new gateway with the environment, the gateway is destroyed if anything fails"""
+        entry = PooledGateway(gateway, key)
+        try:
+            gateway.create()
+            entry.deployed()
+            entry.configure(environment)
+        except Exception:
+            gateway.destroy()
+            raise
+        self.stats["created"] += 1
+        return entry
+
+    def release(self, gateway: SelfManagedApicast):
+        """Returns gateway to the pool, gateways that can't be reused are destroyed"""
+        with self._lock:
+            entry = self._leased.pop(id(gateway), None)
+        if entry is None:
+            gateway.destroy()
+            return
+
+        reusable = False
+        try:
+            if gateway.routes == entry.routes and entry.template_fingerprint() == entry.fingerprint:
+                entry.environ = gateway.environ.snapshot()
+                reusable = True
+        except (OpenShiftPythonException, NotImplementedError, KeyError) as err:
+            log.debug("Unable to inspect gateway %s: %s", gateway.deployment, err)
+
+        with self._lock:
+            if reusable and len(self._idle) < self.max_idle:
+                self._idle.append(entry)
+                return
+        log.debug("Gateway %s can't be reused", gateway.deployment)
+        self._discard(entry)
+
+    def _discard(self, entry: PooledGateway):
+        self.stats["discarded"] += 1
+        entry.gateway.destroy()
+
+    def reap(self):
+        """Destroys all the gateways, meant to be called at the end of the session"""
+        with self._lock:
+            entries = self._idle + list(self._leased.values())
+            self._idle, self._leased = [], {}
+        for entry in entries:
+            try:
+                entry.gateway.destroy()
+            except OpenShiftPythonException as err:
+                log.warning("Unable to destroy gateway %s: %s", entry.gateway.deployment, err)
+        log.info("Gateway pool: %s", ", ".join(f"{k}={v}" for k, v in self.stats.items()))
@@ -1,11 +1,18 @@
 """Http client with HTTPX library supporting HTTP/1.1 and HTTP/2"""
+import asyncio
 import functools
+import hashlib
 import logging
-from typing import Iterable, Generator
-
-from httpx import Client, Request, Response, URL, Auth, create_ssl_context
+import shlex
+import threading
+import time
+import weakref
+from contextlib import AsyncExitStack, contextmanager
+from typing import IO, Dict, Iterable, Generator, List, Optional, Sequence, Tuple
+
+from httpx import AsyncClient, Client, HTTPTransport, Limits, Request, Response, URL, Auth, create_ssl_context
+from httpx import RequestNotRead
 from threescale_api.resources import Application, Service
-from threescale_api.utils import response2str, request2curl
 import backoff
 
 from testsuite.lifecycle_hook import LifecycleHook
@@ -18,34 +25,112 @@ from testsuite.utils import basic_auth_string
 log = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
 
+# Request extension marking requests whose response body is consumed by the caller as a stream
+STREAM = "testsuite.stream"
+
+
+class BodyLog:
+    """
+    How request and response bodies are logged
+
+    Bodies above the limit are truncated and identified by size and sha256.
+    Full bodies can be written to a spill file, testsuite.httpx_logs plugin
+    opens one per test and keeps it only if the test fails.
+    """
+
+    def __init__(self, limit: int = 1024) -> None:
+        """
+        Args:
+            :param limit: Number of bytes of the body included in the log
+        """
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._spill: Optional[IO[bytes]] = None
+
+    def format(self, kind: str, content: bytes) -> str:
+        """Returns loggable text of the body, full body goes to the spill file if there is one"""
+        truncated = len(content) > self.limit
+        digest = hashlib.sha256(content).hexdigest()[:16] if truncated or self._spill else ""
+        with self._lock:
+            if self._spill is not None:
+                self._spill.write(f"--- {kind} {len(content)} bytes sha256:{digest}\n".encode("utf-8"))
+                self._spill.write(content)
+                self._spill.write(b"\n")
+        text = content[:self.limit].decode("utf-8", errors="replace")
+        if truncated:
+            text += f"... [{len(content)} bytes, sha256:{digest}]"
+        return text
+
+    def open_spill(self, path: str):
+        """Starts writing full bodies to the file"""
+        with self._lock:
+            self._spill = open(path, "wb")  # pylint: disable=consider-using-with
+
+    def close_spill(self) -> bool:
+        """Stops writing full bodies, returns False if nothing was written"""
+        with self._lock:
+            spill, self._spill = self._spill, None
+        if spill is None:
+            return False
+        written = spill.tell() > 0
+        spill.close()
+        return written
+
+
+body_log = BodyLog()  # pylint: disable=invalid-name
+
+
+def _streamed(response) -> bool:
+    """True if the caller reads the body itself"""
+    return bool(response.request.extensions.get(STREAM))
+
+
 def _log_request(request):
-    """log request details"""
-    class Request:
-        """attribute body/url is needed"""
-        def __init__(self, request):
-            self.__request = request
-            self.body = "".join([i.decode("utf-8") for i in request.stream])
-            self.url = str(request.url)
+    """log request details as curl command, streamed bodies are not read"""
+    if not log.isEnabledFor(logging.INFO):
+        return
 
-        def __getattr__(self, name):
-            return getattr(self.__request, name)
+    cmd = ["curl", f"-X {shlex.quote(request.method)}"]
+    cmd.extend(f"-H {shlex.quote(f'{key}: {value}')}" for key, value in request.headers.items())
+    try:
+        content = request.content
+    except RequestNotRead:
+        cmd.append("-d <streamed body>")
+    else:
+        if content:
+            cmd.append(f"-d {shlex.quote(body_log.format('request', content))}")
+    cmd.append(shlex.quote(str(request.url)))
 
-    log.info("[CLIENT]: %s", request2curl(Request(request)))
+    log.info("[CLIENT]: %s", " ".join(cmd))
 
 
 def _log_response(response):
-    """log response details"""
-    class Response:
-        """attr reason is needed"""
-        def __init__(self, response):
-            response.read()
-            self.__response = response
-            self.reason = response.reason_phrase
+    """log response details, body of streamed response is not read"""
+    if not log.isEnabledFor(logging.INFO):
+        return
+
+    msg = [f"{response.http_version} {response.status_code} {response.reason_phrase}"]
+    msg.extend(f"{key}: {value}" for key, value in response.headers.items())
+    msg.append("")
+    if _streamed(response):
+        msg.append("<streamed body>")
+    else:
+        # client reads the body right after the hooks anyway
+        msg.append(body_log.format("response", response.read()))
+
+    log.info("\n".join(["[CLIENT]:", *msg]))
 
-        def __getattr__(self, name):
-            return getattr(self.__response, name)
 
-    log.info("\n".join(["[CLIENT]:", response2str(Response(response))]))
+async def _alog_request(request):
+    """log request details, event hooks of async client have to be coroutines"""
+    _log_request(request)
+
+
+async def _alog_response(response):
+    """log response details, event hooks of async client have to be coroutines"""
+    if log.isEnabledFor(logging.INFO) and not _streamed(response):
+        await response.aread()
+    _log_response(response)
 
 
 class UnexpectedResponse(Exception):
@@ -55,15 +140,101 @@ class UnexpectedResponse(Exception):
         self.response = response
 
 
+def _ssl_context(cert, verify, http2):
+    """Create ssl context for httpx"""
+    return create_ssl_context(cert=cert, verify=verify, http2=http2, trust_env=True)
+
+
+class TransportRegistry:
+    """
+    Connection pools shared by all HttpxClients talking to the same upstream
+
+    Each HttpxClient would otherwise open new connections with TCP and TLS
+    handshake to the gateway route although the previous client of the same
+    route has idle keep-alive connections.
+
+    Usage:
+        transports = TransportRegistry(Limits(max_keepalive_connections=20))
+        client = HttpxClient(http2, application, transports=transports)
+    """
+
+    def __init__(self, limits: Optional[Limits] = None) -> None:
+        """
+        Args:
+            :param limits: Limits of each pool, httpx defaults are used if None
+        """
+        self.limits = limits or Limits()
+        self._lock = threading.Lock()
+        self._transports: Dict[Tuple, HTTPTransport] = {}
+        self._streams: Dict[Tuple, weakref.WeakSet] = {}
+        self._stats: Dict[Tuple, Dict[str, int]] = {}
+
+    @staticmethod
+    def key(base_url: str, verify, cert, http2: bool) -> Tuple:
+        """Identification of the pool, connections are shared per origin, not per path"""
+        url = URL(base_url)
+        return (url.scheme, url.host, url.port, repr(verify), repr(cert), bool(http2))
+
+    def transport(self, key: Tuple, verify, cert, http2: bool) -> HTTPTransport:
+        """Returns shared transport for the key, the transport is created on first use"""
+        with self._lock:
+            if key not in self._transports:
+                self._transports[key] = HTTPTransport(
+                    verify=_ssl_context(cert, verify, http2), http2=http2, limits=self.limits)
+                self._streams[key] = weakref.WeakSet()
+                self._stats[key] = {"clients": 0, "requests": 0, "connections": 0}
+            self._stats[key]["clients"] += 1
+            return self._transports[key]
+
+    def track(self, key: Tuple, response: Response):
+        """Records whether the response came over new or reused connection"""
+        stream = response.extensions.get("network_stream")
+        with self._lock:
+            stats = self._stats[key]
+            stats["requests"] += 1
+            if stream is not None and stream not in self._streams[key]:
+                self._streams[key].add(stream)
+                stats["connections"] += 1
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Counters of clients, requests and opened connections for each upstream"""
+        with self._lock:
+            return {f"{key[0]}://{key[1]}:{key[2]}{' h2' if key[5] else ''}": dict(value)
+                    for key, value in self._stats.items()}
+
+    def log_stats(self):
+        """Logs the counters with ratio of requests sent over reused connections"""
+        for upstream, stats in self.stats.items():
+            reused = stats["requests"] - stats["connections"]
+            ratio = reused / stats["requests"] if stats["requests"] else 0
+            log.info("httpx pool %s: %s, reused=%.0f%%",
+                     upstream, ", ".join(f"{k}={v}" for k, v in stats.items()), ratio * 100)
+
+    def close(self):
+        """Closes all the pools, meant to be called at the end of the session"""
+        with self._lock:
+            transports, self._transports = list(self._transports.values()), {}
+        for transport in transports:
+            transport.close()
+
+
 class HttpxHook(LifecycleHook):
     """Lifecycle hook for Httpx client"""
 
-    def __init__(self, http2: bool = False) -> None:
+    def __init__(self, http2: bool = False, transports: Optional[TransportRegistry] = None) -> None:
+        """
+        Args:
+            :param http2: If True, clients use HTTP/2
+            :param transports: Shared connection pools of the clients, each client has its own if None
+        """
         self.http2 = http2
+        self.transports = transports
 
     def on_application_create(self, application: Application):
         # pylint: disable=protected-access
-        application._client_factory = HttpxClient.partial(self.http2)
+        application._client_factory = HttpxClient.partial(self.http2, transports=self.transports)
+        application._async_client_factory = AsyncHttpxClient.partial(self.http2)
         application.register_auth(Service.AUTH_USER_KEY, HttpxUserKeyAuth)
         application.register_auth(Service.AUTH_APP_ID_KEY, HttpxAppIdKeyAuth)
 
@@ -78,7 +249,8 @@ class HttpxClient:
         return functools.partial(cls, http2, **kwargs)
 
     def __init__(self, http2, app, endpoint: str = "sandbox_endpoint",
-                 verify: bool = None, cert=None, disable_retry_status_list: Iterable = ()) -> None:
+                 verify: bool = None, cert=None, disable_retry_status_list: Iterable = (),
+                 transports: Optional[TransportRegistry] = None) -> None:
         self._app = app
         self._endpoint = endpoint
         self._status_forcelist = {503, 404} - set(disable_retry_status_list)
@@ -86,13 +258,21 @@ class HttpxClient:
         self._cert = cert
         self.auth = app.authobj()
         self.http2 = http2
-        self._client = Client(base_url=self._base_url, verify=self._ssl_context(), http2=http2)
+        self._shared = transports is not None
+        base_url = self._base_url
+        if transports is not None:
+            key = transports.key(base_url, verify, cert, http2)
+            self._client = Client(base_url=base_url, transport=transports.transport(key, verify, cert, http2))
+            self._client.event_hooks["response"] = [functools.partial(transports.track, key)]
+        else:
+            self._client = Client(base_url=base_url, verify=self._ssl_context(), http2=http2)
         self._client.event_hooks["request"] = [_log_request]
-        self._client.event_hooks["response"] = [_log_response]
+        self._client.event_hooks["response"].append(_log_response)
 
     def close(self):
-        """Close httpx client"""
-        self._client.close()
+        """Close httpx client, shared connection pool is left open for other clients"""
+        if not self._shared:
+            self._client.close()
 
     @property
     def _base_url(self) -> str:
@@ -101,7 +281,7 @@ class HttpxClient:
 
     def _ssl_context(self):
         """Create ssl context for httpx"""
-        return create_ssl_context(cert=self._cert, verify=self._verify, http2=self.http2, trust_env=True)
+        return _ssl_context(self._cert, self._verify, self.http2)
 
     def extend_connection_pool(self, maxsize: int):
         """
@@ -136,6 +316,16 @@ class HttpxClient:
 
         return response
 
+    @contextmanager
+    def stream(self, method, path, **kwargs) -> Generator[Response, None, None]:
+        """
+        Sends request and yields response with unread body, e.g. for response.iter_bytes().
+        Content may be iterable of bytes, the body is neither read nor logged. Nothing is retried.
+        """
+        kwargs.setdefault("auth", self.auth)
+        with self._client.stream(method, path, extensions={STREAM: True}, **kwargs) as response:
+            yield response
+
     def get(self, *args, **kwargs):
         """mimics requests interface"""
         return self.request('GET', *args, **kwargs)
@@ -157,6 +347,156 @@ class HttpxClient:
         return self.request('DELETE', *args, **kwargs)
 
 
+class _Barrier:  # pylint: disable=too-few-public-methods
+    """Releases all the waiting coroutines at once when all parties arrived"""
+
+    def __init__(self, parties: int) -> None:
+        self.parties = parties
+        self._released = asyncio.Event()
+
+    async def wait(self):
+        """Waits until all the parties call wait()"""
+        self.parties -= 1
+        if self.parties <= 0:
+            self._released.set()
+        await self._released.wait()
+
+
+def httpx_auth(app) -> Auth:
+    """Auth registered for the application or its httpx equivalent if it was registered for requests"""
+    auth = app.authobj()
+    if isinstance(auth, Auth):
+        return auth
+    fallback = {Service.AUTH_USER_KEY: HttpxUserKeyAuth, Service.AUTH_APP_ID_KEY: HttpxAppIdKeyAuth}
+    auth_mode = app.service["backend_version"]
+    if auth_mode not in fallback:
+        raise ValueError(f"No httpx auth registered for '{auth_mode}', is HttpxHook used?")
+    return fallback[auth_mode](app)
+
+
+class AsyncHttpxClient:
+    """
+    Asynchronous counterpart of HttpxClient, it is meant for bursts of concurrent requests.
+    Unlike HttpxClient it doesn't retry any responses as that would distort the timing.
+
+    Usage:
+        async with async_api_client(application) as client:
+            response = await client.get("/get")
+
+        responses = async_api_client(application).burst(20, "GET", "/delay/5")
+    """
+
+    @classmethod
+    def partial(cls, http2, **kwargs):
+        """Returns partially initialized AsyncHttpxClient suitable for async client factory of the application"""
+        return functools.partial(cls, http2, **kwargs)
+
+    def __init__(self, http2, app, endpoint: str = "sandbox_endpoint", verify: Optional[bool] = None,
+                 cert=None) -> None:
+        self._app = app
+        self._endpoint = endpoint
+        self._verify = verify if verify is not None else app.api_client_verify
+        self._cert = cert
+        self.http2 = http2
+        self.auth = httpx_auth(app)
+        self._client: Optional[AsyncClient] = None
+
+    @property
+    def _base_url(self) -> str:
+        """Determine right url at runtime"""
+        return self._app.service.proxy.fetch()[self._endpoint]
+
+    def _ssl_context(self):
+        """Create ssl context for httpx"""
+        return _ssl_context(self._cert, self._verify, self.http2)
+
+    async def __aenter__(self) -> "AsyncHttpxClient":
+        self._client = AsyncClient(
+            base_url=self._base_url, verify=self._ssl_context(), http2=self.http2, auth=self.auth, timeout=None,
+            event_hooks={"request": [_alog_request], "response": [_alog_response]})
+        await self._client.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.__aexit__(*exc_info)
+        self._client = None
+
+    def close(self):
+        """Nothing to close, underlying client lives only within async with block. Compatibility with HttpxClient"""
+
+    async def request(self, method, path, allow_redirects=True, **kwargs) -> Response:
+        """mimics requests interface, has to be called within async with block"""
+        if self._client is None:
+            raise RuntimeError("AsyncHttpxClient has to be opened with async with")
+        return await self._client.request(method, path, follow_redirects=allow_redirects, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        """mimics requests interface"""
+        return await self.request('GET', *args, **kwargs)
+
+    async def post(self, *args, **kwargs):
+        """mimics requests interface"""
+        return await self.request('POST', *args, **kwargs)
+
+    async def put(self, *args, **kwargs):
+        """mimics requests interface"""
+        return await self.request('PUT', *args, **kwargs)
+
+    async def delete(self, *args, **kwargs):
+        """mimics requests interface"""
+        return await self.request('DELETE', *args, **kwargs)
+
+    def _authenticate(self, request: Request) -> Request:
+        """Request with the credentials of the client auth applied"""
+        return next(self.auth.sync_auth_flow(request))
+
+    async def request_on(self, barrier: _Barrier, method, path, **kwargs) -> Response:
+        """
+        Prepares authenticated request and sends it once all the parties of the barrier are ready.
+        Response gets sent_at and received_at attributes with time.perf_counter() timestamps.
+        """
+        if self._client is None:
+            raise RuntimeError("AsyncHttpxClient has to be opened with async with")
+        request = self._client.build_request(method, path, **kwargs)
+        # credentials (including OIDC token) are resolved before the barrier, so they don't delay the burst
+        request = await asyncio.get_running_loop().run_in_executor(None, self._authenticate, request)
+        await barrier.wait()
+        sent_at = time.perf_counter()
+        # auth flow would retry 403 with renewed token, which would distort the burst
+        response = await self._client.send(request, auth=None)
+        response.sent_at = sent_at  # type: ignore
+        response.received_at = time.perf_counter()  # type: ignore
+        return response
+
+    def burst(self, count: int, method, path, **kwargs) -> List[Response]:
+        """Sends count concurrent requests at once, see burst()"""
+        return burst([self] * count, method, path, **kwargs)
+
+
+def async_api_client(app, endpoint: str = "sandbox_endpoint", verify: Optional[bool] = None,
+                     cert=None) -> AsyncHttpxClient:
+    """Returns async client for the application, HttpxHook registers factory with the right HTTP version"""
+    factory = getattr(app, "_async_client_factory", AsyncHttpxClient.partial(False))
+    return factory(app, endpoint, verify, cert)
+
+
+def burst(clients: Sequence[AsyncHttpxClient], method, path, **kwargs) -> List[Response]:
+    """
+    Sends one request by each of the clients (the same client can be there many times) at once.
+    All the requests are prepared first and released together, this is way more accurate than threads.
+    Each response has sent_at and received_at attributes with time.perf_counter() timestamps.
+    Must not be called from running event loop.
+    """
+    async def _burst():
+        async with AsyncExitStack() as stack:
+            for client in {id(i): i for i in clients}.values():
+                await stack.enter_async_context(client)
+            barrier = _Barrier(len(clients))
+            return await asyncio.gather(*[i.request_on(barrier, method, path, **kwargs) for i in clients])
+
+    return list(asyncio.run(_burst()))
+
+
 # pylint: disable=too-few-public-methods
 class HttpxBaseClientAuth(Auth):
     """Base auth class for Httpx client"""
@@ -231,7 +571,11 @@ class HttpxOidcClientAuth(HttpxBaseClientAuth):
     def __init__(self, service_rhsso_info, app, location=None) -> None:
         super().__init__(app, location)
         self.rhsso = service_rhsso_info
-        self.token = self.rhsso.access_token(app)
+
+    @property
+    def token(self):
+        """Access token, cached by RHSSOServiceConfiguration"""
+        return self.rhsso.access_token(self.app)
 
     def _add_credentials(self, request: Request):
         if self.location == 'authorization':
@@ -249,6 +593,6 @@ class HttpxOidcClientAuth(HttpxBaseClientAuth):
 
         if response.status_code == 403:
             # Renew access token and try again
-            self.token = self.rhsso.access_token(self.app)
+            self.rhsso.access_token(self.app, fresh=True)
             self._add_credentials(request)
             yield request
@@ -0,0 +1,52 @@
+"""Pytest plugin configuring httpx body logging and keeping full bodies of failed tests"""
+import os
+import re
+import tempfile
+
+import pytest
+from weakget import weakget
+
+from testsuite.config import settings
+from testsuite.httpx import body_log
+
+BODY_LIMIT = weakget(settings)["reporting"]["httpx_bodies"]["limit"] % 1024
+SPILL = weakget(settings)["reporting"]["httpx_bodies"]["spill_on_failure"] % False
+SPILL_PATH = weakget(settings)["reporting"]["httpx_bodies"]["path"] % ""
+
+
+def pytest_configure(config):  # pylint: disable=unused-argument
+    """Sets the size of logged bodies"""
+    body_log.limit = BODY_LIMIT
+
+
+def _spill_file(item) -> str:
+    """Per test file for full bodies"""
+    directory = SPILL_PATH or os.path.join(tempfile.gettempdir(), "3scale-tests", "httpx")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, re.sub(r"[^\w.-]+", "_", item.nodeid) + ".log")
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item):
+    """Writes full bodies of the test to a file, the file is removed unless the test fails"""
+    if not SPILL:
+        yield
+        return
+
+    path = _spill_file(item)
+    body_log.open_spill(path)
+    item.httpx_bodies = path
+    yield
+    written = body_log.close_spill()
+    if not written or not getattr(item, "httpx_failed", False):
+        os.remove(path)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):  # pylint: disable=unused-argument
+    """Marks failed tests and points their report to the file with full bodies"""
+    outcome = yield
+    report = outcome.get_result()
+    if report.failed and hasattr(item, "httpx_bodies"):
+        item.httpx_failed = True
+        report.sections.append(("httpx bodies", item.httpx_bodies))
@@ -2,9 +2,14 @@
 A simple interface to get data from Jaeger using the rest http api
 Note: jaeger http rest api is not officially supported and may be a subject of a change
 """
+from typing import Any, Dict, List, Optional
+
 import backoff
 import requests
 
+# Headers with this prefix are turned by APIcast into baggage of the trace
+BAGGAGE_PREFIX = "testctx-"
+
 
 class Jaeger:
     """Wrapper for the Jaeger Api"""
@@ -14,24 +19,42 @@ class Jaeger:
         self.custom_config = custom_config
 
     @backoff.on_predicate(backoff.constant, lambda x: x['data'] == [], 10)
-    def traces(self, service: str, operation: str):
+    def traces(self, service: str, operation: Optional[str] = None, **kwargs):
         """
         Gets traces for given service and operation
         Tries again if the response does not contain any data
         :param service that the traces are of
-        :param operation - operation of the traces
+        :param operation - operation of the traces, all operations if None
+        :param kwargs - other query parameters, e.g. limit or start
         :return: list of the traces
         """
         params = {
             "service": service,
-            "operation": operation
+            **kwargs
         }
+        if operation is not None:
+            params["operation"] = operation
         response = requests.get(f"{self.endpoint}/api/traces", params=params,
                                 verify=self.verify)
         response.raise_for_status()
 
         return response.json()
 
+    def request_spans(self, service: str, baggage_key: str, value: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Gets spans of the traces carrying baggage item, e.g. request id sent in testctx-<baggage_key> header
+        :param service that the traces are of
+        :param baggage_key - key of the baggage item without the prefix
+        :param value - value of the baggage item
+        :param limit - number of the latest traces searched
+        :return: spans of the matching traces sorted by their start
+        """
+        spans: List[Dict[str, Any]] = []
+        for trace in self.traces(service, limit=limit)["data"]:
+            if any(_carries(span, baggage_key, value) for span in trace["spans"]):
+                spans.extend(trace["spans"])
+        return sorted(spans, key=lambda span: span["startTime"])
+
     def apicast_config(self, configmap_name, service_name):
         """
         :param configmap_name name of the configmap
@@ -55,7 +78,7 @@ class Jaeger:
                     "jaegerDebugHeader": "debug-id",
                     "jaegerBaggageHeader": "baggage",
                     "TraceContextHeaderName": "uber-trace-id",
-                    "traceBaggageHeaderPrefix": "testctx-"
+                    "traceBaggageHeaderPrefix": BAGGAGE_PREFIX
                 },
                 "baggage_restrictions": {
                     "denyBaggageOnInitializationFailure": False,
@@ -64,3 +87,12 @@ class Jaeger:
                 }
             }
         }
+
+
+def _carries(span: Dict[str, Any], key: str, value: str) -> bool:
+    """True if the span has the value in its tags or baggage logs"""
+    fields = list(span.get("tags", []))
+    for entry in span.get("logs", []):
+        fields.extend(entry.get("fields", []))
+    pairs = {(field.get("key"), str(field.get("value"))) for field in fields}
+    return (key, value) in pairs or (("value", value) in pairs and ("key", key) in pairs)
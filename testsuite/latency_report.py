@@ -0,0 +1,197 @@
+"""
+Pytest plugin attributing latency of the requests to the gateway, upstream and client
+
+Requests of the api clients carry X-Request-Id (see testsuite.timing) and the
+gateway logs them in the access log format of log_parser.logging_policy().
+Access logs of each test are parsed and joined with the client timings, time
+seen by the client is split into:
+    upstream - upstream_response_time of APIcast
+    gateway - request_time of APIcast without the upstream time
+    client - rest of the time measured by the client (network, TLS, client itself)
+Summary per test module and slow outliers are printed at the end of the session,
+xdist workers send their parsed logs to the controller which prints the summary.
+"""
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+import pytest
+from weakget import weakget
+
+from testsuite.capabilities import Capability
+from testsuite.config import settings
+from testsuite.gateway_logs import gateway_log, used_gateways
+from testsuite.gateways.apicast.log_parser import ACCESS_COLUMNS, ERROR_COLUMNS, LogTable, parse_logs
+from testsuite.timing import RequestTiming, collector as request_timing, percentile
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+ENABLED = weakget(settings)["reporting"]["latency_attribution"]["enabled"] % False
+OUTLIER_FACTOR = weakget(settings)["reporting"]["latency_attribution"]["outlier_factor"] % 3
+OUTLIER_MIN_MS = weakget(settings)["reporting"]["latency_attribution"]["outlier_min_ms"] % 200
+REPORT_PATH = weakget(settings)["reporting"]["latency_attribution"]["path"] % ""
+
+COMPONENTS = ("total", "gateway", "upstream", "client")
+
+
+def _ms(value: float) -> float:
+    return round(value * 1000, 1)
+
+
+class LatencyAttribution:
+    """Parsed access logs of the tests joined with the client timings"""
+
+    def __init__(self, outlier_factor: float = 3, outlier_min_ms: float = 200) -> None:
+        self.outlier_factor = outlier_factor
+        self.outlier_min_ms = outlier_min_ms
+        self.access: Dict[str, LogTable] = {}
+        self.errors: Dict[str, LogTable] = {}
+
+    def add_logs(self, nodeid: str, content: str):
+        """Parses gateway logs of the test"""
+        access, errors = parse_logs(content)
+        self.access.setdefault(nodeid, LogTable(ACCESS_COLUMNS)).extend(access)
+        self.errors.setdefault(nodeid, LogTable(ERROR_COLUMNS)).extend(errors)
+
+    def export(self) -> Dict[str, Dict[str, Dict[str, List[Any]]]]:
+        """Parsed logs as plain columns, xdist workers send them to the controller"""
+        return {"access": {nodeid: table.columns for nodeid, table in self.access.items()},
+                "errors": {nodeid: table.columns for nodeid, table in self.errors.items()}}
+
+    def merge(self, data: Dict[str, Dict[str, Dict[str, List[Any]]]]):
+        """Adds parsed logs exported by xdist worker"""
+        for tables, columns, exported in ((self.access, ACCESS_COLUMNS, data.get("access", {})),
+                                          (self.errors, ERROR_COLUMNS, data.get("errors", {}))):
+            for nodeid, values in exported.items():
+                table = LogTable(columns)
+                table.columns.update(values)
+                tables.setdefault(nodeid, LogTable(columns)).extend(table)
+
+    def join(self, timings: List[RequestTiming]) -> List[Dict[str, Any]]:
+        """Client timings with the matching access log rows split into the components in seconds"""
+        rows = {row["request_id"]: row
+                for table in self.access.values() for row in table.rows() if row["request_id"]}
+        joined = []
+        for timing in timings:
+            row = rows.get(timing.request_id or "")
+            if row is None or timing.total is None or row["request_time"] is None:
+                continue
+            upstream = row["upstream_response_time"] or 0.0
+            joined.append({
+                "nodeid": timing.nodeid,
+                "request_id": timing.request_id,
+                "request": row["request"],
+                "status": row["status"],
+                "upstream_addr": row["upstream_addr"],
+                "total": timing.total,
+                "gateway": max(0.0, row["request_time"] - upstream),
+                "upstream": upstream,
+                "client": max(0.0, timing.total - row["request_time"]),
+            })
+        return joined
+
+    def _errors(self, nodeids: List[str]) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for nodeid in nodeids:
+            for row in self.errors.get(nodeid, LogTable(ERROR_COLUMNS)).rows():
+                key = f"{row['level']} {row['policy'] or '-'} {row['phase'] or '-'}"
+                counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def report(self, timings: List[RequestTiming]) -> Dict[str, Dict[str, Any]]:
+        """Percentiles of the components in milliseconds, dominant component, outliers and errors per module"""
+        modules: Dict[str, List[Dict[str, Any]]] = {}
+        for row in self.join(timings):
+            modules.setdefault((row["nodeid"] or "unknown").split("::")[0], []).append(row)
+        sent: Dict[str, int] = {}
+        for timing in timings:
+            module = (timing.nodeid or "unknown").split("::")[0]
+            sent[module] = sent.get(module, 0) + 1
+
+        report = {}
+        for module, rows in sorted(modules.items()):
+            summary: Dict[str, Any] = {"requests": sent.get(module, 0), "joined": len(rows)}
+            for component in COMPONENTS:
+                values = sorted(row[component] for row in rows)
+                summary[f"{component}-p50"] = _ms(percentile(values, 0.5))
+                summary[f"{component}-p95"] = _ms(percentile(values, 0.95))
+            medians = {i: summary[f"{i}-p50"] for i in COMPONENTS[1:]}
+            summary["dominant"] = max(medians, key=medians.__getitem__)
+            threshold = max(self.outlier_factor * summary["total-p50"], self.outlier_min_ms)
+            summary["outliers"] = [
+                {"nodeid": row["nodeid"], "request_id": row["request_id"], "request": row["request"],
+                 "upstream_addr": row["upstream_addr"], **{i: _ms(row[i]) for i in COMPONENTS}}
+                for row in rows if _ms(row["total"]) > threshold]
+            summary["errors"] = self._errors([i for i in self.errors if i.split("::")[0] == module])
+            report[module] = summary
+        return report
+
+
+attribution = LatencyAttribution(OUTLIER_FACTOR, OUTLIER_MIN_MS)  # pylint: disable=invalid-name
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_setup(item):
+    """Remembers when the test started"""
+    if ENABLED:
+        item.latency_start = datetime.utcnow()
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_runtest_call(item):
+    """Figures out gateways used by the test"""
+    if ENABLED:
+        item.latency_gateways = getattr(item, "gateways", None) or used_gateways(item)
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_runtest_teardown(item):
+    """Parses access logs of the gateways used by the test"""
+    if not ENABLED or not hasattr(item, "latency_start"):
+        return
+    # This cannot ever fail, same as printing of the logs
+    for name, gateway in getattr(item, "latency_gateways", {}).items():
+        if Capability.LOGS not in gateway.CAPABILITIES:
+            continue
+        try:
+            attribution.add_logs(item.nodeid, gateway_log(gateway, item.latency_start))
+        # pylint: disable=broad-except
+        except Exception as error:
+            log.debug("Unable to get access logs of %s: %s", name, error)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_sessionfinish(session):
+    """xdist workers send the parsed logs to the controller"""
+    if ENABLED and hasattr(session.config, "workerinput"):
+        session.config.workeroutput["latency_attribution"] = attribution.export()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):  # pylint: disable=unused-argument
+    """Collects parsed logs of the finished xdist worker"""
+    attribution.merge(getattr(node, "workeroutput", {}).get("latency_attribution", {}))
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Prints latency attribution of the modules and writes it to the file"""
+    if not ENABLED:
+        return
+    report = attribution.report(request_timing.timings())
+    if REPORT_PATH:
+        with open(REPORT_PATH, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if not report:
+        return
+    terminalreporter.section("latency attribution")
+    for module, summary in report.items():
+        terminalreporter.write_line(
+            f"{module}: {summary['joined']}/{summary['requests']} requests, dominant {summary['dominant']}, " +
+            ", ".join(f"{i} p50/p95 {summary[f'{i}-p50']}/{summary[f'{i}-p95']}ms" for i in COMPONENTS))
+        for outlier in summary["outliers"]:
+            terminalreporter.write_line(
+                f"    slow {outlier['request_id']} {outlier['request']} ({outlier['nodeid']}): " +
+                ", ".join(f"{i} {outlier[i]}ms" for i in COMPONENTS) + f", upstream {outlier['upstream_addr']}")
+        for error, count in summary["errors"].items():
+            terminalreporter.write_line(f"    {count}x {error}")
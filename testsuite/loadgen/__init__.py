@@ -0,0 +1,17 @@
+"""
+In-process open-loop load generator
+
+Lightweight alternative to Hyperfoil for small latency and throughput checks
+that has to run without Hyperfoil controller and agents. Load is described by
+phases (constant or increasing arrival rate) and scenarios, which can be loaded
+from subset of .hf.yaml benchmark syntax.
+"""
+from testsuite.loadgen.credentials import app_id_rows, oidc_rows, user_key_rows
+from testsuite.loadgen.engine import LoadGenerator, LoadResult, PhaseStats, run_parallel
+from testsuite.loadgen.hf import load_benchmark
+from testsuite.loadgen.histogram import Histogram
+from testsuite.loadgen.phases import ConstantRate, IncreasingRate, Phase
+from testsuite.loadgen.scenario import Scenario
+
+__all__ = ["app_id_rows", "oidc_rows", "user_key_rows", "LoadGenerator", "LoadResult", "PhaseStats",
+           "run_parallel", "load_benchmark", "Histogram", "ConstantRate", "IncreasingRate", "Phase", "Scenario"]
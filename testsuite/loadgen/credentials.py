@@ -0,0 +1,58 @@
+"""
+Credentials of the applications in the same rows as CSV files of Hyperfoil benchmarks
+
+Rows are [authority, credentials...], the same files drive both Hyperfoil and
+the in-process load generator.
+"""
+import csv
+from typing import List
+from urllib.parse import urlparse
+
+
+def authority(url):
+    """Returns hyperfoil authority format of URL <hostname>:<port> from given URL."""
+    parsed_url = urlparse(url)
+    return f"{parsed_url.hostname}:{parsed_url.port}"
+
+
+def user_key_rows(applications) -> List[List[str]]:
+    """Rows of [authority url, auth user key, user key]"""
+    rows = []
+    for application in applications:
+        proxy = application.service.proxy.list()
+        rows.append([authority(proxy['endpoint']), proxy['auth_user_key'], application['user_key']])
+    return rows
+
+
+def app_id_rows(applications) -> List[List[str]]:
+    """Rows of [authority url, app id, app key]"""
+    rows = []
+    for application in applications:
+        url = authority(application.service.proxy.list()['endpoint'])
+        app_key = application.keys.list()["keys"][0]["key"]["value"]
+        rows.append([url, application["application_id"], app_key])
+    return rows
+
+
+def oidc_rows(rhsso_service_info, applications, min_validity: int = 12 * 60 * 60) -> List[List[str]]:
+    """
+    Rows of [authority url, access_token]
+    Args:
+        :param rhsso_service_info: rhsso service info fixture
+        :param applications: list of 3scale applications
+        :param min_validity: Time in seconds the tokens have to be valid for, it has to cover whole load
+    """
+    rows = []
+    for application in applications:
+        url = authority(application.service.proxy.list()['endpoint'])
+        rows.append([url, rhsso_service_info.access_token(application, min_validity=min_validity)])
+    return rows
+
+
+def read_csv(path, skip_comments: bool = True, remove_quotes: bool = True) -> List[List[str]]:
+    """Reads rows of CSV file the way Hyperfoil randomCsvRow does"""
+    with open(path, encoding="utf8", newline="") as file:
+        lines = [i for i in file if not (skip_comments and i.lstrip().startswith("#"))]
+    if remove_quotes:
+        return [row for row in csv.reader(lines) if row]
+    return [line.rstrip("\r\n").split(",") for line in lines if line.strip()]
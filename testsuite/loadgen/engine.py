@@ -0,0 +1,288 @@
+"""Open-loop asyncio load generator"""
+import asyncio
+import copy
+import logging
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+from testsuite.loadgen.credentials import authority as url_authority, read_csv
+from testsuite.loadgen.histogram import Histogram
+from testsuite.loadgen.phases import Phase, order
+from testsuite.loadgen.scenario import Files, HttpRequest, Scenario, Session
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class PhaseStats:  # pylint: disable=too-many-instance-attributes
+    """
+    Results of single phase
+
+    latency is measured from the intended start of the session, so it includes
+    the time the request waited for the generator (coordinated omission
+    corrected), service_time is measured from the moment the request was sent.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.sessions = 0
+        self.blocked = 0
+        self.cancelled = 0
+        self.statuses: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.latency = Histogram()
+        self.service_time = Histogram()
+
+    @property
+    def requests(self) -> int:
+        """Number of requests that got response or failed, sessions that failed before sending count as well"""
+        return sum(self.statuses.values()) + sum(self.errors.values())
+
+    def merge(self, other: "PhaseStats"):
+        """Adds results of the same phase run elsewhere"""
+        self.sessions += other.sessions
+        self.blocked += other.blocked
+        self.cancelled += other.cancelled
+        self.statuses.update(other.statuses)
+        self.errors.update(other.errors)
+        self.latency.merge(other.latency)
+        self.service_time.merge(other.service_time)
+
+    def summary(self) -> dict:
+        """Plain dict with the results, latencies in milliseconds"""
+        return {
+            "sessions": self.sessions,
+            "requests": self.requests,
+            "blocked": self.blocked,
+            "cancelled": self.cancelled,
+            "statuses": {f"{status // 100}xx": count for status, count in sorted(self.statuses.items())},
+            "errors": dict(self.errors),
+            "latency": self.latency.summary(),
+            "service_time": self.service_time.summary(),
+        }
+
+
+class LoadResult:
+    """Results of all the phases"""
+
+    def __init__(self, phases: Optional[Dict[str, PhaseStats]] = None, duration: float = 0) -> None:
+        self.phases = phases or {}
+        self.duration = duration
+
+    def merge(self, other: "LoadResult"):
+        """Adds results of the same load run elsewhere"""
+        for name, stats in other.phases.items():
+            self.phases.setdefault(name, PhaseStats(name)).merge(stats)
+        self.duration = max(self.duration, other.duration)
+
+    @property
+    def failures(self) -> List[str]:
+        """Descriptions of problems: errors of requests and scenarios, non 2xx/3xx, blocked and cancelled sessions"""
+        failures = []
+        for name, stats in self.phases.items():
+            bad = {status: count for status, count in stats.statuses.items() if status >= 400}
+            for problem, count in (("errors", dict(stats.errors)), ("statuses", bad),
+                                   ("blocked", stats.blocked), ("cancelled", stats.cancelled)):
+                if count:
+                    failures.append(f"{name}: {problem} {count}")
+        return failures
+
+    def summary(self) -> Dict[str, dict]:
+        """Summary of each phase"""
+        return {name: stats.summary() for name, stats in self.phases.items()}
+
+
+# pylint: disable=too-many-instance-attributes
+class LoadGenerator:
+    """
+    Generates open-loop load: sessions start at the times given by the phases
+    regardless of how long the previous ones take
+
+    Usage:
+        generator = LoadGenerator([ConstantRate("steady", 60, users_per_sec=20)],
+                                  Scenario.for_applications(applications, "GET", "/anything"))
+        result = generator.run()
+        assert result.failures == []
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, phases: Sequence[Phase], scenario: Optional[Scenario] = None, http2: bool = False,
+                 verify=True, timeout: float = 30, seed: Optional[int] = None) -> None:
+        """
+        Args:
+            :param phases: Phases of the load, they start at once unless they have start_after
+            :param scenario: Scenario of phases without own scenario
+            :param http2: If True, HTTP/2 is used
+            :param verify: SSL verification of the requests
+            :param timeout: Timeout of single request in seconds
+            :param seed: Seed of the random choices of the scenarios
+        """
+        self.phases = order(phases)
+        self.scenario = scenario
+        self.http2 = http2
+        self.verify = verify
+        self.timeout = timeout
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.hosts: Dict[str, str] = {}
+        self.files: Files = {}
+        for phase in self.phases:
+            if phase.scenario is None and scenario is None:
+                raise ValueError(f"Phase {phase.name} has no scenario")
+
+    def add_host(self, url: str):
+        """Requests to authority (<host>:<port>) of the url go to the url"""
+        self.hosts[url_authority(url)] = url
+
+    def add_hosts(self, services):
+        """Adds production endpoints of all the services"""
+        for svc in services:
+            self.add_host(svc.proxy.list()["endpoint"])
+
+    def add_file(self, path, name: Optional[str] = None):
+        """Adds body file, it is referenced by its base name"""
+        with open(path, "rb") as file:
+            self.files[name or os.path.basename(path)] = file.read()
+
+    def add_csv(self, name: str, rows: List[List[str]]):
+        """Adds CSV data, e.g. credentials.user_key_rows(applications)"""
+        self.files[name] = [[str(i) for i in row] for row in rows]
+
+    def add_csv_file(self, path, name: Optional[str] = None):
+        """Adds CSV file, it is referenced by its base name"""
+        self.files[name or os.path.basename(path)] = read_csv(path)
+
+    def scaled(self, fraction: float, seed: int) -> "LoadGenerator":
+        """Copy with fraction of the load, used to split the load among processes"""
+        generator = copy.copy(self)
+        generator.phases = [i.scaled(fraction) for i in self.phases]
+        generator.seed = seed
+        return generator
+
+    def run(self) -> LoadResult:
+        """Generates the load and returns results once all the phases finished"""
+        return asyncio.run(_Run(self).run())
+
+
+class _Run:  # pylint: disable=too-few-public-methods
+    """Single execution of the generator, owns the clients and the event loop state"""
+
+    def __init__(self, generator: LoadGenerator) -> None:
+        self.generator = generator
+        self.rng = random.Random(generator.seed)
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self.result = LoadResult({i.name: PhaseStats(i.name) for i in generator.phases})
+
+    def _client(self, base_url: str) -> httpx.AsyncClient:
+        if base_url not in self.clients:
+            self.clients[base_url] = httpx.AsyncClient(
+                base_url=base_url, http2=self.generator.http2, verify=self.generator.verify,
+                timeout=self.generator.timeout, limits=httpx.Limits(max_connections=None))
+        return self.clients[base_url]
+
+    def _base_url(self, authority: str) -> str:
+        if authority in self.generator.hosts:
+            return self.generator.hosts[authority]
+        scheme = "https" if authority.endswith(":443") else "http"
+        return f"{scheme}://{authority}"
+
+    async def run(self) -> LoadResult:
+        """Runs all the phases, respecting their start_after"""
+        start = time.perf_counter()
+        finished = {i.name: asyncio.Event() for i in self.generator.phases}
+        try:
+            await asyncio.gather(*[self._phase(i, finished) for i in self.generator.phases])
+        finally:
+            await asyncio.gather(*[i.aclose() for i in self.clients.values()])
+        self.result.duration = time.perf_counter() - start
+        return self.result
+
+    async def _phase(self, phase: Phase, finished: Dict[str, asyncio.Event]):
+        for name in phase.start_after:
+            await finished[name].wait()
+
+        stats = self.result.phases[phase.name]
+        scenario = phase.scenario or self.generator.scenario
+        assert scenario is not None
+        sessions: set = set()
+        start = time.perf_counter()
+        log.info("Phase %s started", phase.name)
+        for offset in phase.arrivals():
+            intended = start + offset
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if phase.max_sessions is not None and len(sessions) >= phase.max_sessions:
+                stats.blocked += 1
+                continue
+            task = asyncio.ensure_future(self._session(scenario, stats, intended))
+            sessions.add(task)
+            task.add_done_callback(sessions.discard)
+
+        if sessions:
+            timeout = None if phase.max_duration is None else max(0, start + phase.max_duration - time.perf_counter())
+            _, pending = await asyncio.wait(set(sessions), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            stats.cancelled += len(pending)
+            if pending:
+                await asyncio.wait(pending)
+        finished[phase.name].set()
+        log.info("Phase %s finished: %s", phase.name, stats.summary())
+
+    async def _session(self, scenario: Scenario, stats: PhaseStats, intended: Optional[float]):
+        stats.sessions += 1
+        session = Session(self.generator.files, self.rng)
+        try:
+            for step in scenario.steps:
+                if isinstance(step, HttpRequest):
+                    await self._request(step, session, stats, intended)
+                    # only the first request of the session has intended start
+                    intended = None
+                else:
+                    step.run(session)
+        # broken scenario (missing file, variable...) ends the session, it must not pass unnoticed
+        except Exception as err:  # pylint: disable=broad-except
+            log.debug("Session of %s failed: %r", stats.name, err)
+            stats.errors[type(err).__name__] += 1
+
+    async def _request(self, step: HttpRequest, session: Session, stats: PhaseStats, intended: Optional[float]):
+        authority, path, headers, body = step.build(session)
+        base_url = self._base_url(authority) if authority is not None else session.base_url
+        if base_url is None:
+            raise ValueError("Request has neither authority nor application")
+        auth = session.auth if session.auth is not None else httpx.USE_CLIENT_DEFAULT
+        sent = time.perf_counter()
+        try:
+            response = await self._client(base_url).request(
+                step.method, path, headers=headers, content=body, auth=auth)
+            stats.statuses[response.status_code] += 1
+        except httpx.HTTPError as err:
+            stats.errors[type(err).__name__] += 1
+        received = time.perf_counter()
+        stats.latency.record(received - (intended if intended is not None else sent))
+        stats.service_time.record(received - sent)
+
+
+def _run_scaled(generator: LoadGenerator) -> LoadResult:
+    return generator.run()
+
+
+def run_parallel(generator: LoadGenerator, processes: Optional[int] = None) -> LoadResult:
+    """
+    Splits the load evenly among processes and merges their results.
+    The generator has to be picklable, Scenario.for_applications isn't.
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        return generator.run()
+    parts = [generator.scaled(1 / processes, generator.seed + i) for i in range(processes)]
+    result = LoadResult()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for part in pool.map(_run_scaled, parts):
+            result.merge(part)
+    return result
@@ -0,0 +1,152 @@
+"""
+Subset of Hyperfoil benchmark syntax
+
+Supported are constantRate and increasingRate phases (duration, maxDuration,
+usersPerSec, initialUsersPerSec, targetUsersPerSec, maxSessions, startAfter)
+and scenarios made of sequences with randomCsvRow, randomInt, template and
+httpRequest steps, which covers the benchmarks of the smoke tests. Anything
+else raises ValueError rather than running different load silently.
+"""
+import re
+from typing import Dict, List, Optional
+
+import yaml
+
+from testsuite.loadgen.phases import ConstantRate, IncreasingRate, Phase
+from testsuite.loadgen.scenario import HttpRequest, RandomCsvRow, RandomInt, Scenario, Step, Template, Value
+
+METHODS = ("GET", "HEAD", "POST", "PUT", "DELETE", "OPTIONS", "PATCH", "TRACE", "CONNECT")
+
+_DURATION = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(ms|s|m|h)?\s*$")
+_RANDOM_INT = re.compile(r"^\s*(\S+)\s*<-\s*(-?\d+)\s*\.\.\s*(-?\d+)\s*$")
+
+
+def duration(value) -> float:
+    """Hyperfoil duration (e.g. 500ms, 60s, 2m) in seconds"""
+    if isinstance(value, (int, float)):
+        return float(value) / 1000
+    match = _DURATION.match(str(value))
+    if match is None:
+        raise ValueError(f"Invalid duration {value}")
+    multiplier = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, None: 0.001}[match.group(2)]
+    return float(match.group(1)) * multiplier
+
+
+def _single(item: dict, what: str):
+    if not isinstance(item, dict) or len(item) != 1:
+        raise ValueError(f"{what} has to be a mapping with single key: {item}")
+    return next(iter(item.items()))
+
+
+def _value(value) -> Value:
+    if isinstance(value, dict):
+        if "fromVar" in value:
+            return Value(var=str(value["fromVar"]))
+        if "pattern" in value:
+            return Value(pattern=str(value["pattern"]))
+        raise ValueError(f"Unsupported value {value}")
+    return Value(pattern=str(value))
+
+
+def _start_after(value) -> List[str]:
+    if value is None:
+        return []
+    values = value if isinstance(value, list) else [value]
+    return [str(i["phase"]) if isinstance(i, dict) else str(i) for i in values]
+
+
+def _step(name: str, params) -> Step:
+    # pylint: disable=too-many-return-statements
+    if name == "randomCsvRow":
+        columns = {int(index): str(var) for index, var in params["columns"].items()}
+        return RandomCsvRow(params["file"], columns)
+    if name == "randomInt":
+        if isinstance(params, str):
+            match = _RANDOM_INT.match(params)
+            if match is None:
+                raise ValueError(f"Invalid randomInt {params}")
+            return RandomInt(match.group(1), int(match.group(2)), int(match.group(3)))
+        return RandomInt(params["toVar"], int(params.get("min", 0)), int(params["max"]))
+    if name == "template":
+        return Template(params["pattern"], params["toVar"])
+    if name == "httpRequest":
+        return _http_request(params)
+    raise ValueError(f"Unsupported step {name}")
+
+
+def _http_request(params: dict) -> HttpRequest:
+    methods = [i for i in METHODS if i in params]
+    if len(methods) != 1:
+        raise ValueError(f"httpRequest needs exactly one method: {params}")
+    unsupported = set(params) - {"authority", "headers", "body", "sync", "metric", *methods}
+    if unsupported:
+        raise ValueError(f"Unsupported httpRequest options {', '.join(sorted(unsupported))}")
+
+    body_file: Optional[str] = None
+    body: Optional[bytes] = None
+    if isinstance(params.get("body"), dict):
+        if "fromFile" not in params["body"]:
+            raise ValueError(f"Unsupported body {params['body']}")
+        body_file = params["body"]["fromFile"]
+    elif params.get("body") is not None:
+        body = str(params["body"]).encode("utf-8")
+
+    authority = _value(params["authority"]) if "authority" in params else None
+    headers = {name: _value(value) for name, value in (params.get("headers") or {}).items()}
+    return HttpRequest(methods[0], _value(params[methods[0]]), authority, headers, body_file, body)
+
+
+def _scenario(sequences) -> Scenario:
+    if not isinstance(sequences, list):
+        raise ValueError("Only scenario given as list of sequences is supported")
+    steps = []
+    for sequence in sequences:
+        _, sequence_steps = _single(sequence, "Sequence")
+        for step in sequence_steps:
+            steps.append(_step(*_single(step, "Step")))
+    return Scenario(steps)
+
+
+def _phase(name: str, definition: dict) -> Phase:
+    kind, params = _single(definition, f"Phase {name}")
+    common = {
+        "max_sessions": params.get("maxSessions"),
+        "start_after": _start_after(params.get("startAfter")),
+        "max_duration": duration(params["maxDuration"]) if "maxDuration" in params else None,
+    }
+    phase: Phase
+    if kind == "constantRate":
+        phase = ConstantRate(name, duration(params["duration"]), float(params["usersPerSec"]), **common)
+    elif kind == "increasingRate":
+        phase = IncreasingRate(name, duration(params["duration"]), float(params["initialUsersPerSec"]),
+                               float(params["targetUsersPerSec"]), **common)
+    else:
+        raise ValueError(f"Unsupported phase type {kind}")
+    phase.scenario = _scenario(params["scenario"])
+    return phase
+
+
+def parse_benchmark(benchmark: dict) -> List[Phase]:
+    """Phases with their scenarios from parsed benchmark"""
+    phases = benchmark.get("phases")
+    if not isinstance(phases, list):
+        raise ValueError("Only phases given as list are supported")
+    return [_phase(str(name).strip(), definition) for name, definition in (_single(i, "Phase") for i in phases)]
+
+
+def load_benchmark(path) -> List[Phase]:
+    """Phases with their scenarios from .hf.yaml file"""
+    with open(path, encoding="utf8") as file:
+        return parse_benchmark(yaml.safe_load(file))
+
+
+def files_of(phases: List[Phase]) -> Dict[str, str]:
+    """Names of the files used by the scenarios mapped to their kind (csv or body)"""
+    files = {}
+    for phase in phases:
+        for step in phase.scenario.steps if phase.scenario else []:
+            if isinstance(step, RandomCsvRow):
+                files[step.file] = "csv"
+            elif isinstance(step, HttpRequest) and step.body_file is not None:
+                files[step.body_file] = "body"
+    return files
@@ -0,0 +1,85 @@
+"""Latency histogram with bounded relative error in the spirit of HdrHistogram"""
+from collections import Counter
+from typing import Dict, Optional
+
+# Values are bucketed by 7 most significant bits, relative error is below 1%
+SIGNIFICANT_BITS = 7
+
+
+def _bucket(value: int) -> int:
+    """Lowest value of the bucket the value belongs to"""
+    shift = max(0, value.bit_length() - SIGNIFICANT_BITS)
+    return (value >> shift) << shift
+
+
+class Histogram:
+    """
+    Histogram of latencies in microseconds
+
+    Open-loop generator records latency from the intended start of the request,
+    which already accounts for coordinated omission. Closed-loop measurements
+    should pass the expected interval between requests to record() so the
+    requests that were never sent while waiting are accounted for.
+    """
+
+    def __init__(self, counts: Optional[Dict[int, int]] = None) -> None:
+        self.counts: Counter = Counter(counts or {})
+        self.max = max(self.counts, default=0)
+
+    @property
+    def count(self) -> int:
+        """Number of recorded values"""
+        return sum(self.counts.values())
+
+    def record(self, value: float, expected_interval: Optional[float] = None):
+        """
+        Records latency in seconds
+        Args:
+            :param value: Latency in seconds
+            :param expected_interval: Expected interval between requests in seconds, enables correction
+                of coordinated omission by backfilling values of the requests that should have been sent
+        """
+        micros = int(value * 1_000_000)
+        self.counts[_bucket(micros)] += 1
+        self.max = max(self.max, micros)
+        if expected_interval:
+            interval = int(expected_interval * 1_000_000)
+            missing = micros - interval
+            while 0 < interval <= missing:
+                self.counts[_bucket(missing)] += 1
+                missing -= interval
+
+    def merge(self, other: "Histogram"):
+        """Adds values of other histogram"""
+        self.counts.update(other.counts)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent: float) -> float:
+        """Value at the percentile in seconds"""
+        total = self.count
+        if total == 0:
+            return 0.0
+        if percent >= 100:
+            return self.max / 1_000_000
+        rank = max(1, int(total * percent / 100 + 0.5))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return bucket / 1_000_000
+        return self.max / 1_000_000
+
+    def mean(self) -> float:
+        """Mean value in seconds"""
+        total = self.count
+        if total == 0:
+            return 0.0
+        return sum(bucket * count for bucket, count in self.counts.items()) / total / 1_000_000
+
+    def summary(self) -> Dict[str, float]:
+        """Count and common percentiles in milliseconds"""
+        result = {"count": self.count, "mean": round(self.mean() * 1000, 2)}
+        for percent in (50, 90, 95, 99, 99.9):
+            result[f"p{percent:g}"] = round(self.percentile(percent) * 1000, 2)
+        result["max"] = round(self.max / 1000, 2)
+        return result
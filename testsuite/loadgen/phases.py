@@ -0,0 +1,116 @@
+"""Phases of open-loop load, each phase yields intended start times of new sessions"""
+import copy
+import math
+from typing import TYPE_CHECKING, Iterator, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from testsuite.loadgen.scenario import Scenario
+
+
+class Phase:
+    """
+    Base of the phases, subclasses define arrivals()
+    Args:
+        :param name: Name of the phase
+        :param duration: Duration of the arrivals in seconds
+        :param max_sessions: Maximum of sessions running at once, arrivals above it are counted as blocked
+        :param start_after: Names of the phases that have to finish before this one starts
+        :param max_duration: Sessions still running after this time (from the start of the phase) are cancelled
+
+    Scenario of the phase overrides the scenario of the generator.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, name: str, duration: float, max_sessions: Optional[int] = None,
+                 start_after: Sequence[str] = (), max_duration: Optional[float] = None) -> None:
+        self.name = name
+        self.duration = duration
+        self.max_sessions = max_sessions
+        self.start_after = list(start_after)
+        self.max_duration = max_duration
+        self.scenario: Optional["Scenario"] = None
+
+    def arrivals(self) -> Iterator[float]:
+        """Offsets of the session starts from the start of the phase in seconds"""
+        raise NotImplementedError()
+
+    def scaled(self, fraction: float) -> "Phase":
+        """Copy of the phase with fraction of the load, used to split load among processes"""
+        phase = copy.copy(self)
+        if self.max_sessions is not None:
+            phase.max_sessions = max(1, math.ceil(self.max_sessions * fraction))
+        phase.scale_rate(fraction)
+        return phase
+
+    def scale_rate(self, fraction: float):
+        """Multiplies the rate of arrivals"""
+        raise NotImplementedError()
+
+
+class ConstantRate(Phase):
+    """Sessions start at constant rate"""
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, name: str, duration: float, users_per_sec: float, max_sessions: Optional[int] = None,
+                 start_after: Sequence[str] = (), max_duration: Optional[float] = None) -> None:
+        super().__init__(name, duration, max_sessions, start_after, max_duration)
+        self.users_per_sec = users_per_sec
+
+    def arrivals(self) -> Iterator[float]:
+        if self.users_per_sec <= 0:
+            return
+        interval = 1 / self.users_per_sec
+        count = int(self.duration * self.users_per_sec)
+        for i in range(count):
+            yield i * interval
+
+    def scale_rate(self, fraction: float):
+        self.users_per_sec *= fraction
+
+
+class IncreasingRate(Phase):
+    """Rate of session starts grows linearly from the initial to the target rate"""
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, name: str, duration: float, initial_users_per_sec: float, target_users_per_sec: float,
+                 max_sessions: Optional[int] = None, start_after: Sequence[str] = (),
+                 max_duration: Optional[float] = None) -> None:
+        super().__init__(name, duration, max_sessions, start_after, max_duration)
+        self.initial_users_per_sec = initial_users_per_sec
+        self.target_users_per_sec = target_users_per_sec
+
+    def arrivals(self) -> Iterator[float]:
+        # n-th session starts when integral of the rate reaches n
+        initial = self.initial_users_per_sec
+        slope = (self.target_users_per_sec - initial) / self.duration
+        total = initial * self.duration + slope * self.duration ** 2 / 2
+        if initial <= 0 and slope == 0:
+            return
+        for i in range(int(total)):
+            if slope == 0:
+                yield i / initial
+            else:
+                yield (-initial + math.sqrt(initial ** 2 + 2 * slope * i)) / slope
+
+    def scale_rate(self, fraction: float):
+        self.initial_users_per_sec *= fraction
+        self.target_users_per_sec *= fraction
+
+
+def order(phases: Sequence[Phase]) -> List[Phase]:
+    """Checks that all phases in start_after exist and there is no cycle"""
+    names = {i.name for i in phases}
+    for phase in phases:
+        missing = set(phase.start_after) - names
+        if missing:
+            raise ValueError(f"Phase {phase.name} starts after unknown phase(s) {', '.join(sorted(missing))}")
+
+    ordered: List[Phase] = []
+    pending = list(phases)
+    while pending:
+        ready = [i for i in pending if all(dep in {j.name for j in ordered} for dep in i.start_after)]
+        if not ready:
+            raise ValueError(f"Cyclic startAfter among {', '.join(i.name for i in pending)}")
+        ordered.extend(ready)
+        pending = [i for i in pending if i not in ready]
+    return ordered
@@ -0,0 +1,157 @@
+"""
+Scenarios executed by every session of the load
+
+Scenario is a list of steps sharing session variables, steps mirror the subset
+of Hyperfoil steps used by our benchmarks. Everything except RandomApplication
+is plain data, so scenarios can be sent to other processes.
+"""
+import random
+import re
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from httpx import Auth
+
+from testsuite.httpx import httpx_auth
+
+_VARIABLE = re.compile(r"\$\{([^}]+)\}")
+
+Files = Dict[str, Union[bytes, List[List[str]]]]
+
+
+class Session:  # pylint: disable=too-few-public-methods
+    """State of single execution of the scenario"""
+
+    def __init__(self, files: Files, rng: random.Random) -> None:
+        self.files = files
+        self.rng = rng
+        self.vars: Dict[str, str] = {}
+        self.base_url: Optional[str] = None
+        self.auth: Optional[Auth] = None
+
+    def interpolate(self, pattern: str) -> str:
+        """Replaces ${name} with values of session variables"""
+        return _VARIABLE.sub(lambda match: self.vars[match.group(1)], pattern)
+
+
+class Value:  # pylint: disable=too-few-public-methods
+    """Value of the request attribute, either session variable or pattern"""
+
+    def __init__(self, pattern: Optional[str] = None, var: Optional[str] = None) -> None:
+        self.pattern = pattern
+        self.var = var
+
+    def resolve(self, session: Session) -> str:
+        """Value for the session"""
+        if self.var is not None:
+            return session.vars[self.var]
+        return session.interpolate(self.pattern or "")
+
+
+class Step:  # pylint: disable=too-few-public-methods
+    """Step of the scenario"""
+
+    def run(self, session: Session):
+        """Executes the step, HttpRequest is executed by the generator itself"""
+        raise NotImplementedError()
+
+
+class RandomCsvRow(Step):  # pylint: disable=too-few-public-methods
+    """Stores columns of random row of the CSV file to variables"""
+
+    def __init__(self, file: str, columns: Dict[int, str]) -> None:
+        self.file = file
+        self.columns = columns
+
+    def run(self, session: Session):
+        rows = session.files[self.file]
+        if not isinstance(rows, list) or not rows:
+            raise ValueError(f"File {self.file} has no CSV rows")
+        row = session.rng.choice(rows)
+        for index, var in self.columns.items():
+            session.vars[var] = row[index]
+
+
+class RandomInt(Step):  # pylint: disable=too-few-public-methods
+    """Stores random integer from the inclusive range to variable"""
+
+    def __init__(self, var: str, low: int, high: int) -> None:
+        self.var = var
+        self.low = low
+        self.high = high
+
+    def run(self, session: Session):
+        session.vars[self.var] = str(session.rng.randint(self.low, self.high))
+
+
+class Template(Step):  # pylint: disable=too-few-public-methods
+    """Stores interpolated pattern to variable"""
+
+    def __init__(self, pattern: str, to_var: str) -> None:
+        self.pattern = pattern
+        self.to_var = to_var
+
+    def run(self, session: Session):
+        session.vars[self.to_var] = session.interpolate(self.pattern)
+
+
+class RandomApplication(Step):  # pylint: disable=too-few-public-methods
+    """Picks random application, following requests go to its production endpoint with its credentials"""
+
+    def __init__(self, applications: Sequence) -> None:
+        self.entries: List[Tuple[str, Auth]] = [
+            (app.service.proxy.list()["endpoint"], httpx_auth(app)) for app in applications]
+
+    def run(self, session: Session):
+        session.base_url, session.auth = session.rng.choice(self.entries)
+
+
+class HttpRequest(Step):  # pylint: disable=too-few-public-methods
+    """
+    Request sent by the generator
+    Args:
+        :param method: HTTP method
+        :param path: Path with query
+        :param authority: <host>:<port> of the request, base url of the session is used if None
+        :param headers: Headers of the request
+        :param body_file: Name of the file with the body
+        :param body: Body of the request
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, method: str, path: Value, authority: Optional[Value] = None,
+                 headers: Optional[Dict[str, Value]] = None, body_file: Optional[str] = None,
+                 body: Optional[bytes] = None) -> None:
+        self.method = method
+        self.path = path
+        self.authority = authority
+        self.headers = headers or {}
+        self.body_file = body_file
+        self.body = body
+
+    def run(self, session: Session):
+        raise TypeError("HttpRequest is executed by LoadGenerator")
+
+    def build(self, session: Session) -> Tuple[Optional[str], str, Dict[str, str], Optional[bytes]]:
+        """Authority (None for base url of the session), path, headers and body of the request"""
+        authority = self.authority.resolve(session) if self.authority is not None else None
+        headers = {name: value.resolve(session) for name, value in self.headers.items()}
+        body = self.body
+        if self.body_file is not None:
+            content = session.files[self.body_file]
+            if not isinstance(content, bytes):
+                raise ValueError(f"File {self.body_file} is not a body")
+            body = content
+        return authority, self.path.resolve(session), headers, body
+
+
+class Scenario:  # pylint: disable=too-few-public-methods
+    """Steps executed by each session"""
+
+    def __init__(self, steps: Sequence[Step]) -> None:
+        self.steps = list(steps)
+
+    @classmethod
+    def for_applications(cls, applications: Sequence, method: str = "GET", path: str = "/",
+                         body: Optional[bytes] = None) -> "Scenario":
+        """Each session sends one request using credentials of random application, single process only"""
+        return cls([RandomApplication(applications), HttpRequest(method, Value(path), body=body)])
@@ -0,0 +1,134 @@
+"""
+Informer-like cache of OpenShift resources
+
+Each resource kind is listed only once, afterwards it is kept up to date by a
+background watch and lookups are answered from memory. The cache is shared by
+all the clients of the same project, writes done through any of them either
+update the cache directly or invalidate it, the next lookup relists the kind
+then.
+"""
+
+import logging
+import threading
+import typing
+from typing import Dict, Iterable, List, Optional
+
+from testsuite.openshift.watch import Resource, ResourceWatch
+
+if typing.TYPE_CHECKING:
+    # pylint: disable=cyclic-import
+    from testsuite.openshift.rest import RestOpenShiftClient
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# Watch streams are reopened after this time even if nothing happened
+WATCH_TIMEOUT = 300
+
+
+class Informer(ResourceWatch):
+    """Local copy of all the resources of one kind kept fresh by watch events"""
+
+    def __init__(self, client: "RestOpenShiftClient", kind: str) -> None:
+        super().__init__(client, kind)
+        self._lock = threading.RLock()
+        self._synced = False
+        # Bumped on every relist, events from older streams are ignored
+        self._generation = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def _sync(self):
+        """Relists the kind if needed and ensures the watch is running"""
+        with self._lock:
+            if not self._synced:
+                self._list()
+                self._synced = True
+                self._generation += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"informer-{self.kind}", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """Applies watch events to the cache until stopped"""
+        while not self._stopped.is_set():
+            with self._lock:
+                generation = self._generation
+            try:
+                for event in self._events(WATCH_TIMEOUT):
+                    with self._lock:
+                        if self._stopped.is_set() or generation != self._generation:
+                            break
+                        if not self._process(event):
+                            self._synced = False
+                            return
+            # Any failure just makes next lookup relist, the watch is restarted then
+            except Exception as err:  # pylint: disable=broad-except
+                log.debug("Informer for %s failed: %s", self.kind, err)
+                with self._lock:
+                    self._synced = False
+                return
+
+    def get(self, name: str) -> Optional[Resource]:
+        """Returns resource of given name or None, the returned object must not be modified"""
+        self._sync()
+        with self._lock:
+            return self.resources.get(name)
+
+    def list(self, labels: Optional[Dict[str, str]] = None) -> List[Resource]:
+        """Returns all resources optionally filtered by labels, the returned objects must not be modified"""
+        self._sync()
+        with self._lock:
+            resources = list(self.resources.values())
+        if labels:
+            resources = [
+                i for i in resources
+                if all(i["metadata"].get("labels", {}).get(k) == v for k, v in labels.items())]
+        return resources
+
+    def put(self, resource: Resource):
+        """Stores resource written through the client"""
+        with self._lock:
+            if self._synced:
+                self.resources[resource["metadata"]["name"]] = resource
+
+    def remove(self, name: str):
+        """Removes resource deleted through the client"""
+        with self._lock:
+            self.resources.pop(name, None)
+
+    def invalidate(self):
+        """Forces relist on the next lookup"""
+        with self._lock:
+            self._synced = False
+
+    def stop(self):
+        """Stops the background watch and closes its stream"""
+        self._stopped.set()
+        stream = self.stream
+        if stream is not None:
+            stream.close()
+
+
+class ResourceCache:
+    """Informers for the cached kinds of one project, shared by all its clients"""
+
+    def __init__(self, client: "RestOpenShiftClient", kinds: Iterable[str]) -> None:
+        self.informers = {kind: Informer(client, kind) for kind in kinds}
+
+    def __contains__(self, kind: Optional[str]) -> bool:
+        return kind in self.informers
+
+    def __getitem__(self, kind: str) -> Informer:
+        return self.informers[kind]
+
+    def invalidate(self, kinds: Optional[Iterable[str]] = None):
+        """Invalidates given kinds or everything"""
+        kinds = self.informers.keys() if kinds is None else kinds
+        for kind in kinds:
+            if kind in self.informers:
+                self.informers[kind].invalidate()
+
+    def stop(self):
+        """Stops all the background watches"""
+        for informer in self.informers.values():
+            informer.stop()
@@ -2,15 +2,17 @@
 
 import enum
 import json
+import subprocess
 from contextlib import ExitStack
 import os
-from datetime import timezone
+from datetime import datetime, timezone
 from typing import List, Dict, Union, Any, Optional, Callable, Sequence
 
 import openshift as oc
 
 from testsuite.openshift.crd.apimanager import APIManager
 from testsuite.openshift.env import Environ
+from testsuite.openshift.logs import DeploymentLogs, LogStream
 from testsuite.openshift.objects import Secrets, ConfigMaps, Routes
 
 # There is indeed cyclic import but it should be negated by TYPE_CHECKING check
@@ -56,6 +58,36 @@ class OpenShiftClient:
                 return oc.APIObject(string_to_model=result.out())
             return result
 
+    def get_resource(self, resource_type: str, name: str) -> Optional[Dict[str, Any]]:
+        """Returns resource as a dict or None if it doesn't exist
+        Args:
+            :param resource_type: The resource type. Ex.: route, secret, dc
+            :param name: The resource name
+        """
+        output = self.do_action("get", [resource_type, name, "--ignore-not-found=true", "-o", "json"]).out()
+        if not output.strip():
+            return None
+        return json.loads(output)
+
+    def list_resources(self, resource_type: str, labels: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        """Returns list of all resources of given type
+        Args:
+            :param resource_type: The resource type. Ex.: route, secret, dc
+            :param labels: Optional labels the resources have to match
+        """
+        cmd_args: List[Union[str, List[str]]] = [resource_type, "-o", "json"]
+        if labels:
+            cmd_args.extend(["-l", ",".join(f"{k}={v}" for k, v in labels.items())])
+        return json.loads(self.do_action("get", cmd_args).out())["items"]
+
+    def env_list(self, resource_type: str, name: str) -> str:
+        """Returns environment of the resource in the format of `oc set env --list`
+        Args:
+            :param resource_type: The resource type. Ex.: deploymentconfig, deployment
+            :param name: The resource name
+        """
+        return self.do_action("set", ["env", resource_type, name, "--list"]).out()
+
     @property
     def is_operator_deployment(self):
         """
@@ -75,7 +107,9 @@ class OpenShiftClient:
         """Returns APIManager object responsible for this deployment"""
         with ExitStack() as stack:
             self.prepare_context(stack)
-            return oc.selector("apimanager").objects(cls=APIManager)[0]
+            manager = oc.selector("apimanager").objects(cls=APIManager)[0]
+            manager.openshift = self
+            return manager
 
     @property
     def secrets(self):
@@ -341,6 +375,38 @@ class OpenShiftClient:
                 success_func=lambda deployment: "readyReplicas" in deployment.model.status
             )
 
+    def wait_for_deployments(self, *names: str, resource_type: str = "dc"):
+        """
+        Wait for all the given deployments to be ready
+        Args:
+            :param names: Names of the deployments
+            :param resource_type: Either "dc" or "deployment"
+        """
+        wait = self._wait_for_deployment if resource_type == "dc" else self.wait_for_ready
+        for name in names:
+            wait(name)
+
+    # pylint: disable=too-many-arguments
+    def wait_until(self, resource_type: str, success_func: Callable[[Dict[str, Any]], bool],
+                   name: Optional[str] = None, labels: Optional[Dict[str, str]] = None, timeout: int = 90):
+        """
+        Wait until all the selected resources match success_func
+        Args:
+            :param resource_type: The resource type. Ex.: pod, dc, apimanager
+            :param success_func: Condition taking the resource as a dict
+            :param name: Optional name of the resource
+            :param labels: Optional labels to select the resources
+            :param timeout: Timeout in seconds
+        """
+        with ExitStack() as stack:
+            self.prepare_context(stack)
+            stack.enter_context(oc.timeout(timeout))
+            if name is not None:
+                selector = oc.selector(f"{resource_type}/{name}")
+            else:
+                selector = oc.selector(resource_type, labels=labels)
+            selector.until_all(success_func=lambda apiobject: success_func(apiobject.as_dict()))
+
     def get_logs(self, deployment_name: str, since_time=None, tail: int = -1) -> str:
         """
         Get merged logs for the pods of the most recent deployment
@@ -360,6 +426,56 @@ class OpenShiftClient:
         logs = pod_selector.logs(tail, cmd_args=cmd_args)
         return "".join(logs.values())
 
+    def pod_proxy(self, pod_name: str, port: int, path: str) -> str:
+        """
+        GET request to the port of the pod proxied through the API server
+        :param pod_name: name of the pod
+        :param port: port of the pod
+        :param path: path of the request, e.g. metrics
+        :return: body of the response
+        """
+        url = f"/api/v1/namespaces/{self.project_name}/pods/{pod_name}:{port}/proxy/{path}"
+        return self.do_action("get", ["--raw", url]).out()
+
+    def stream_pod_logs(self, pod_name: str, since_time: Optional[datetime] = None) -> LogStream:
+        """
+        Follows log of the pod with `oc logs -f`, lines are prefixed by their timestamp
+        :param pod_name: name of the pod
+        :param since_time: naive UTC datetime of the first line
+        :return: stream of the lines, closing it terminates oc
+        """
+        with ExitStack() as stack:
+            self.prepare_context(stack)
+            context = oc.cur_context()
+            args = [context.get_oc_path(), "logs", "-f", "--timestamps", f"pod/{pod_name}",
+                    f"--namespace={self.project_name}"]
+            if context.get_api_url():
+                args.append(f"--server={context.get_api_url()}")
+            if context.get_token():
+                args.append(f"--token={context.get_token()}")
+            if context.get_kubeconfig_path():
+                args.append(f"--kubeconfig={context.get_kubeconfig_path()}")
+            if context.get_skip_tls_verify():
+                args.append("--insecure-skip-tls-verify=true")
+        if since_time is not None:
+            args.append(f"--since-time={since_time.replace(tzinfo=timezone.utc).isoformat()}")
+        # pylint: disable=consider-using-with
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                   encoding="utf-8", errors="replace")
+        assert process.stdout is not None
+        return LogStream(process.stdout, process.terminate)
+
+    def follow_logs(self, deployment_name: str, **kwargs) -> DeploymentLogs:
+        """
+        Follows logs of the pods of the most recent deployment in the background
+
+        Works only for DeploymentConfig, not for Deployment
+        :param deployment_name: name of the DeploymentConfig
+        :param kwargs: options of DeploymentLogs, e.g. max_lines or path
+        :return: followed logs, they have to be closed
+        """
+        return DeploymentLogs(self, deployment_name, **kwargs)
+
     def get_pod(self, deployment_name: str):
         """
         Gets the selector for the pods of the most recent deployment
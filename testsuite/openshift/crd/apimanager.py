@@ -1,8 +1,14 @@
 """Module containing APIManager object"""
+import typing
 from typing import Optional, Set
 
+import openshift as oc
 from openshift import APIObject, Missing
 
+if typing.TYPE_CHECKING:
+    # pylint: disable=cyclic-import
+    from testsuite.openshift.client import OpenShiftClient
+
 
 def _locator(path, apiobj):
     """
@@ -23,6 +29,8 @@ class APIManager(APIObject):
     ALL_DEPLOYMENTS = {'apicast-staging', 'backend-cron', 'backend-listener', 'backend-redis', 'backend-worker',
                        'system-memcache', 'system-mysql', 'system-redis', 'zync', 'zync-database', 'zync-que',
                        'apicast-production', 'system-app', 'system-sidekiq', 'system-sphinx'}
+    # Client this object was fetched by, used for waiting
+    openshift: Optional["OpenShiftClient"] = None
 
     def set_path(self, path, value, apiobj=None):
         """Sets value to a path in a string form"""
@@ -61,10 +69,22 @@ class APIManager(APIObject):
         valid_deployments = set(status)
         return deployments.issubset(valid_deployments)
 
+    def _wait_until(self, resource_type: str, name: str, success_func):
+        """Waits through the client this object was fetched by, if there is any"""
+        if self.openshift is not None:
+            self.openshift.wait_until(resource_type, success_func, name=name)
+        else:
+            oc.selector(f"{resource_type}/{name}", static_context=self.context).until_all(
+                success_func=lambda apiobject: success_func(apiobject.as_dict()))
+
     def _scale(self, spec_locator, deployments, replicas, wait_for_replicas=None):
-        """Generic scale function that requires path where to set replicas and on which deployments to wait"""
+        """
+        Generic scale function that requires path where to set replicas and on which deployments to wait
+        Args:
+            :param wait_for_replicas: Number of ready replicas of every deployment to wait for, defaults to replicas
+        """
         current_replicas = self.get_path(spec_locator)
-        wait_for_replicas = wait_for_replicas or current_replicas
+        wait_for_replicas = replicas if wait_for_replicas is None else wait_for_replicas
 
         # Safer way than using only apply()
         def _modify(apiobj):
@@ -78,7 +98,12 @@ class APIManager(APIObject):
 
         _, success = self.modify_and_apply(modifier_func=_modify)
         assert success
-        self.self_selector().until_any(min_to_satisfy=wait_for_replicas, success_func=_success)
+        self._wait_until("apimanager", self.name(), lambda obj: _success(APIManager(dict_to_model=obj)))
+        # APIManager reports only ready/stopped deployments, replica counts are in the deployments
+        if replicas > 0:
+            for deployment in deployments:
+                self._wait_until(
+                    "dc", deployment, lambda obj: obj.get("status", {}).get("readyReplicas", 0) >= wait_for_replicas)
         return current_replicas
 
     def scale_backend(self, replicas, wait_for_replicas=None):
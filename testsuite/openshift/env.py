@@ -2,7 +2,8 @@
 import abc
 import re
 import logging
-from typing import TYPE_CHECKING, Callable, Match, Dict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Match, Dict, Iterator, Optional, Tuple
 
 if TYPE_CHECKING:
     # pylint: disable=cyclic-import
@@ -80,10 +81,95 @@ class ConfigMapEnvironmentVariable(EnvironmentVariable):
 logger = logging.getLogger(__name__)
 
 
+class PropertiesBatch:
+    """Changes recorded within Properties.batch() that are applied all at once"""
+
+    # How many rollouts were saved by batching during the whole run
+    total_rollouts_saved = 0
+
+    def __init__(self) -> None:
+        # None stands for deletion
+        self.changes: Dict[str, Optional[str]] = {}
+        self.recorded = 0
+        self.rollouts_saved = 0
+
+    def set(self, name, value):
+        """Records setting of the property"""
+        self.changes[name] = value
+        self.recorded += 1
+
+    def delete(self, name):
+        """Records deletion of the property"""
+        self.changes[name] = None
+        self.recorded += 1
+
+    def get(self, name):
+        """Returns pending value, raises KeyError for pending deletion"""
+        value = self.changes[name]
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def applied(self, rollouts: int):
+        """Accounts rollouts that were actually done for this batch"""
+        self.rollouts_saved = max(self.recorded - rollouts, 0)
+        PropertiesBatch.total_rollouts_saved += self.rollouts_saved
+        logger.info("Batch of %s changes applied with %s rollout(s), %s rollout(s) saved in total",
+                    self.recorded, rollouts, PropertiesBatch.total_rollouts_saved)
+
+
 class Properties(abc.ABC):
     """Abstract class for manipulating objects properties, albeit operator properties or deployments environmental
     variables"""
 
+    _batch: Optional[PropertiesBatch] = None
+
+    @contextmanager
+    def batch(self) -> Iterator[PropertiesBatch]:
+        """
+        Records all the changes done within the context and applies them at once with single rollout on exit.
+        Changes that wouldn't change anything are dropped, nothing is applied if the block raises.
+
+        Usage:
+            with gateway.environ.batch():
+                gateway.environ["APICAST_LOG_LEVEL"] = "debug"
+                del gateway.environ["APICAST_SERVICES_LIST"]
+        """
+        if self._batch is not None:
+            yield self._batch
+            return
+
+        batch = self._batch = PropertiesBatch()
+        try:
+            yield batch
+        finally:
+            self._batch = None
+
+        changes = {name: value for name, value in batch.changes.items() if not self._is_noop(name, value)}
+        if changes:
+            self._apply(changes)
+        batch.applied(1 if changes else 0)
+
+    def _is_noop(self, name, value: Optional[str]) -> bool:
+        """True, if the change wouldn't change anything"""
+        try:
+            current = self[name]
+        except KeyError:
+            return value is None
+        except NotImplementedError:
+            return False
+        if current is None:
+            return value is None
+        return value is not None and str(current) == str(value)
+
+    def snapshot(self) -> Dict[str, str]:
+        """Returns current values of all the properties that can be read"""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def _apply(self, changes: Dict[str, Optional[str]]):
+        """Applies all the changes at once, None value means deletion"""
+
     @abc.abstractmethod
     def set_many(self, envs: Dict[str, str]):
         """Allow setting many envs at a time."""
@@ -101,10 +187,13 @@ class Properties(abc.ABC):
         """Deletes item"""
 
 
-class Environ:
+class Environ(Properties):
     """Contains all env variables for a specific deployment config"""
     types = [EnvironmentVariable, SecretEnvironmentVariable, ConfigMapEnvironmentVariable]
 
+    # Open batches by client, resource type and name, gateways create new Environ on every access
+    _batches: Dict[Tuple[int, str, str], PropertiesBatch] = {}
+
     def __init__(self, openshift: 'OpenShiftClient',
                  name: str,
                  wait_for_resource: Callable[[str], None],
@@ -115,6 +204,22 @@ class Environ:
         self.wait_for_resource = wait_for_resource
         self.__envs = None
 
+    @property
+    def _batch_key(self) -> Tuple[int, str, str]:
+        return id(self.openshift), self.resource_type, self.deployment_name
+
+    @property
+    def _batch(self) -> Optional[PropertiesBatch]:
+        """Batch open for the same deployment through any Environ object"""
+        return self._batches.get(self._batch_key)
+
+    @_batch.setter
+    def _batch(self, batch: Optional[PropertiesBatch]):
+        if batch is None:
+            self._batches.pop(self._batch_key, None)
+        else:
+            self._batches[self._batch_key] = batch
+
     @property
     def _envs(self):
         if self.__envs is None:
@@ -124,8 +229,8 @@ class Environ:
     def refresh(self):
         """Refreshes all the environment variables"""
         self.__envs = {}
-        cmd_result = self.openshift.do_action("set", ["env", self.resource_type, self.deployment_name, "--list"])
-        for line in cmd_result.out().split("\n"):
+        env_list = self.openshift.env_list(self.resource_type, self.deployment_name)
+        for line in env_list.split("\n"):
             for env_type in self.types:
                 match_obj = re.match(env_type.pattern, line)
                 if match_obj:
@@ -136,12 +241,26 @@ class Environ:
                     self.__envs[env.name] = env
                     break
 
+    def snapshot(self) -> Dict[str, str]:
+        """Values of the env variables set directly, the ones from secrets and configmaps are omitted"""
+        references = (SecretEnvironmentVariable, ConfigMapEnvironmentVariable)
+        return {name: env.get() for name, env in self._envs.items() if not isinstance(env, references)}
+
     def set_many(self, envs: Dict[str, str]):
         """Allow setting many envs at a time."""
+        with self.batch():
+            for name, value in envs.items():
+                self[name] = value
+
+    def _apply(self, changes: Dict[str, Optional[str]]):
         env_args = []
-        for name, value in envs.items():
-            env_args.append(f"{name}={value}")
-            logger.info("Setting env %s=%s in %s", name, value, self.deployment_name)
+        for name, value in changes.items():
+            if value is None:
+                env_args.append(f"{name}-")
+                logger.info("Deleting env %s in %s", name, self.deployment_name)
+            else:
+                env_args.append(f"{name}={value}")
+                logger.info("Setting env %s=%s in %s", name, value, self.deployment_name)
 
         self.openshift.do_action("set", ["env", self.resource_type, self.deployment_name, env_args])
         self.wait_for_resource(self.deployment_name)
@@ -150,11 +269,17 @@ class Environ:
         self.__envs = None
 
     def __getitem__(self, name):
+        if self._batch is not None and name in self._batch.changes:
+            return self._batch.get(name)
         if name not in self._envs:
             raise KeyError(name)
         return self._envs[name].get()
 
     def __setitem__(self, name, value):
+        if self._batch is not None:
+            self._batch.set(name, value)
+            return
+
         if name in self._envs:
             self._envs[name].set(value)
         else:
@@ -166,6 +291,10 @@ class Environ:
         self.__envs = None
 
     def __delitem__(self, name):
+        if self._batch is not None:
+            self._batch.delete(name)
+            return
+
         if name not in self._envs:
             raise KeyError(name)
 
@@ -0,0 +1,255 @@
+"""
+Following logs of deployment pods in the background
+
+Fetching logs with `oc logs --since-time` downloads the whole window every
+time. DeploymentLogs instead keeps a stream open for every pod of the latest
+deployment and stores the lines in bounded, timestamp-indexed buffer, so the
+logs of any time window are sliced from memory. Complete logs can be written
+to a file as they arrive.
+"""
+
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import IO, TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    # pylint: disable=cyclic-import
+    from testsuite.openshift.client import OpenShiftClient
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+_TIMESTAMP = re.compile(r"^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d) ")
+
+
+def parse_line(line: str) -> Tuple[Optional[datetime], str]:
+    """
+    Splits line of `timestamps=true` log into naive UTC datetime and the original line
+    Lines without timestamp are returned with None
+    """
+    match = _TIMESTAMP.match(line)
+    if match is None:
+        return None, line
+    timestamp = datetime.strptime(match.group(1), "%Y-%m-%dT%H:%M:%S")
+    if match.group(2):
+        timestamp = timestamp.replace(microsecond=int(match.group(2)[:6].ljust(6, "0")))
+    if match.group(3) != "Z":
+        sign = 1 if match.group(3)[0] == "+" else -1
+        hours, minutes = match.group(3)[1:].split(":")
+        timestamp -= sign * timedelta(hours=int(hours), minutes=int(minutes))
+    return timestamp, line[match.end():]
+
+
+class LogStream:  # pylint: disable=too-few-public-methods
+    """Lines of followed log with a way to stop following from another thread"""
+
+    def __init__(self, lines: Iterable[str], close: Callable[[], None]) -> None:
+        self.lines = lines
+        self.close = close
+
+
+class LogStore:
+    """
+    Bounded log lines of several pods indexed by their timestamp
+    Only the newest max_lines lines of each pod are kept.
+    """
+
+    def __init__(self, max_lines: int = 100_000) -> None:
+        self.max_lines = max_lines
+        self._times: Dict[str, List[datetime]] = {}
+        self._lines: Dict[str, List[str]] = {}
+        self._dropped: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+
+    def append(self, pod: str, timestamp: datetime, line: str):
+        """Adds line of the pod, lines of single pod have to come in order"""
+        with self._lock:
+            times = self._times.setdefault(pod, [])
+            lines = self._lines.setdefault(pod, [])
+            times.append(timestamp)
+            lines.append(line)
+            # trimming in batches keeps append amortized O(1)
+            if len(times) > self.max_lines + self.max_lines // 4:
+                excess = len(times) - self.max_lines
+                self._dropped[pod] = times[excess - 1]
+                del times[:excess]
+                del lines[:excess]
+
+    def last(self, pod: str) -> Optional[datetime]:
+        """Timestamp of the last stored line of the pod"""
+        with self._lock:
+            times = self._times.get(pod)
+            return times[-1] if times else None
+
+    def slice(self, since: datetime, until: Optional[datetime] = None, limit: Optional[int] = None) -> str:
+        """
+        Logs of all the pods between since and until
+        Args:
+            :param since: Naive UTC datetime of the first line
+            :param until: Naive UTC datetime after the last line, defaults to now
+            :param limit: Maximal number of characters, older lines are cut off when exceeded
+        """
+        parts = []
+        with self._lock:
+            for pod, times in self._times.items():
+                start = bisect_left(times, since)
+                end = len(times) if until is None else bisect_left(times, until)
+                if pod in self._dropped and self._dropped[pod] >= since:
+                    parts.append(f"[{pod}: lines before {self._dropped[pod].isoformat()} were dropped from buffer]\n")
+                parts.extend(self._lines[pod][start:end])
+        content = "".join(parts)
+        if limit is not None and len(content) > limit:
+            # cut at line boundary, so the first shown line is whole
+            cut = content.find("\n", len(content) - limit - 1) + 1 or len(content)
+            content = f"[{cut} characters truncated]\n" + content[cut:]
+        return content
+
+
+class PodLogFollower(threading.Thread):
+    """Background thread moving lines of single pod log stream into the store and file"""
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, pod: str, stream: LogStream, store: LogStore,
+                 file: Optional[IO[str]] = None, file_lock: Optional[threading.Lock] = None,
+                 resume_after: Optional[datetime] = None) -> None:
+        super().__init__(name=f"logs-{pod}", daemon=True)
+        self.pod = pod
+        self.stream = stream
+        self.store = store
+        self.file = file
+        self.file_lock = file_lock or threading.Lock()
+        self.resume_after = resume_after
+        self.received = time.monotonic()
+
+    def run(self):
+        try:
+            for line in self.stream.lines:
+                self.received = time.monotonic()
+                timestamp, text = parse_line(line)
+                if timestamp is None:
+                    continue
+                if self.resume_after is not None and timestamp <= self.resume_after:
+                    continue
+                self.store.append(self.pod, timestamp, text)
+                if self.file is not None:
+                    with self.file_lock:
+                        self.file.write(f"{self.pod} {line}")
+        # pylint: disable=broad-except
+        except Exception as error:
+            log.debug("Following logs of %s ended: %s", self.pod, error)
+
+    def stop(self):
+        """Stops following, the thread ends once the stream is closed"""
+        try:
+            self.stream.close()
+        # pylint: disable=broad-except
+        except Exception:
+            pass
+
+
+class DeploymentLogs:  # pylint: disable=too-many-instance-attributes
+    """
+    Follows logs of all the pods of the latest DeploymentConfig rollout
+
+    Usage:
+        logs = gateway.follow_logs(path="apicast.log")
+        start = datetime.utcnow()
+        ...
+        print(logs.since(start, limit=65536))
+        logs.close()
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, openshift: "OpenShiftClient", deployment_name: str, max_lines: int = 100_000,
+                 path: Optional[str] = None, settle: float = 0.1, max_wait: float = 1.0) -> None:
+        """
+        Args:
+            :param openshift: Client of the project with the deployment
+            :param deployment_name: Name of the DeploymentConfig
+            :param max_lines: Number of lines per pod kept in memory
+            :param path: File the complete logs are appended to
+            :param settle: Time without new lines after which the followers are considered caught up
+            :param max_wait: Maximal time to wait for the followers to catch up
+        """
+        self.openshift = openshift
+        self.deployment_name = deployment_name
+        self.store = LogStore(max_lines)
+        self.settle = settle
+        self.max_wait = max_wait
+        self.started = datetime.utcnow()
+        self.followers: Dict[str, PodLogFollower] = {}
+        # latestVersion of the DeploymentConfig whose pods are followed
+        self.version: Optional[int] = None
+        # pylint: disable=consider-using-with
+        self.file: Optional[IO[str]] = open(path, "a", encoding="utf-8") if path else None
+        self._file_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def _latest_version(self) -> Optional[int]:
+        dc = self.openshift.get_resource("dc", self.deployment_name)
+        return None if dc is None else dc["status"]["latestVersion"]
+
+    def _pods(self, version: Optional[int]) -> List[str]:
+        if version is None:
+            return []
+        pods = self.openshift.list_resources("pod", labels={"deployment": f"{self.deployment_name}-{version}"})
+        return [pod["metadata"]["name"] for pod in pods if pod.get("status", {}).get("phase") == "Running"]
+
+    def refresh(self):
+        """
+        Starts following pods of the latest rollout, pods are listed only when there is new rollout
+        or some stream ended
+        """
+        with self._lock:
+            version = self._latest_version()
+            if version == self.version and self.followers and all(i.is_alive() for i in self.followers.values()):
+                return
+            pods = self._pods(version)
+            # version is remembered once its pods are running, until then they are looked for on every refresh
+            if pods:
+                self.version = version
+            for pod in pods:
+                follower = self.followers.get(pod)
+                if follower is not None and follower.is_alive():
+                    continue
+                last = self.store.last(pod)
+                stream = self.openshift.stream_pod_logs(pod, since_time=last or self.started)
+                follower = PodLogFollower(pod, stream, self.store, self.file, self._file_lock, resume_after=last)
+                follower.start()
+                self.followers[pod] = follower
+
+    def _catch_up(self):
+        """Waits until the followers stop receiving lines, so the lines logged just now are included"""
+        deadline = time.monotonic() + self.max_wait
+        while time.monotonic() < deadline:
+            now = time.monotonic()
+            if all(now - i.received >= self.settle for i in self.followers.values() if i.is_alive()):
+                return
+            time.sleep(self.settle / 2)
+
+    def since(self, since: datetime, until: Optional[datetime] = None, limit: Optional[int] = None) -> str:
+        """
+        Logs between since and until from memory
+        Args:
+            :param since: Naive UTC datetime of the first line
+            :param until: Naive UTC datetime after the last line, defaults to now
+            :param limit: Maximal number of characters, older lines are cut off when exceeded
+        """
+        self.refresh()
+        self._catch_up()
+        return self.store.slice(since, until, limit)
+
+    def close(self):
+        """Stops all the followers and closes the file"""
+        for follower in self.followers.values():
+            follower.stop()
+        for follower in self.followers.values():
+            follower.join(timeout=5)
+        if self.file is not None:
+            with self._file_lock:
+                self.file.close()
+            self.file = None
@@ -30,6 +30,18 @@ class SecretTypes(enum.Enum):
     TLS = "kubernetes.io/ssl"
 
 
+def routes_for_service(routes: typing.Iterable[dict], service) -> list:
+    """
+    Filter routes for specific service from the already fetched ones
+    It will sort results by 3scale.net/tenant_id label
+    :param routes: routes to filter
+    :param service: service name in OpenShift
+    :return: list of routes
+    """
+    routes = [r for r in routes if r["spec"]["to"]["name"] == service]
+    return list(sorted(routes, key=lambda x: float(x["metadata"]["labels"].get("3scale.net/tenant_id", math.inf))))
+
+
 class RemoteMapping:
     """Dict-like interface to generic yaml object"""
 
@@ -48,25 +60,23 @@ class RemoteMapping:
 
     def __iter__(self):
         """Return iterator for requested resource"""
-        data = self.do_action("get", [self._resource_name])
-        return iter(data["items"])
+        return iter(self._client.list_resources(self._resource_name))
 
     def __getitem__(self, name):
         """Return requested resource in yaml format"""
 
-        res = self.do_action("get", [self._resource_name, name, "--ignore-not-found=true"])
+        res = self._client.get_resource(self._resource_name, name)
         if res is None:
             raise KeyError()
         return res
 
     def __contains__(self, name):
-        res = self.do_action("get", [self._resource_name, name, "--ignore-not-found=true"])
-        return res is not None
+        return self._client.get_resource(self._resource_name, name) is not None
 
     def __delitem__(self, name):
         if name not in self:
             raise KeyError()
-        self._client.do_action("delete", [self._resource_name, name])
+        self._client.delete(self._resource_name, name)
 
 
 class Routes(RemoteMapping):
@@ -107,10 +117,7 @@ class Routes(RemoteMapping):
         :param service: service name in OpenShift
         :return: list of routes
         """
-        routes = [r for r in self if r["spec"]["to"]["name"] == service]
-        routes = list(sorted(routes,
-                             key=lambda x: float(x["metadata"]["labels"].get("3scale.net/tenant_id", math.inf))))
-        return routes
+        return routes_for_service(self, service)
 
 
 class Secrets(RemoteMapping):
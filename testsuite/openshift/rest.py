@@ -0,0 +1,415 @@
+"""
+OpenShift client talking directly to the Kubernetes REST API
+
+Every call of the oc based OpenShiftClient spawns new `oc` process, which is
+expensive. RestOpenShiftClient keeps the same interface, but serves the most
+frequent calls (reading, patching, applying, deleting and scaling resources,
+fetching logs) through pooled HTTPS session shared by all the clients talking
+to the same API server. Everything else falls back to `oc`.
+"""
+
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import openshift as oc
+import requests
+from requests.adapters import HTTPAdapter
+
+from testsuite.openshift.cache import ResourceCache
+from testsuite.openshift.client import OpenShiftClient
+from testsuite.openshift.crd.apimanager import APIManager
+from testsuite.openshift.logs import LogStream
+from testsuite.openshift.watch import ResourceWatch, deployment_config_ready, deployment_ready
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# Resource kind: (API group/version, plural name)
+API_RESOURCES: Dict[str, Tuple[str, str]] = {
+    "pod": ("v1", "pods"),
+    "service": ("v1", "services"),
+    "secret": ("v1", "secrets"),
+    "configmap": ("v1", "configmaps"),
+    "deployment": ("apps/v1", "deployments"),
+    "deploymentconfig": ("apps.openshift.io/v1", "deploymentconfigs"),
+    "route": ("route.openshift.io/v1", "routes"),
+    "imagestream": ("image.openshift.io/v1", "imagestreams"),
+    "apimanager": ("apps.3scale.net/v1alpha1", "apimanagers"),
+    "apicast": ("apps.3scale.net/v1alpha1", "apicasts"),
+    "catalogsource": ("operators.coreos.com/v1alpha1", "catalogsources"),
+}
+
+# Short names and plurals as accepted by oc
+ALIASES = {
+    "po": "pod", "pods": "pod",
+    "svc": "service", "services": "service",
+    "secrets": "secret",
+    "cm": "configmap", "configmaps": "configmap",
+    "deploy": "deployment", "deployments": "deployment",
+    "dc": "deploymentconfig", "deploymentconfigs": "deploymentconfig",
+    "routes": "route",
+    "is": "imagestream", "imagestreams": "imagestream",
+    "apimanagers": "apimanager",
+    "apicasts": "apicast",
+    "catsrc": "catalogsource", "catalogsources": "catalogsource",
+}
+
+# Kinds served from ResourceCache when enabled
+CACHED_KINDS = ("route", "secret", "configmap")
+
+# oc verbs that may change the cached resources
+WRITE_VERBS = {"create", "delete", "patch", "apply", "replace", "expose", "label", "annotate", "new-app"}
+
+PATCH_TYPES = {
+    None: "application/strategic-merge-patch+json",
+    "strategic": "application/strategic-merge-patch+json",
+    "merge": "application/merge-patch+json",
+    "json": "application/json-patch+json",
+}
+
+_SESSIONS: Dict[Tuple[str, str, Any], requests.Session] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+_CACHES: Dict[Tuple[str, str, str], ResourceCache] = {}
+
+
+def _kind(resource_type: str) -> Optional[str]:
+    """Returns canonical resource kind or None if REST transport doesn't know it"""
+    resource_type = resource_type.lower().split(".", 1)[0]
+    resource_type = ALIASES.get(resource_type, resource_type)
+    return resource_type if resource_type in API_RESOURCES else None
+
+
+def _mentioned_kinds(cmd_args) -> List[str]:
+    """Returns known kinds mentioned in oc arguments, e.g. ['route'] for ['route', 'edge', 'name']"""
+    kinds = []
+    for arg in cmd_args or []:
+        if isinstance(arg, str):
+            kind = _kind(arg.split("/", 1)[0])
+            if kind is not None:
+                kinds.append(kind)
+        else:
+            kinds.extend(_mentioned_kinds(arg))
+    return kinds
+
+
+def _session(server_url: str, token: str, verify, pool_size: int) -> requests.Session:
+    """Returns pooled session shared by all clients of the same server and token"""
+    key = (server_url, token, verify)
+    with _SESSIONS_LOCK:
+        if key not in _SESSIONS:
+            session = requests.Session()
+            session.headers.update({"Authorization": f"Bearer {token}", "Accept": "application/json"})
+            session.verify = verify
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _SESSIONS[key] = session
+        return _SESSIONS[key]
+
+
+def _cache(client: "RestOpenShiftClient") -> ResourceCache:
+    """Returns resource cache shared by all clients of the same server, project and token"""
+    key = (client.api_url, client.project_name, client.api_token)
+    with _SESSIONS_LOCK:
+        if key not in _CACHES:
+            _CACHES[key] = ResourceCache(client, CACHED_KINDS)
+        return _CACHES[key]
+
+
+def stop_caches():
+    """Stops background watches of all the shared resource caches"""
+    with _SESSIONS_LOCK:
+        caches = list(_CACHES.values())
+        _CACHES.clear()
+    for cache in caches:
+        cache.stop()
+
+
+class RestOpenShiftClient(OpenShiftClient):
+    """OpenShiftClient using REST API of the cluster instead of oc where possible"""
+    # pylint: disable=too-many-public-methods
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, project_name: str, server_url: str = None, token: str = None,
+                 verify: Optional[bool] = None, pool_size: int = 10, cache: bool = False):
+        super().__init__(project_name, server_url, token)
+        if verify is None:
+            verify = os.environ.get("OPENSHIFT_CLIENT_PYTHON_DEFAULT_SKIP_TLS_VERIFY") != "true"
+        self.verify = verify
+        self.pool_size = pool_size
+        self._api_url: Optional[str] = server_url
+        self._api_token: Optional[str] = token
+        self.use_cache = cache
+
+    @property
+    def api_url(self) -> str:
+        """URL of the API server, asks oc only if it wasn't configured"""
+        if self._api_url is None:
+            self._api_url = super().do_action("whoami", ["--show-server"]).out().strip()
+        return self._api_url.rstrip("/")
+
+    @property
+    def api_token(self) -> str:
+        """Token for the API server, asks oc only if it wasn't configured"""
+        if self._api_token is None:
+            self._api_token = super().do_action("whoami", ["-t"]).out().strip()
+        return self._api_token
+
+    @property
+    def cache(self) -> Optional[ResourceCache]:
+        """Resource cache shared with the other clients of the same project, None if caching is disabled"""
+        return _cache(self) if self.use_cache else None
+
+    @property
+    def session(self) -> requests.Session:
+        """Pooled HTTPS session to the API server"""
+        return _session(self.api_url, self.api_token, self.verify, self.pool_size)
+
+    def resource_url(self, kind: str, name: Optional[str] = None, subresource: Optional[str] = None) -> str:
+        """Returns API url for given kind (as returned by _kind()) and optionally name"""
+        api_version, plural = API_RESOURCES[kind]
+        prefix = "api" if api_version == "v1" else "apis"
+        url = f"{self.api_url}/{prefix}/{api_version}/namespaces/{self.project_name}/{plural}"
+        if name is not None:
+            url = f"{url}/{name}"
+        if subresource is not None:
+            url = f"{url}/{subresource}"
+        return url
+
+    def request(self, method: str, url: str, ignore_not_found: bool = False, **kwargs) -> requests.Response:
+        """
+        Sends request to the API server
+        Raises OpenShiftPythonException on failure same as oc does, 404 response is returned as is
+        if ignore_not_found is set
+        """
+        response = self.session.request(method, url, **kwargs)
+        log.debug("[OPENSHIFT]: %s %s %s", method, url, response.status_code)
+        if response.status_code == 404 and ignore_not_found:
+            return response
+        if not response.ok:
+            raise oc.OpenShiftPythonException(
+                f"{method} {url} failed with {response.status_code}: {response.text}")
+        return response
+
+    def do_action(self, verb: str, cmd_args: Sequence[Union[str, Sequence[str]]] = None,
+                  auto_raise: bool = True, parse_output: bool = False):
+        try:
+            return super().do_action(verb, cmd_args, auto_raise, parse_output)
+        finally:
+            if verb in WRITE_VERBS and self.cache is not None:
+                # new-app/expose create resources not mentioned in the arguments
+                self.cache.invalidate(None if verb in ("new-app", "expose") else _mentioned_kinds(cmd_args))
+
+    def create(self, definition, cmd_args: Optional[List[str]] = None):
+        try:
+            return super().create(definition, cmd_args)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate()
+
+    def _cached(self, resource_type: str) -> Optional[str]:
+        """Returns kind if it is served from the cache"""
+        kind = _kind(resource_type)
+        return kind if self.cache is not None and kind in self.cache else None
+
+    def _context(self):
+        """Context for APIObjects created from REST responses"""
+        context = oc.Context()
+        context.project_name = self.project_name
+        context.api_url = self.server_url
+        context.token = self.token
+        return context
+
+    def get_resource(self, resource_type: str, name: str) -> Optional[Dict[str, Any]]:
+        cached = self._cached(resource_type)
+        if cached is not None:
+            return self.cache[cached].get(name)  # type: ignore
+        kind = _kind(resource_type)
+        if kind is None:
+            return super().get_resource(resource_type, name)
+        response = self.request("GET", self.resource_url(kind, name), ignore_not_found=True)
+        return response.json() if response.status_code != 404 else None
+
+    def list_resources(self, resource_type: str, labels: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        cached = self._cached(resource_type)
+        if cached is not None:
+            return self.cache[cached].list(labels)  # type: ignore
+        kind = _kind(resource_type)
+        if kind is None:
+            return super().list_resources(resource_type, labels)
+        params = {}
+        if labels:
+            params["labelSelector"] = ",".join(f"{k}={v}" for k, v in labels.items())
+        # Unknown CRD is reported as 404, that is the same as no resources at all
+        response = self.request("GET", self.resource_url(kind), ignore_not_found=True, params=params)
+        return response.json()["items"] if response.status_code != 404 else []
+
+    def _get_existing(self, resource_type: str, name: str) -> Dict[str, Any]:
+        """Returns resource, raises the same way as oc if it doesn't exist"""
+        resource = self.get_resource(resource_type, name)
+        if resource is None:
+            raise oc.OpenShiftPythonException(f"{resource_type}/{name} not found")
+        return resource
+
+    def env_list(self, resource_type: str, name: str) -> str:
+        kind = _kind(resource_type)
+        if kind is None:
+            return super().env_list(resource_type, name)
+        resource = self._get_existing(kind, name)
+
+        lines = []
+        for container in resource["spec"]["template"]["spec"]["containers"]:
+            lines.append(f"# {API_RESOURCES[kind][1]}/{name}, container {container['name']}")
+            for env in container.get("env", []):
+                value_from = env.get("valueFrom", {})
+                if "secretKeyRef" in value_from:
+                    ref = value_from["secretKeyRef"]
+                    lines.append(f"# {env['name']} from secret {ref['name']}, key {ref['key']}")
+                elif "configMapKeyRef" in value_from:
+                    ref = value_from["configMapKeyRef"]
+                    lines.append(f"# {env['name']} from configmap {ref['name']}, key {ref['key']}")
+                elif "value" in env:
+                    lines.append(f"{env['name']}={env['value']}")
+        return "\n".join(lines)
+
+    @property
+    def is_operator_deployment(self):
+        try:
+            return len(self.list_resources("apimanager")) > 0
+        except oc.OpenShiftPythonException:
+            return False
+
+    @property
+    def api_manager(self):
+        manager = APIManager(dict_to_model=self.list_resources("apimanager")[0], context=self._context())
+        manager.openshift = self
+        return manager
+
+    def patch(self, resource_type: str, resource_name: str, patch, patch_type: str = None):
+        kind = _kind(resource_type)
+        if kind is None:
+            super().patch(resource_type, resource_name, patch, patch_type)
+            return
+        response = self.request("PATCH", self.resource_url(kind, resource_name),
+                                data=json.dumps(patch), headers={"Content-Type": PATCH_TYPES[patch_type]})
+        self._store(kind, response.json())
+
+    def apply(self, resource: Dict[str, Any]):
+        kind = _kind(resource["kind"])
+        namespace = resource.get("metadata", {}).get("namespace", self.project_name)
+        if kind is None or namespace != self.project_name:
+            super().apply(resource)
+            return
+        # Server-side apply is REST equivalent of `oc apply`, JSON is valid YAML
+        response = self.request("PATCH", self.resource_url(kind, resource["metadata"]["name"]),
+                                params={"fieldManager": "testsuite", "force": "true"},
+                                data=json.dumps(resource), headers={"Content-Type": "application/apply-patch+yaml"})
+        self._store(kind, response.json())
+
+    def delete(self, resource_type: str, name: str, force: bool = False):
+        kind = _kind(resource_type)
+        if kind is None:
+            super().delete(resource_type, name, force)
+            return
+        params = {"gracePeriodSeconds": 0} if force else {}
+        self.request("DELETE", self.resource_url(kind, name), params=params)
+        if self._cached(kind) is not None:
+            self.cache[kind].remove(name)  # type: ignore
+
+    def _store(self, kind: str, resource: Dict[str, Any]):
+        """Puts resource written through this client to the cache"""
+        if self._cached(kind) is not None:
+            self.cache[kind].put(resource)  # type: ignore
+
+    def scale(self, deployment_name: str, replicas: int):
+        self.patch("dc", deployment_name, {"spec": {"replicas": replicas}}, patch_type="merge")
+        if replicas > 0:
+            self._wait_for_deployment(deployment_name)
+
+    def get_replicas(self, deployment_name: str):
+        return self._get_existing("dc", deployment_name)["spec"]["replicas"]
+
+    def watch(self, resource_type: str, name: Optional[str] = None,
+              labels: Optional[Dict[str, str]] = None) -> ResourceWatch:
+        """Returns watch of the resources selected by name or labels"""
+        kind = _kind(resource_type)
+        if kind is None:
+            raise ValueError(f"Resource type {resource_type} can't be watched")
+        return ResourceWatch(self, kind, name=name, labels=labels)
+
+    # pylint: disable=too-many-arguments
+    def wait_until(self, resource_type: str, success_func: Callable[[Dict[str, Any]], bool],
+                   name: Optional[str] = None, labels: Optional[Dict[str, str]] = None, timeout: int = 90):
+        if _kind(resource_type) is None:
+            super().wait_until(resource_type, success_func, name, labels, timeout)
+            return
+        self.watch(resource_type, name=name, labels=labels).until(success_func, timeout=timeout)
+
+    def _wait_for_deployment(self, deployment_name: str):
+        self.wait_until("dc", deployment_config_ready, name=deployment_name)
+
+    def wait_for_ready(self, deployment_name: str):
+        self.wait_until("deployment", deployment_ready, name=deployment_name)
+
+    def wait_for_deployments(self, *names: str, resource_type: str = "dc"):
+        wait = self._wait_for_deployment if resource_type == "dc" else self.wait_for_ready
+        with ThreadPoolExecutor(max_workers=max(len(names), 1)) as pool:
+            for future in [pool.submit(wait, name) for name in names]:
+                future.result()
+
+    def get_logs(self, deployment_name: str, since_time=None, tail: int = -1) -> str:
+        params: Dict[str, Any] = {}
+        if since_time is not None:
+            params["sinceTime"] = since_time.replace(tzinfo=timezone.utc).isoformat()
+        if tail >= 0:
+            params["tailLines"] = tail
+
+        dc = self._get_existing("dc", deployment_name)
+        latest_version = dc["status"]["latestVersion"]
+        pods = self.list_resources("pod", labels={"deployment": f"{deployment_name}-{latest_version}"})
+
+        logs = []
+        for pod in pods:
+            url = self.resource_url("pod", pod["metadata"]["name"], "log")
+            logs.append(self.request("GET", url, params=params).text)
+        return "".join(logs)
+
+    def pod_proxy(self, pod_name: str, port: int, path: str) -> str:
+        url = f"{self.resource_url('pod', f'{pod_name}:{port}', 'proxy')}/{path}"
+        return self.request("GET", url, headers={"Accept": "text/plain"}).text
+
+    def stream_pod_logs(self, pod_name: str, since_time=None) -> LogStream:
+        params: Dict[str, Any] = {"follow": "true", "timestamps": "true"}
+        if since_time is not None:
+            params["sinceTime"] = since_time.replace(tzinfo=timezone.utc).isoformat()
+        # Long lived stream would hold connection of the shared pool, so it gets its own one
+        session = requests.Session()
+        session.headers.update(self.session.headers)
+        session.verify = self.verify
+        response = session.get(self.resource_url("pod", pod_name, "log"), params=params, stream=True)
+        if not response.ok:
+            session.close()
+            raise oc.OpenShiftPythonException(f"Following log of {pod_name} failed with {response.status_code}")
+
+        def _close():
+            response.close()
+            session.close()
+
+        lines = (line.decode("utf-8", "replace") + "\n" for line in response.iter_lines())
+        return LogStream(lines, _close)
+
+    def image_stream_tag_from_trigger(self, name):
+        resource_type, resource_name = name.split("/", 1)
+        obj = self._get_existing(resource_type, resource_name)
+        for trigger in obj["spec"]["triggers"]:
+            if trigger["type"] == "ImageChange":
+                return trigger["imageChangeParams"]["from"]["name"].split(":", 1)[1]
+        raise ValueError(f"{name} without ImageChange trigger")
+
+    def image_stream_repository(self, image_stream):
+        return self._get_existing("imagestream", image_stream)["status"]["dockerImageRepository"]
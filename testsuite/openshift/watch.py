@@ -0,0 +1,134 @@
+"""
+Event driven waiting for OpenShift resources built on top of Kubernetes watch API
+
+Instead of polling with repeated `oc get` the watch keeps a stream of changes
+open and evaluates the condition on every event, therefore it returns as soon
+as the desired state is reached. Interrupted streams are resumed from the last
+seen resourceVersion.
+"""
+
+import json
+import time
+import typing
+from contextlib import closing
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import openshift as oc
+import requests
+
+if typing.TYPE_CHECKING:
+    # pylint: disable=cyclic-import
+    from testsuite.openshift.rest import RestOpenShiftClient
+
+Resource = Dict[str, Any]
+
+
+class WaitTimeoutError(Exception):
+    """Resources didn't reach desired state in time"""
+
+
+def deployment_config_ready(dc: Resource) -> bool:
+    """True, if the latest rollout of DeploymentConfig finished and all its replicas are ready"""
+    replicas = dc["spec"].get("replicas", 1)
+    status = dc.get("status", {})
+    return status.get("observedGeneration", 0) >= dc["metadata"].get("generation", 0) \
+        and status.get("latestVersion", 0) > 0 \
+        and status.get("replicas", 0) == replicas \
+        and status.get("updatedReplicas", 0) == replicas \
+        and status.get("readyReplicas", 0) == replicas \
+        and status.get("unavailableReplicas", 0) == 0
+
+
+def deployment_ready(deployment: Resource) -> bool:
+    """True, if the Deployment rolled out and all its replicas are ready"""
+    replicas = deployment["spec"].get("replicas", 1)
+    status = deployment.get("status", {})
+    return status.get("observedGeneration", 0) >= deployment["metadata"].get("generation", 0) \
+        and status.get("updatedReplicas", 0) == replicas \
+        and status.get("readyReplicas", 0) == replicas \
+        and status.get("unavailableReplicas", 0) == 0
+
+
+class ResourceWatch:
+    """Watches all the resources of a kind matching the name or labels"""
+
+    def __init__(self, client: "RestOpenShiftClient", kind: str,
+                 name: Optional[str] = None, labels: Optional[Dict[str, str]] = None) -> None:
+        self.client = client
+        self.kind = kind
+        self.params: Dict[str, Any] = {}
+        if name is not None:
+            self.params["fieldSelector"] = f"metadata.name={name}"
+        if labels:
+            self.params["labelSelector"] = ",".join(f"{k}={v}" for k, v in labels.items())
+        self.resources: Dict[str, Resource] = {}
+        self.resource_version: Optional[str] = None
+        # Currently open watch stream
+        self.stream: Optional[requests.Response] = None
+
+    def _list(self):
+        """Fetches the current state and the resourceVersion the watch starts from"""
+        response = self.client.request("GET", self.client.resource_url(self.kind), params=self.params)
+        data = response.json()
+        self.resources = {i["metadata"]["name"]: i for i in data["items"]}
+        self.resource_version = data["metadata"]["resourceVersion"]
+
+    def _events(self, timeout: float) -> Iterator[Dict[str, Any]]:
+        """Yields watch events until the server closes the stream"""
+        params = {
+            **self.params,
+            "watch": "true",
+            "allowWatchBookmarks": "true",
+            "resourceVersion": self.resource_version,
+            "timeoutSeconds": max(1, int(timeout))}
+        response = self.client.request(
+            "GET", self.client.resource_url(self.kind), params=params, stream=True, timeout=timeout + 5)
+        self.stream = response
+        with closing(response):
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+        self.stream = None
+
+    def _process(self, event: Dict[str, Any]) -> bool:
+        """Updates state from the event, returns False if the watch has to be started over"""
+        obj = event["object"]
+        if event["type"] == "ERROR":
+            # 410 Gone means resourceVersion is too old to resume from
+            if obj.get("code") == 410:
+                return False
+            raise oc.OpenShiftPythonException(f"Watch of {self.kind} failed: {obj.get('message')}")
+
+        self.resource_version = obj["metadata"]["resourceVersion"]
+        if event["type"] == "DELETED":
+            self.resources.pop(obj["metadata"]["name"], None)
+        elif event["type"] in ("ADDED", "MODIFIED"):
+            self.resources[obj["metadata"]["name"]] = obj
+        return True
+
+    def satisfied(self, success_func: Callable[[Resource], bool], min_count: int = 1) -> bool:
+        """True, if there is enough resources and all of them match success_func"""
+        return len(self.resources) >= min_count and all(success_func(i) for i in self.resources.values())
+
+    def until(self, success_func: Callable[[Resource], bool],
+              min_count: int = 1, timeout: float = 90) -> List[Resource]:
+        """
+        Blocks until at least min_count resources exist and all of them match success_func
+        :param success_func: Condition taking resource as a dict
+        :param min_count: Minimal number of resources that have to exist
+        :param timeout: Time in seconds after which WaitTimeoutError is raised
+        :return: list of the resources in the desired state
+        """
+        deadline = time.monotonic() + timeout
+        self._list()
+        while not self.satisfied(success_func, min_count):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise WaitTimeoutError(f"{self.kind} {self.params} didn't reach desired state in {timeout}s")
+            for event in self._events(remaining):
+                if not self._process(event):
+                    self._list()
+                    break
+                if self.satisfied(success_func, min_count) or time.monotonic() > deadline:
+                    break
+        return list(self.resources.values())
@@ -0,0 +1,152 @@
+"""
+Large request bodies generated on the fly
+
+Payload is deterministic pseudo-random printable content of given size. It is
+generated chunk by chunk whenever it is iterated, so even bodies of hundreds of
+MB never sit in memory and the same payload can be sent again on retry. Echoed
+bodies are verified by rolling sha256 instead of string comparison.
+
+Usage:
+    payload = Payload(100 * 1024 * 1024)
+    with stream(client, "POST", "/post", payload) as response:
+        assert response.status_code == 200
+        assert payload.verify_echo(iter_body(response))
+"""
+import base64
+import hashlib
+import itertools
+import random
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional
+from urllib.parse import urljoin
+
+from testsuite.httpx import HttpxClient
+
+CHUNK_SIZE = 64 * 1024
+
+
+class Payload:
+    """Deterministic pseudo-random body made of base64 alphabet, iterable of bytes chunks"""
+
+    def __init__(self, size: int, seed: Optional[int] = None) -> None:
+        """
+        Args:
+            :param size: Size of the body in bytes
+            :param seed: Payloads with the same seed and size are identical, random if None
+        """
+        self.size = size
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self._digest: Optional[str] = None
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self) -> Iterator[bytes]:
+        rng = random.Random(self.seed)
+        remaining = self.size
+        while remaining > 0:
+            # 3 random bytes are 4 characters of base64, Random.randbytes() is not available in python 3.8
+            count = CHUNK_SIZE // 4 * 3
+            chunk = base64.b64encode(rng.getrandbits(count * 8).to_bytes(count, "little"))[:remaining]
+            remaining -= len(chunk)
+            yield chunk
+
+    def __repr__(self):
+        return f"Payload(size={self.size}, seed={self.seed})"
+
+    @property
+    def digest(self) -> str:
+        """sha256 of the whole payload"""
+        if self._digest is None:
+            self._digest = _sha256(self)[1]
+        return self._digest
+
+    def verify(self, chunks: Iterable[bytes]) -> bool:
+        """True if the chunks make up exactly this payload"""
+        size, digest = _sha256(chunks)
+        return size == self.size and digest == self.digest
+
+    def verify_echo(self, chunks: Iterable[bytes], field: str = "data") -> bool:
+        """True if the string field of streamed JSON document (e.g. httpbin response) is this payload"""
+        return self.verify(json_string_field(chunks, field))
+
+
+def _sha256(chunks: Iterable[bytes]):
+    """Size and sha256 of the chunks"""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in chunks:
+        digest.update(chunk)
+        size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def json_string_field(chunks: Iterable[bytes], field: str) -> Iterator[bytes]:
+    """
+    Yields raw content of the first string field of the name from streamed JSON document.
+    Escaped strings are not supported, payloads don't contain anything JSON would escape.
+    """
+    marker = f'"{field}":'.encode("utf-8")
+    chunks = iter(chunks)
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        start = buffer.find(marker)
+        if start != -1:
+            buffer = buffer[start + len(marker):]
+            break
+        buffer = buffer[-len(marker):]
+    else:
+        raise ValueError(f"Field '{field}' not found")
+
+    buffer = buffer.lstrip()
+    while not buffer:
+        buffer = next(chunks, b"EOF").lstrip()
+    if not buffer.startswith(b'"'):
+        raise ValueError(f"Field '{field}' is not a string")
+
+    for chunk in itertools.chain([buffer[1:]], chunks):
+        end = chunk.find(b'"')
+        content = chunk if end == -1 else chunk[:end]
+        if b"\\" in content:
+            raise ValueError("Escaped strings are not supported")
+        yield content
+        if end != -1:
+            return
+    raise ValueError(f"Field '{field}' is not terminated")
+
+
+def iter_body(response, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Body chunks of streamed httpx or requests response"""
+    if hasattr(response, "iter_bytes"):
+        return response.iter_bytes(chunk_size)
+    return response.iter_content(chunk_size)
+
+
+@contextmanager
+def stream(client, method: str, path: str, body: Optional[Iterable[bytes]] = None, **kwargs):
+    """
+    Sends request with body streamed from iterable and yields response with unread body
+    Args:
+        :param client: HttpxClient or requests based HttpClient of the application
+        :param method: HTTP method
+        :param path: Path of the request
+        :param body: Iterable of bytes chunks, Content-Length is sent if it has len()
+        :param kwargs: Other arguments of the request, e.g. headers
+    """
+    headers = dict(kwargs.pop("headers", None) or {})
+    if body is not None and hasattr(body, "__len__"):
+        headers.setdefault("Content-Length", str(len(body)))  # type: ignore
+
+    if isinstance(client, HttpxClient):
+        with client.stream(method, path, content=body, headers=headers, **kwargs) as response:
+            yield response
+        return
+
+    # HttpClient logs whole bodies, its session is used directly
+    # pylint: disable=protected-access
+    response = client.session.request(
+        method, urljoin(client._base_url, path), data=body, headers=headers, stream=True,
+        auth=kwargs.pop("auth", client.auth), verify=client.verify, cert=client.cert, **kwargs)
+    with response:
+        yield response
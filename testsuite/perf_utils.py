@@ -8,6 +8,8 @@ import importlib_resources as resources
 import yaml
 from hyperfoil.factories import HyperfoilFactory, Benchmark
 
+from testsuite.loadgen.credentials import authority, app_id_rows, oidc_rows, user_key_rows
+
 
 def _load_benchmark(filename):
     """Loads benchmark"""
@@ -16,12 +18,6 @@ def _load_benchmark(filename):
     return benchmark
 
 
-def authority(url):
-    """Returns hyperfoil authority format of URL <hostname>:<port> from given URL."""
-    parsed_url = urlparse(url)
-    return f"{parsed_url.hostname}:{parsed_url.port}"
-
-
 class HyperfoilUtils:
     """
         Setup class for hyperfoil test.
@@ -70,13 +66,7 @@ class HyperfoilUtils:
         :param applications: list of 3scale applications
         :param filename: name of csv file
         """
-        rows = []
-        for application in applications:
-            url = authority(application.service.proxy.list()['endpoint'])
-            auth_user_key = application.service.proxy.list()['auth_user_key']
-            user_key = application['user_key']
-            rows.append([url, auth_user_key, user_key])
-        self.factory.csv_data(filename, rows)
+        self.factory.csv_data(filename, user_key_rows(applications))
 
     def add_app_id_auth(self, applications, filename):
         """
@@ -85,28 +75,18 @@ class HyperfoilUtils:
         :param applications: list of 3scale applications
         :param filename: name of csv file
         """
-        rows = []
-        for application in applications:
-            url = authority(application.service.proxy.list()['endpoint'])
-            app_id = application["application_id"]
-            app_key = application.keys.list()["keys"][0]["key"]["value"]
-            rows.append([url, app_id, app_key])
-        self.factory.csv_data(filename, rows)
+        self.factory.csv_data(filename, app_id_rows(applications))
 
-    def add_oidc_auth(self, rhsso_service_info, applications, filename):
+    def add_oidc_auth(self, rhsso_service_info, applications, filename, min_validity=12 * 60 * 60):
         """
         Adds csv file to the benchmark with following columns of a row:
         [authority url, access_token]
         :param rhsso_service_info: rhsso service info fixture
         :param applications: list of 3scale applications
         :param filename: name of csv file
+        :param min_validity: Time in seconds the tokens have to be valid for, it has to cover whole benchmark
         """
-        rows = []
-        for application in applications:
-            url = authority(application.service.proxy.list()['endpoint'])
-            token = rhsso_service_info.access_token(application)
-            rows.append([url, token])
-        self.factory.csv_data(filename, rows)
+        self.factory.csv_data(filename, oidc_rows(rhsso_service_info, applications, min_validity))
 
     def add_token_creation_data(self, rhsso_service_info, applications, filename, use_service_accounts=False):
         """
@@ -1,13 +1,19 @@
 """Provide a small client for interacting with Prometheus REST API."""
 import logging
 import time
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from math import ceil
-from typing import Optional, Callable
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Callable, Sequence, Set, Union
 
 import backoff
 import requests
 
+from testsuite.prometheus_latency import HISTOGRAMS, QUANTILES, counter_increase, latency_report
+from testsuite.prometheus_snapshot import MetricSnapshot
+
+if TYPE_CHECKING:
+    from testsuite.prometheus_scrape import MetricsScraper
+
 log = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
 # Prometheus has configured the scrape interval to 30s,
@@ -21,10 +27,22 @@ class PrometheusClient:
     """Prometheus REST API Client.
 
     Note: Contains only methods being used by actual tests.
+
+    With scraper the metrics of 3scale containers are scraped directly on every
+    query, so there is no need to wait for Prometheus scrapes. Queries the
+    scraper can't answer are sent to Prometheus if the endpoint is set.
     """
 
-    def __init__(self, endpoint: str):
+    def __init__(self, endpoint: Optional[str], scraper: Optional["MetricsScraper"] = None):
         self.endpoint = endpoint
+        self.scraper = scraper
+        self.session = requests.Session()
+        self._types: Dict[str, str] = {}
+        self._typed_containers: Set[str] = set()
+
+    def _require_endpoint(self):
+        if self.endpoint is None:
+            raise ValueError("Query can't be answered by direct scraping and Prometheus endpoint isn't set")
 
     def get_metrics(self, target: str) -> set:
         """Get metrics for a specific target.
@@ -32,42 +50,130 @@ class PrometheusClient:
         Args:
             :param target: target.
         """
+        if self.scraper is not None:
+            metrics = self.scraper.metric_names(target)
+            if metrics or self.endpoint is None:
+                return metrics
+        self._require_endpoint()
         params = {
             "match_target": "{container='%s'}" % target,
         }
-        response = requests.get(f"{self.endpoint}/api/v1/targets/metadata", params=params)
+        response = self.session.get(f"{self.endpoint}/api/v1/targets/metadata", params=params)
         response.raise_for_status()
         metrics = response.json()
         return {m["metric"] for m in metrics["data"]}
 
-    def get_metric(self, metric: str, timestamp: Optional[str] = None) -> dict:
+    def get_metric(self, metric: str, timestamp: Optional[str] = None) -> list:
         """Get a metric byt metric name.
 
         Args:
           :param metric: Metric name.
           :param timestamp: Evaluation timestamp in rfc3339 or unix_timestamp
         """
+        if self.scraper is not None and not timestamp:
+            result = self.scraper.query(metric)
+            if result is not None:
+                return result
+        self._require_endpoint()
         params = {
             "query": metric,
         }
         if timestamp:
             params["time"] = timestamp
 
-        response = requests.get(f"{self.endpoint}/api/v1/query", params=params)
+        response = self.session.get(f"{self.endpoint}/api/v1/query", params=params)
+        response.raise_for_status()
+        return response.json()["data"]["result"]
+
+    def query_range(self, query: str, start: datetime, end: datetime, step: float) -> list:
+        """Result of the range query, every series has list of [timestamp, "value"] in values
+
+        Args:
+          :param query: PromQL query
+          :param start: Naive UTC datetime of the start of the range
+          :param end: Naive UTC datetime of the end of the range
+          :param step: Resolution in seconds
+        """
+        self._require_endpoint()
+        params: Dict[str, Union[str, float]] = {
+            "query": query,
+            "start": start.replace(tzinfo=timezone.utc).timestamp(),
+            "end": end.replace(tzinfo=timezone.utc).timestamp(),
+            "step": step,
+        }
+        response = self.session.get(f"{self.endpoint}/api/v1/query_range", params=params)
         response.raise_for_status()
         return response.json()["data"]["result"]
 
+    def latency_report(self, start: datetime, end: Optional[datetime] = None,
+                       quantiles: Sequence[float] = QUANTILES) -> List[Dict]:
+        """Latency percentiles of APIcast and backend histograms of requests served within the window
+
+        Observations of the last scrape interval may not be in Prometheus yet.
+        See testsuite.prometheus_latency for the format of the report.
+
+        Args:
+          :param start: Naive UTC datetime of the start of the window, e.g. start of the test
+          :param end: Naive UTC datetime of the end of the window, defaults to now
+          :param quantiles: Quantiles included in the report
+        """
+        end = end or datetime.utcnow()
+        # Prometheus returns at most 11000 points per series
+        step = max(PROMETHEUS_REFRESH, ceil((end - start).total_seconds() / 10000))
+        names = "|".join(f"{name}_bucket" for name in HISTOGRAMS)
+        # range starts one step earlier, so the first observations in the window are counted too
+        result = self.query_range('{__name__=~"%s"}' % names, start - timedelta(seconds=step), end, step)
+        return latency_report(((series["metric"]["__name__"][:-len("_bucket")], series["metric"],
+                                counter_increase([float(value) for _, value in series["values"]]))
+                               for series in result), quantiles)
+
     def get_targets(self) -> dict:
         """Get active targets information"""
+        self._require_endpoint()
 
         params = {
             "state": "active",
         }
 
-        response = requests.get(f"{self.endpoint}/api/v1/targets", params=params)
+        response = self.session.get(f"{self.endpoint}/api/v1/targets", params=params)
         response.raise_for_status()
         return response.json()["data"]["activeTargets"]
 
+    def snapshot(self, containers: Iterable[str]) -> MetricSnapshot:
+        """
+        All the series of the containers in single call
+        Containers are scraped directly if possible, otherwise Prometheus is queried with regex selector.
+        Args:
+            :param containers: Names of the containers, e.g. ["apicast-staging", "backend-listener"]
+        """
+        containers = list(containers)
+        if self.scraper is not None and (self.endpoint is None or all(self.scraper.targets(i) for i in containers)):
+            snapshot = MetricSnapshot()
+            for types, samples in self.scraper.scrape_all(containers).values():
+                snapshot.types.update(types)
+                snapshot.extend(samples)
+            return snapshot
+
+        self._require_endpoint()
+        selector = '{container=~"%s"}' % "|".join(containers)
+        missing = [i for i in containers if i not in self._typed_containers]
+        if missing:
+            # types don't change, metadata of each container is fetched only once
+            response = self.session.get(f"{self.endpoint}/api/v1/targets/metadata",
+                                        params={"match_target": '{container=~"%s"}' % "|".join(missing)})
+            response.raise_for_status()
+            for metadata in response.json()["data"]:
+                self._types[metadata["metric"]] = metadata["type"]
+            self._typed_containers.update(missing)
+        response = self.session.get(f"{self.endpoint}/api/v1/query", params={"query": selector})
+        response.raise_for_status()
+        data = response.json()["data"]["result"]
+        snapshot = MetricSnapshot(dict(self._types), data[0]["value"][0] if data else None)
+        for series in data:
+            labels = dict(series["metric"])
+            snapshot.add(labels.pop("__name__"), labels, float(series["value"][1]))
+        return snapshot
+
     def has_metric(self, metric: str, trigger_request: Optional[Callable] = None) -> bool:
         """
         Returns true if the given metric is collected by the current settings
@@ -85,7 +191,8 @@ class PrometheusClient:
                 # when testing on a new install, the metric does not have to be present
                 trigger_request()
                 # waits to refresh the prometheus metrics
-                time.sleep(PROMETHEUS_REFRESH + 2)
+                if self.scraper is None:
+                    time.sleep(PROMETHEUS_REFRESH + 2)
                 _has_metric = self.get_metric(metric) != []
 
         except requests.exceptions.HTTPError:
@@ -124,6 +231,13 @@ class PrometheusClient:
         if after is None:
             after = datetime.utcnow()
 
+        if self.scraper is not None and (self.scraper.targets(target_container) or self.endpoint is None):
+            # metrics are scraped on every query, only the requested time has to pass
+            wait_time = (after - datetime.utcnow()).total_seconds()
+            if wait_time > 0:
+                time.sleep(wait_time)
+            return
+
         def _time_of_scrape():
             for target in self.get_targets():
                 if "container" in target["labels"].keys() and target["labels"]["container"] == target_container:
@@ -0,0 +1,120 @@
+"""
+Latency percentiles from the response time histograms of APIcast and backend
+
+APIcast and backend-listener export response time histograms, the increase of
+their buckets over a time window gives the distribution of the latency of the
+requests served in that window. Percentiles are interpolated within the buckets
+the same way as histogram_quantile() of Prometheus does, so their precision is
+limited by the bucket boundaries. Rows of the report are grouped by container,
+service and status or request type, whichever the histogram has.
+
+Usage:
+    start = datetime.utcnow()
+    ...
+    for row in prometheus.latency_report(start):
+        print(row["component"], row.get("service_id"), row["count"], row["p50"], row["p99"])
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from testsuite.prometheus_snapshot import MetricDelta, MetricSnapshot
+
+# Histogram families and the part of the request they measure
+HISTOGRAMS = {
+    "total_response_time_seconds": "apicast total",
+    "upstream_response_time_seconds": "apicast upstream",
+    "apisonator_listener_response_times": "backend",
+    "apisonator_listener_internal_api_response_times": "backend internal api",
+}
+
+# Labels the rows are grouped by, other labels (pod, instance, ...) are aggregated
+GROUP_LABELS = ("container", "service_id", "service_system_name", "request_type", "status", "resp_code")
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def counter_increase(values: Sequence[float]) -> float:
+    """Increase of the counter over consecutive samples, value after counter reset is counted from zero"""
+    increase = 0.0
+    for previous, current in zip(values, values[1:]):
+        increase += current - previous if current >= previous else current
+    return increase
+
+
+def histogram_quantile(quantile: float, buckets: Dict[float, float]) -> Optional[float]:
+    """
+    Quantile interpolated within the cumulative buckets like Prometheus histogram_quantile()
+    Args:
+        :param quantile: Quantile between 0 and 1
+        :param buckets: Cumulative count of observations by the upper bound of the bucket
+    Returns:
+        :returns: Value of the quantile, None if there are no observations
+    """
+    bounds = sorted(buckets)
+    if not bounds or not math.isinf(bounds[-1]):
+        return None
+    counts: List[float] = []
+    for bound in bounds:
+        # counts may be non-monotonic due to scrapes of different pods
+        counts.append(max(buckets[bound], counts[-1] if counts else 0.0))
+    total = counts[-1]
+    if total <= 0:
+        return None
+    rank = quantile * total
+    for index, (bound, count) in enumerate(zip(bounds, counts)):
+        if count < rank:
+            continue
+        if math.isinf(bound):
+            # the quantile is above the highest finite bucket
+            return bounds[index - 1] if index > 0 else None
+        lower = bounds[index - 1] if index > 0 else min(0.0, bound)
+        previous = counts[index - 1] if index > 0 else 0.0
+        if count == previous:
+            return bound
+        return lower + (bound - lower) * (rank - previous) / (count - previous)
+    return None
+
+
+def _name(quantile: float) -> str:
+    return f"p{quantile * 100:g}"
+
+
+def latency_report(increases: Iterable[Tuple[str, Dict[str, str], float]],
+                   quantiles: Sequence[float] = QUANTILES) -> List[Dict]:
+    """
+    Percentiles of the histograms in milliseconds grouped by GROUP_LABELS
+    Args:
+        :param increases: Histogram family, labels of the bucket series and its increase
+        :param quantiles: Quantiles included in the report, e.g. 0.99 as p99
+    Returns:
+        :returns: Rows with histogram, component, group labels, count and the percentiles
+    """
+    groups: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Dict[float, float]] = {}
+    for name, labels, increase in increases:
+        if "le" not in labels:
+            continue
+        key = (name, tuple((label, labels[label]) for label in GROUP_LABELS if label in labels))
+        buckets = groups.setdefault(key, {})
+        bound = float(labels["le"])
+        buckets[bound] = buckets.get(bound, 0.0) + increase
+
+    report = []
+    for (name, group), buckets in sorted(groups.items()):
+        count = buckets.get(math.inf, 0.0)
+        if count <= 0:
+            continue
+        row: Dict = {"histogram": name, "component": HISTOGRAMS.get(name, name), **dict(group), "count": count}
+        for quantile in quantiles:
+            value = histogram_quantile(quantile, buckets)
+            row[_name(quantile)] = round(value * 1000, 1) if value is not None else None
+        report.append(row)
+    return report
+
+
+def snapshot_latency_report(before: MetricSnapshot, after: MetricSnapshot,
+                            quantiles: Sequence[float] = QUANTILES) -> List[Dict]:
+    """Latency report of the window between two snapshots, usable with direct scraping"""
+    delta = MetricDelta(before, after)
+    return latency_report(((name, dict(labels), increase)
+                           for name in HISTOGRAMS
+                           for labels, increase in delta.changes(f"{name}_bucket").items()), quantiles)
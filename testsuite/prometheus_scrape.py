@@ -0,0 +1,245 @@
+"""
+Scraping metrics of 3scale pods directly instead of waiting for Prometheus
+
+Prometheus scrapes the 3scale components every PROMETHEUS_REFRESH seconds, so
+every check of a changed metric has to wait for the next scrape. MetricsScraper
+resolves the pods of the components through OpenShiftClient and reads their
+exposition endpoints through the API server pod proxy, which works from
+outside of the cluster too. Samples are labeled with container, pod and
+namespace the same way as Prometheus labels them, so simple selectors
+(name{label="value", label=~"regex", ...}) give the same result as the
+Prometheus query API.
+"""
+import logging
+import math
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    # pylint: disable=cyclic-import
+    from testsuite.openshift.client import OpenShiftClient
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# Metrics ports of the 3scale containers, used when the container doesn't name its metrics port
+DEFAULT_PORTS = {
+    "apicast-staging": 9421,
+    "apicast-production": 9421,
+    "backend-listener": 9394,
+    "backend-worker": 9421,
+    "system-master": 9394,
+    "system-provider": 9395,
+    "system-developer": 9396,
+    "system-sidekiq": 9394,
+    "zync": 9393,
+    "que": 9394,
+}
+
+_LABEL = re.compile(r'\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*"((?:[^"\\]|\\.)*)"\s*,?')
+_SELECTOR = re.compile(r"^\s*([a-zA-Z_:][a-zA-Z0-9_:]*)\s*(?:\{(.*)\})?\s*$")
+_MATCHER = re.compile(r'\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*(=~|!~|!=|=)\s*"((?:[^"\\]|\\.)*)"\s*(?:,|$)')
+_UNESCAPE = {"\\\\": "\\", '\\"': '"', "\\n": "\n"}
+
+
+class Sample(NamedTuple):
+    """Single sample of the exposition, labels include the target labels"""
+    name: str
+    labels: Dict[str, str]
+    value: float
+
+
+def _unescape(value: str) -> str:
+    if "\\" not in value:
+        return value
+    return re.sub(r'\\[\\"n]', lambda match: _UNESCAPE[match.group(0)], value)
+
+
+def parse_labels(text: str) -> Dict[str, str]:
+    """Labels of the sample from the text between the braces"""
+    return {match.group(1): _unescape(match.group(2)) for match in _LABEL.finditer(text)}
+
+
+def parse_text(text: str, target: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, str], List[Sample]]:
+    """
+    Metric types and samples of Prometheus text exposition format
+    Args:
+        :param text: Body of the /metrics response
+        :param target: Labels added to every sample, e.g. container and pod
+    Returns:
+        :returns: Types of the metric families by name and the samples
+    """
+    types: Dict[str, str] = {}
+    samples: List[Sample] = []
+    target = target or {}
+    for line in text.splitlines():
+        if not line or line[0] == "#":
+            if line.startswith("# TYPE "):
+                parts = line.split()
+                if len(parts) >= 4:
+                    types[parts[2]] = parts[3]
+            continue
+        brace = line.find("{")
+        if brace == -1:
+            parts = line.split()
+            if len(parts) < 2:
+                continue
+            name, labels, rest = parts[0], {}, parts[1]
+        else:
+            end = line.rfind("}")
+            name, labels, rest = line[:brace].strip(), parse_labels(line[brace + 1:end]), line[end + 1:]
+        try:
+            value = float(rest.split()[0])
+        except (ValueError, IndexError):
+            log.debug("Unparsable sample %s", line)
+            continue
+        samples.append(Sample(name, {**labels, **target}, value))
+    return types, samples
+
+
+def format_value(value: float) -> str:
+    """Value formatted the way Prometheus API does"""
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def parse_selector(query: str) -> Optional[Tuple[str, List[Tuple[str, str, str]]]]:
+    """Metric name and label matchers of simple selector, None for anything more complex"""
+    match = _SELECTOR.match(query)
+    if match is None:
+        return None
+    matchers = []
+    body = (match.group(2) or "").strip()
+    position = 0
+    while position < len(body):
+        matcher = _MATCHER.match(body, position)
+        if matcher is None:
+            return None
+        matchers.append((matcher.group(1), matcher.group(2), _unescape(matcher.group(3))))
+        position = matcher.end()
+    return match.group(1), matchers
+
+
+def matches(labels: Dict[str, str], matchers: Iterable[Tuple[str, str, str]]) -> bool:
+    """True if the labels satisfy all the matchers of parse_selector()"""
+    for label, operator, expected in matchers:
+        value = labels.get(label, "")
+        if operator in ("=", "!="):
+            matched = value == expected
+        else:
+            matched = re.fullmatch(expected, value) is not None
+        if matched == (operator[0] == "!"):
+            return False
+    return True
+
+
+def family(name: str, types: Dict[str, str]) -> str:
+    """Name of the metric family of the sample, e.g. histogram of its _bucket sample"""
+    if name in types:
+        return name
+    for suffix in ("_bucket", "_count", "_sum", "_total", "_created"):
+        if name.endswith(suffix) and name[:-len(suffix)] in types:
+            return name[:-len(suffix)]
+    return name
+
+
+class MetricsScraper:
+    """
+    Scrapes metrics of the 3scale containers through the OpenShift API
+
+    Usage:
+        scraper = MetricsScraper(openshift())
+        scraper.query('apicast_status{container="apicast-staging"}')
+    """
+
+    def __init__(self, openshift: "OpenShiftClient", ports: Optional[Dict[str, int]] = None,
+                 containers: Optional[Iterable[str]] = None) -> None:
+        """
+        Args:
+            :param openshift: Client of the project with the 3scale pods
+            :param ports: Metrics ports of the containers overriding DEFAULT_PORTS
+            :param containers: Containers scraped by queries, defaults to all with known port
+        """
+        self.openshift = openshift
+        self.ports = {**DEFAULT_PORTS, **(ports or {})}
+        self.containers = list(containers or self.ports)
+        self._pods: Optional[Dict[str, List[Tuple[str, int]]]] = None
+        # containers known to expose the metric family, to scrape only them
+        self._exposed_by: Dict[str, Set[str]] = {}
+
+    def targets(self, container: str) -> List[Tuple[str, int]]:
+        """Running pods of the container with the metrics port"""
+        if self._pods is None:
+            pods: Dict[str, List[Tuple[str, int]]] = {}
+            for pod in self.openshift.list_resources("pod"):
+                if pod.get("status", {}).get("phase") != "Running":
+                    continue
+                for spec in pod["spec"]["containers"]:
+                    port = self._port(spec)
+                    if port is not None:
+                        pods.setdefault(spec["name"], []).append((pod["metadata"]["name"], port))
+            self._pods = pods
+        return self._pods.get(container, [])
+
+    def _port(self, spec: dict) -> Optional[int]:
+        for port in spec.get("ports", []):
+            if "metrics" in port.get("name", ""):
+                return port["containerPort"]
+        return self.ports.get(spec["name"])
+
+    def scrape(self, container: str) -> Tuple[Dict[str, str], List[Sample]]:
+        """Types and samples of all the pods of the container"""
+        types: Dict[str, str] = {}
+        samples: List[Sample] = []
+        for pod, port in self.targets(container):
+            try:
+                text = self.openshift.pod_proxy(pod, port, "metrics")
+            # pylint: disable=broad-except
+            except Exception as error:
+                # pod may be gone, it is looked up again next time
+                log.warning("Scraping metrics of %s failed: %s", pod, error)
+                self._pods = None
+                continue
+            target = {"container": container, "pod": pod, "namespace": self.openshift.project_name,
+                      "instance": f"{pod}:{port}"}
+            pod_types, pod_samples = parse_text(text, target)
+            types.update(pod_types)
+            samples.extend(pod_samples)
+        for name in {i.name for i in samples} | {family(i.name, types) for i in samples}:
+            self._exposed_by.setdefault(name, set()).add(container)
+        return types, samples
+
+    def scrape_all(self, containers: Optional[Iterable[str]] = None) -> Dict[str, Tuple[Dict[str, str], List[Sample]]]:
+        """Scrapes the containers in parallel"""
+        containers = [i for i in (containers or self.containers) if self.targets(i)]
+        with ThreadPoolExecutor(max_workers=max(len(containers), 1)) as pool:
+            return dict(zip(containers, pool.map(self.scrape, containers)))
+
+    def metric_names(self, container: str) -> Set[str]:
+        """Names of the metric families exposed by the container, empty if it has no pods"""
+        types, samples = self.scrape(container)
+        return {family(i.name, types) for i in samples} | set(types)
+
+    def query(self, query: str) -> Optional[List[dict]]:
+        """
+        Result of simple selector in the format of Prometheus query API
+        None if the query isn't simple selector or no container could be scraped
+        """
+        selector = parse_selector(query)
+        if selector is None:
+            return None
+        name, matchers = selector
+        containers = [value for label, operator, value in matchers if label == "container" and operator == "="]
+        scraped = self.scrape_all(containers or self._exposed_by.get(name) or self.containers)
+        if not scraped:
+            return None
+        now = time.time()
+        return [{"metric": {"__name__": sample.name, **sample.labels}, "value": [now, format_value(sample.value)]}
+                for _, samples in scraped.values() for sample in samples
+                if sample.name == name and matches(sample.labels, matchers)]
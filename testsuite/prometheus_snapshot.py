@@ -0,0 +1,177 @@
+"""
+Snapshots of all the metrics of 3scale containers and typed deltas between them
+
+Instead of querying metrics one by one before and after the tested action,
+PrometheusClient.snapshot() captures every series of the containers in one
+call and MetricDelta computes the change of any selector between two
+snapshots according to the metric type:
+    counter - increase, value after counter reset is counted from zero
+    gauge - difference of the values
+    histogram - per bucket increase (buckets()), _count and _sum as counters
+Series missing in the first snapshot are counted from zero.
+
+Usage:
+    before = prometheus.snapshot(["backend-listener"])
+    ...
+    after = prometheus.snapshot(["backend-listener"])
+    assert_delta(before, after, {'apisonator_listener_response_codes{request_type="authrep",resp_code="2xx"}': 10})
+"""
+import sys
+import time
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from testsuite.prometheus_scrape import Sample, family, format_value, matches, parse_selector
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+# Label sets are shared by all the snapshots, series of consecutive snapshots are mostly the same
+_LABEL_SETS: Dict[LabelSet, LabelSet] = {}
+
+
+def intern_labels(labels: Dict[str, str]) -> LabelSet:
+    """Sorted label pairs shared with every equal label set"""
+    key = tuple(sorted((sys.intern(name), sys.intern(value)) for name, value in labels.items()))
+    return _LABEL_SETS.setdefault(key, key)
+
+
+def metric_type(name: str, types: Dict[str, str]) -> str:
+    """Type of the series, samples of histograms and summaries other than quantiles are counters"""
+    metric_family = family(name, types)
+    kind = types.get(metric_family, "untyped")
+    if kind in ("histogram", "summary"):
+        return "gauge" if name == metric_family else "counter"
+    if kind == "untyped" and name.endswith(("_total", "_count", "_sum", "_bucket")):
+        return "counter"
+    return kind
+
+
+class MetricSnapshot:
+    """
+    Values of all the series at single point of time
+    Series are identified by name and interned label set, values are kept in array.
+    """
+
+    def __init__(self, types: Optional[Dict[str, str]] = None, taken: Optional[float] = None) -> None:
+        self.types = types or {}
+        self.taken = taken or time.time()
+        self.series: List[Tuple[str, LabelSet]] = []
+        self.values = array("d")
+        self._index: Dict[Tuple[str, LabelSet], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    def add(self, name: str, labels: Dict[str, str], value: float):
+        """Sets value of the series, the value of the same series reported twice is overwritten"""
+        key = (sys.intern(name), intern_labels(labels))
+        position = self._index.get(key)
+        if position is None:
+            self._index[key] = len(self.series)
+            self.series.append(key)
+            self.values.append(value)
+        else:
+            self.values[position] = value
+
+    def extend(self, samples: Iterable[Sample]):
+        """Adds samples of the scrape"""
+        for sample in samples:
+            self.add(sample.name, sample.labels, sample.value)
+
+    def get(self, name: str, labels: LabelSet) -> Optional[float]:
+        """Value of the series, None if it isn't present"""
+        position = self._index.get((name, labels))
+        return None if position is None else self.values[position]
+
+    def select(self, selector: str) -> Iterator[Tuple[str, LabelSet, float]]:
+        """Series matching simple selector, e.g. 'apicast_status{status=~"2.."}'"""
+        parsed = parse_selector(selector)
+        if parsed is None:
+            raise ValueError(f"Only simple selectors are supported, got {selector}")
+        name, matchers = parsed
+        for position, (series_name, labels) in enumerate(self.series):
+            if series_name == name and matches(dict(labels), matchers):
+                yield series_name, labels, self.values[position]
+
+
+class MetricDelta:
+    """
+    Typed change of the series between two snapshots
+
+    Usage:
+        delta = MetricDelta(before, after)
+        delta.change('apicast_status{status="200"}')
+        delta.buckets('total_response_time_seconds{service_id="12"}')
+    """
+
+    def __init__(self, before: MetricSnapshot, after: MetricSnapshot) -> None:
+        self.before = before
+        self.after = after
+        self.types = {**before.types, **after.types}
+
+    def series_change(self, name: str, labels: LabelSet) -> float:
+        """Change of single series according to its type"""
+        after = self.after.get(name, labels)
+        before = self.before.get(name, labels)
+        if metric_type(name, self.types) == "counter":
+            if after is None:
+                return 0.0
+            # counter reset, the process restarted and counts from zero
+            if before is None or after < before:
+                return after
+            return after - before
+        return (after or 0.0) - (before or 0.0)
+
+    def changes(self, selector: str) -> Dict[LabelSet, float]:
+        """Change of every matching series, series of gauges missing in one of the snapshots count as zero"""
+        result = {}
+        for snapshot in (self.after, self.before):
+            for name, labels, _ in snapshot.select(selector):
+                if labels not in result:
+                    result[labels] = self.series_change(name, labels)
+        return result
+
+    def change(self, selector: str) -> float:
+        """Total change of the matching series"""
+        return float(sum(self.changes(selector).values()))
+
+    def buckets(self, selector: str) -> Dict[str, float]:
+        """
+        Increase of the histogram buckets, ordered by upper bound
+        Args:
+            :param selector: Selector of the histogram family, e.g. 'total_response_time_seconds{service_id="1"}'
+        """
+        parsed = parse_selector(selector)
+        if parsed is None:
+            raise ValueError(f"Only simple selectors are supported, got {selector}")
+        name = parsed[0]
+        result: Dict[str, float] = {}
+        for labels, change in self.changes(f"{name}_bucket{selector.strip()[len(name):]}").items():
+            bound = dict(labels).get("le", "+Inf")
+            result[bound] = result.get(bound, 0.0) + change
+        return dict(sorted(result.items(), key=lambda item: float(item[0])))
+
+    def describe(self, selector: str) -> str:
+        """Human readable changes of the matching series"""
+        return "\n".join(
+            f"  {{{', '.join(f'{name}={value!r}' for name, value in labels)}}}: {format_value(change)}"
+            for labels, change in self.changes(selector).items()) or "  no matching series"
+
+
+def assert_delta(before: MetricSnapshot, after: MetricSnapshot, expected: Dict[str, float], tolerance: float = 0):
+    """
+    Asserts the change of the selectors between the snapshots, all the mismatches are reported at once
+    Args:
+        :param before: Snapshot taken before the tested action
+        :param after: Snapshot taken after the tested action
+        :param expected: Expected total change by selector
+        :param tolerance: Allowed absolute difference from the expected change
+    """
+    delta = MetricDelta(before, after)
+    mismatches = []
+    for selector, value in expected.items():
+        actual = delta.change(selector)
+        if abs(actual - value) > tolerance:
+            mismatches.append(f"{selector} changed by {format_value(actual)}, expected {format_value(float(value))}\n"
+                              f"{delta.describe(selector)}")
+    assert not mismatches, "\n".join(mismatches)
@@ -0,0 +1,270 @@
+"""
+Bulk provisioning of 3scale objects
+
+ProvisioningSpec describes N products each with M backends, K mapping rules per
+backend and A applications. ProvisioningPlanner turns it into dependency graph
+(backend -> mapping rules, backends -> service with backend usages -> plan ->
+limits -> applications) and executes it with bounded concurrency. Every proxy
+is deployed exactly once after all its mapping rules and policies are in place.
+Objects are created through custom_* fixtures, so cleanup stays with their
+finalizers.
+"""
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import backoff
+import requests
+from threescale_api import errors
+
+from testsuite import rawobj
+from testsuite.utils import randomize
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+RETRIABLE = (errors.ApiClientError, requests.exceptions.ConnectionError)
+# Fields identifying object that could have been created by failed request
+MAPPING_KEYS = ("pattern", "http_method", "metric_id")
+LIMIT_KEYS = ("period", "value")
+
+
+def _permanent(error: Exception) -> bool:
+    """Client errors (4xx) would just fail again, only connection errors and server errors are retried"""
+    return isinstance(error, errors.ApiClientError) and not (isinstance(error.code, int) and error.code >= 500)
+
+
+class ProvisioningError(Exception):
+    """Some objects could not be provisioned"""
+
+
+# pylint: disable=too-many-instance-attributes,too-few-public-methods
+class ProvisioningSpec:
+    """Declarative description of 3scale objects to provision"""
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, products: int = 1, backends: int = 1, applications: int = 1, mapping_rules: int = 0,
+                 mapping_methods: Sequence[str] = ("GET",), proxy_mapping_rules: Sequence[Tuple[str, str]] = (),
+                 delete_default_mapping: bool = False, policies: Sequence[dict] = (), limits: Sequence[dict] = (),
+                 backend_endpoint: Optional[str] = None) -> None:
+        """
+        Args:
+            :param products: Number of products (services)
+            :param backends: Number of backends for each product, mounted at /0, /1...
+            :param applications: Number of applications for each product
+            :param mapping_rules: Number of mapping rules /anything/{i} for each backend and method
+            :param mapping_methods: HTTP methods of backend mapping rules
+            :param proxy_mapping_rules: Additional (pattern, method) mapping rules of each product
+            :param delete_default_mapping: If True, default mapping rule of the product is removed
+            :param policies: Policy configs appended to the policy chain, rawobj.PolicyConfig should be used
+            :param limits: Limits of the plan for hits metric, e.g. {"period": "minute", "value": 10}
+            :param backend_endpoint: Private endpoint of the backends
+        """
+        self.products = products
+        self.backends = backends
+        self.applications = applications
+        self.mapping_rules = mapping_rules
+        self.mapping_methods = mapping_methods
+        self.proxy_mapping_rules = proxy_mapping_rules
+        self.delete_default_mapping = delete_default_mapping
+        self.policies = policies
+        self.limits = limits
+        self.backend_endpoint = backend_endpoint
+
+
+class Task:
+    """Node of the provisioning graph"""
+
+    def __init__(self, name: str, func: Callable, deps: Iterable["Task"] = ()) -> None:
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.result = None
+
+    def __repr__(self):
+        return f"Task({self.name})"
+
+
+class ProvisioningGraph:
+    """
+    Runs tasks as soon as all their dependencies are finished with bounded concurrency
+    Tasks are not retried as a whole, they aren't idempotent, retries belong to the single API calls.
+    """
+
+    def __init__(self, max_workers: int = 8) -> None:
+        self.max_workers = max_workers
+        self.tasks: List[Task] = []
+
+    def add(self, name: str, func: Callable, *deps: Task) -> Task:
+        """Adds task, func is called without arguments, results of dependencies are in their result attribute"""
+        task = Task(name, func, deps)
+        self.tasks.append(task)
+        return task
+
+    def run(self):
+        """
+        Executes the graph, no new tasks are started after first failure.
+        Raises ProvisioningError with the first failure once the running tasks are finished.
+        """
+        pending = list(self.tasks)
+        done = set()
+        failures = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {}
+
+            def _submit_ready():
+                for task in [i for i in pending if all(dep in done for dep in i.deps)]:
+                    pending.remove(task)
+                    futures[pool.submit(task.func)] = task
+
+            _submit_ready()
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = futures.pop(future)
+                    try:
+                        task.result = future.result()
+                        done.add(task)
+                    except Exception as err:  # pylint: disable=broad-except
+                        log.error("Provisioning task %s failed: %s", task.name, err)
+                        failures.append((task, err))
+                if not failures:
+                    _submit_ready()
+
+        if failures:
+            failed, error = failures[0]
+            raise ProvisioningError(f"{failed.name} failed, {len(pending)} task(s) not started") from error
+
+
+class Provisioned:
+    """Products and applications created by the planner"""
+
+    def __init__(self, services: list, applications: list) -> None:
+        self.services = services
+        self.applications = applications
+
+
+class ProvisioningPlanner:
+    """
+    Creates 3scale objects described by ProvisioningSpec through custom_* fixtures
+    Single API calls done by the planner itself are retried on connection and server errors, creates only
+    if the object doesn't exist after all. The fixtures doing several calls at once are not retried.
+
+    Usage:
+        planner = ProvisioningPlanner(custom_backend, custom_service, custom_app_plan, custom_application)
+        provisioned = planner.provision(ProvisioningSpec(products=10, backends=10, applications=10), ...)
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, custom_backend, custom_service, custom_app_plan, custom_application,
+                 max_workers: int = 8, max_tries: int = 3) -> None:
+        self.custom_backend = custom_backend
+        self.custom_service = custom_service
+        self.custom_app_plan = custom_app_plan
+        self.custom_application = custom_application
+        self.max_workers = max_workers
+        self.max_tries = max_tries
+
+    # pylint: disable=too-many-locals
+    def provision(self, spec: ProvisioningSpec, service_settings: dict, service_proxy_settings: dict,
+                  name: Callable[[], str], hooks=None) -> Provisioned:
+        """
+        Builds and executes the provisioning graph
+        Args:
+            :param spec: What should be created
+            :param service_settings: Params of the services, name is replaced
+            :param service_proxy_settings: Proxy params of the services, used if there are no backends
+            :param name: Returns unique name for next product
+            :param hooks: Lifecycle hooks passed to services and applications
+        """
+        graph = ProvisioningGraph(self.max_workers)
+        services: List[Task] = []
+        applications: List[Task] = []
+
+        for _ in range(spec.products):
+            backends: Dict[str, Task] = {}
+            rules: List[Task] = []
+            for j in range(spec.backends):
+                backend = graph.add("backend", lambda: self.custom_backend(endpoint=spec.backend_endpoint))
+                backends[f"/{j}"] = backend
+                for method in spec.mapping_methods if spec.mapping_rules else ():
+                    rules.append(graph.add(
+                        "backend mapping rules", self._backend_mapping_rules(backend, spec.mapping_rules, method),
+                        backend))
+
+            params = {**service_settings, "name": name()}
+            service = graph.add("service", self._service(params, service_proxy_settings, backends, hooks),
+                                *backends.values())
+            proxy = graph.add("proxy", self._proxy(service, spec), service)
+            deploy = graph.add("deploy", lambda svc=service: self._retry(svc.result.proxy.deploy), proxy, *rules)
+            plan = graph.add("plan", lambda svc=service: self.custom_app_plan(
+                rawobj.ApplicationPlan(randomize("AppPlan")), svc.result), service)
+            limits = graph.add("limits", self._limits(service, plan, spec.limits), plan)
+            services.append(service)
+            for _ in range(spec.applications):
+                applications.append(graph.add("application", lambda plan=plan: self.custom_application(
+                    rawobj.Application(randomize("App"), plan.result), hooks=hooks), limits, deploy))
+
+        start = time.monotonic()
+        graph.run()
+        log.info("Provisioned %s task(s) in %.1fs", len(graph.tasks), time.monotonic() - start)
+        return Provisioned([i.result for i in services], [i.result for i in applications])
+
+    def _retry(self, func: Callable, *args, **kwargs):
+        """Calls single API call, retried on connection errors and 5xx"""
+        return backoff.on_exception(backoff.fibo, RETRIABLE, max_tries=self.max_tries, giveup=_permanent,
+                                    jitter=None)(func)(*args, **kwargs)
+
+    def _create(self, collection, params: dict, keys: Sequence[str]):
+        """
+        Creates single object, retried on connection errors and 5xx as _retry does.
+        Failed create could have been done by the server anyway, so it is repeated only
+        if the collection has no object with the same values of the keys.
+        """
+        attempted = False
+
+        def _attempt():
+            nonlocal attempted
+            if attempted:
+                for entity in collection.list():
+                    if all(str(entity.get(key)) == str(params[key]) for key in keys):
+                        return entity
+            attempted = True
+            return collection.create(params)
+        return self._retry(_attempt)
+
+    def _backend_mapping_rules(self, backend: Task, count: int, method: str):
+        def _create():
+            metric = self._retry(backend.result.metrics.list)[0]
+            for i in range(count):
+                self._create(backend.result.mapping_rules, rawobj.Mapping(metric, f"/anything/{i}", method),
+                             MAPPING_KEYS)
+        return _create
+
+    def _service(self, params, proxy_params, backends: Dict[str, Task], hooks):
+        def _create():
+            return self.custom_service(
+                params, proxy_params, {path: task.result for path, task in backends.items()} or None,
+                hooks=hooks, deploy=False)
+        return _create
+
+    def _proxy(self, service: Task, spec: ProvisioningSpec):
+        def _configure():
+            proxy = self._retry(service.result.proxy.list)
+            if spec.delete_default_mapping:
+                self._retry(proxy.mapping_rules.delete, self._retry(proxy.mapping_rules.list)[0]["id"])
+            if spec.proxy_mapping_rules:
+                metric = self._retry(service.result.metrics.list)[0]
+                for pattern, method in spec.proxy_mapping_rules:
+                    self._create(proxy.mapping_rules, rawobj.Mapping(metric, pattern, method), MAPPING_KEYS)
+            if spec.policies:
+                proxy.policies.append(*spec.policies)
+        return _configure
+
+    def _limits(self, service: Task, plan: Task, limits: Sequence[dict]):
+        def _create():
+            if limits:
+                metric = self._retry(service.result.metrics.list)[0]
+                for limit in limits:
+                    self._create(plan.result.limits(metric), limit, LIMIT_KEYS)
+        return _create
@@ -1,9 +1,13 @@
 """Utility classes for working with RHSSO server"""
 import functools
+import logging
+import threading
+import time
+from typing import Dict, Tuple
 
 import backoff
 from keycloak import KeycloakOpenID
-from keycloak.exceptions import KeycloakGetError
+from keycloak.exceptions import KeycloakError, KeycloakGetError
 from threescale_api.auth import BaseClientAuth
 from threescale_api.resources import Service
 from threescale_api.utils import HttpClient
@@ -11,7 +15,36 @@ from threescale_api.utils import HttpClient
 from testsuite.httpx import HttpxOidcClientAuth
 from testsuite.rhsso.objects import Realm, Client, RHSSO, Token
 
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
+# Cached tokens are renewed this many seconds before they expire
+TOKEN_EXPIRY_MARGIN = 30
+
+
+class CachedToken:
+    """Token together with the secret of the client and the time when it expires"""
+
+    def __init__(self, secret: str, token: dict) -> None:
+        self.secret = secret
+        self.update(token)
+
+    def update(self, token: dict):
+        """Stores newly obtained token"""
+        now = time.monotonic()
+        self.token = token
+        self.expires_at = now + token.get("expires_in", 0)
+        self.refresh_expires_at = now + token.get("refresh_expires_in", 0) if "refresh_token" in token else now
+
+    def valid(self, min_validity: float) -> bool:
+        """True, if the token is valid for at least min_validity seconds"""
+        return self.expires_at - time.monotonic() > min_validity
+
+    def refreshable(self) -> bool:
+        """True, if the refresh token can be still used"""
+        return self.refresh_expires_at - time.monotonic() > TOKEN_EXPIRY_MARGIN
+
+
+# pylint: disable=too-many-instance-attributes
 class RHSSOServiceConfiguration:
     """
     Wrapper for all information that tests need to know about RHSSO
@@ -26,6 +59,9 @@ class RHSSOServiceConfiguration:
         self.username = username
         self.password = password
         self._oidc_client = None
+        self._tokens: Dict[Tuple[str, str, str], CachedToken] = {}
+        self._token_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
 
     @property
     def oidc_client(self) -> KeycloakOpenID:
@@ -93,16 +129,45 @@ class RHSSOServiceConfiguration:
         user_credentials = "" if use_service_accounts else f"&username={self.username}&password={self.password}"
         return f"grant_type={grant_type}&client_id={app_id}&client_secret={app_key}{user_credentials}"
 
-    def access_token(self, app) -> str:
+    def access_token(self, app, fresh=False, min_validity: float = TOKEN_EXPIRY_MARGIN) -> str:
         """
-        Returns access token for given application
+        Returns access token for given application.
+        Tokens are cached per realm, client and user, they are refreshed with refresh token shortly before
+        they expire.
         :param app: 3scale application
+        :param fresh: If True, new token is always obtained by password grant with the current client secret
+        :param min_validity: Minimal time in seconds the returned token has to be valid for
         :return: access token
         """
-        # Wait for application client to be created
-        self.get_application_client(app)
-        app_key = app.keys.list()["keys"][0]["key"]["value"]
-        return self.password_authorize(app["client_id"], app_key)["access_token"]
+        key = (self.realm.name, app["client_id"], self.username)
+        with self._lock:
+            lock = self._token_locks.setdefault(key, threading.Lock())
+
+        with lock:
+            cached = self._tokens.get(key)
+            if cached is not None and not fresh:
+                if cached.valid(min_validity):
+                    return cached.token["access_token"]
+                if cached.refreshable():
+                    try:
+                        oidc_client = self.realm.oidc_client(app["client_id"], cached.secret)
+                        cached.update(oidc_client.refresh_token(cached.token["refresh_token"]))
+                        if cached.valid(min_validity):
+                            return cached.token["access_token"]
+                    except KeycloakError as err:
+                        log.debug("Refresh of token for %s failed: %s", app["client_id"], err)
+
+            if cached is None:
+                # Wait for application client to be created
+                self.get_application_client(app)
+            if cached is None or fresh:
+                # forced renewal usually follows regeneration of the key, cached secret may be stale
+                secret = app.keys.list()["keys"][0]["key"]["value"]
+            else:
+                secret = cached.secret
+            token = self.password_authorize(app["client_id"], secret).token
+            self._tokens[key] = CachedToken(secret, token)
+            return token["access_token"]
 
 
 class OIDCClientAuth(BaseClientAuth):
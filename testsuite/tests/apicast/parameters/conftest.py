@@ -2,7 +2,6 @@
 from weakget import weakget
 import pytest
 
-from testsuite.gateways import gateway
 from testsuite.gateways.apicast.template import TemplateApicast
 from testsuite.utils import blame, warn_and_skip
 
@@ -15,14 +14,10 @@ def require_openshift(testconfig):
 
 
 @pytest.fixture(scope="module")
-def staging_gateway(request, gateway_kind, gateway_environment, gateway_options):
-    """Deploy self-managed template based apicast gateway."""
-    gw = gateway(kind=gateway_kind, staging=True, name=blame(request, "gw"), **gateway_options)
-    request.addfinalizer(gw.destroy)
-    gw.create()
-
-    if len(gateway_environment) > 0:
-        gw.environ.set_many(gateway_environment)
+def staging_gateway(request, gateway_pool, gateway_kind, gateway_environment, gateway_options):
+    """Lease self-managed template based apicast gateway with the environment from the pool."""
+    gw = gateway_pool.lease(gateway_kind, gateway_environment, name=blame(request, "gw"), **gateway_options)
+    request.addfinalizer(lambda: gateway_pool.release(gw))
 
     return gw
 
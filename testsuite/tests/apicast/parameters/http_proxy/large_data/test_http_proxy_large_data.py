@@ -8,7 +8,7 @@ import pytest
 
 from testsuite import rawobj, TESTED_VERSION  # noqa # pylint: disable=unused-import
 from testsuite.capabilities import Capability
-from testsuite.utils import random_string
+from testsuite.payload import Payload, iter_body, stream
 
 pytestmark = [pytest.mark.skipif("TESTED_VERSION < Version('2.9')"),
               pytest.mark.issue("https://issues.redhat.com/browse/THREESCALE-3863"),
@@ -25,12 +25,12 @@ def service_proxy_settings(private_base_url, protocol):
 @pytest.mark.parametrize("num_bytes", [1000, 10000, 20000, 35000, 50000, 100000, 500000, 999999])
 def test_large_data(api_client, num_bytes):
     """Test that a POST request with data of a given number of bytes will be successful when using an http(s) proxy"""
-    data = random_string(num_bytes)
+    payload = Payload(num_bytes)
     client = api_client()
 
     # requests/urllib3 doesn't retry post(); need get() to wait until all is up
     client.get("/get")
 
-    response = client.post('/post', data=data)
-    assert response.status_code == 200
-    assert response.json().get('data') == data
+    with stream(client, "POST", "/post", payload) as response:
+        assert response.status_code == 200
+        assert payload.verify_echo(iter_body(response))
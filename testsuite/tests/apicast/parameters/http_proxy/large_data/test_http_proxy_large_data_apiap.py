@@ -9,7 +9,7 @@ import pytest
 
 from testsuite import rawobj, TESTED_VERSION  # noqa # pylint: disable=unused-import
 from testsuite.capabilities import Capability
-from testsuite.tests.toolbox.test_backend import random_string
+from testsuite.payload import Payload, iter_body, stream
 
 pytestmark = [pytest.mark.skipif("TESTED_VERSION < Version('2.9')"),
               pytest.mark.issue("https://issues.redhat.com/browse/THREESCALE-3863"),
@@ -36,15 +36,15 @@ def test_large_data(api_client, num_bytes):
         Test checks both backends
     """
     client = api_client()
-    data = random_string(num_bytes)
+    payload = Payload(num_bytes)
 
     # requests/urllib3 doesn't retry post(); need get() to wait until all is up
     client.get("/bin/get")
 
-    response = client.post('/bin/post', data=data)
-    assert response.status_code == 200
-    assert response.json().get('data') == data
+    with stream(client, "POST", "/bin/post", payload) as response:
+        assert response.status_code == 200
+        assert payload.verify_echo(iter_body(response))
 
-    response = client.post('/bin2/post', data=data)
-    assert response.status_code == 200
-    assert response.json().get('data') == data
+    with stream(client, "POST", "/bin2/post", payload) as response:
+        assert response.status_code == 200
+        assert payload.verify_echo(iter_body(response))
@@ -24,16 +24,13 @@ Actually this is 'scratched'. Does 'plain-to-plain' comparison make sense?
     spec/functional_specs/policies/rate_limit/connection/plain_text/true_condition/rate_limit_connection_service_true_spec.rb
 """
 
-from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pprint import pformat
-import asyncio
-import random
-import time
 
 import pytest
 
 from testsuite import rawobj
+from testsuite.httpx import async_api_client, burst
 from testsuite.utils import randomize, blame
 
 
@@ -48,10 +45,10 @@ DATEFMT = '%a, %d %b %Y %H:%M:%S GMT'
 WAIT = 15
 
 
-def test_rate_limit_connection_no_limit(logger, client, client2):
+def test_rate_limit_connection_no_limit(logger, burst_clients):
     """The call not matching the condition won't be limited"""
 
-    responses = concurrent_requests(logger, client, client2, limit_me="no")
+    responses = concurrent_requests(logger, burst_clients, limit_me="no")
 
     # total responses
     assert len(responses) == TOTAL_REQUESTS
@@ -60,7 +57,7 @@ def test_rate_limit_connection_no_limit(logger, client, client2):
     assert all(i.status_code == 200 for i in responses)
 
 
-def test_rate_limit_connection(logger, client, client2):
+def test_rate_limit_connection(logger, client, client2, burst_clients):
     """
     The call matching the condition will be limited to CONNECTIONS simultaneous
     connections and additional burst of BURST will be DELAY delayed, rest will
@@ -73,7 +70,7 @@ def test_rate_limit_connection(logger, client, client2):
     if client2 is not None:
         client2.get("/get")
 
-    responses = concurrent_requests(logger, client, client2, limit_me="yes")
+    responses = concurrent_requests(logger, burst_clients, limit_me="yes")
 
     # total responses
     assert len(responses) == TOTAL_REQUESTS
@@ -92,66 +89,39 @@ def test_rate_limit_connection(logger, client, client2):
     assert len([i for i in times if i - first >= delay]) == BURST
 
 
-def concurrent_requests(logger, client1, client2, limit_me):
-    """Make simultaneous requests
+def concurrent_requests(logger, clients, limit_me):
+    """Make simultaneous requests, they are split evenly among the clients
 
     Args:
         :param logger: logger to use for logging
-        :param client1: a client to use to make requests
-        :param client2: a client of other application to use to make requests
+        :param clients: async clients to use to make requests, one per application
         :param limit_me: a value for 'X-Limit-Me' header used to distinguish
             whether to apply rate_limit or not, two expected values: 'yes' or 'no'
 
     :returns: collection of responses from concurrent requests"""
 
-    loop = asyncio.get_event_loop()
-    responses = []
-
-    range1 = TOTAL_REQUESTS
-    range2 = 0
-    if client2 is not None:
-        range1 = TOTAL_REQUESTS // 2
-        range2 = TOTAL_REQUESTS - range1
-
-    with ThreadPoolExecutor(max_workers=TOTAL_REQUESTS+1) as pool:
-        futures = [
-            loop.run_in_executor(pool, get, client1, limit_me, f"/delay/{WAIT}")
-            for _ in range(range1)]
-        futures += [
-            loop.run_in_executor(pool, get, client2, limit_me, f"/delay/{WAIT}")
-            for _ in range(range2)]
-
-        responses = loop.run_until_complete(asyncio.gather(*futures))
+    senders = [client for client in clients for _ in range(TOTAL_REQUESTS // len(clients))]
+    responses = burst(
+        senders, "GET", f"/delay/{WAIT}",
+        headers={"X-Limit-Me": limit_me, "Date": datetime.utcnow().strftime(DATEFMT)})
 
     strptime = datetime.strptime
-    # a tuple (status_code, request Date header, response Date header) for
-    # each request will be logged
+    start = min(i.sent_at for i in responses)
+    # a tuple (status_code, response Date header, sent and received offsets
+    # in seconds) for each request will be logged
     report = [
-        (i.status_code, strptime(i.request.headers["Date"], DATEFMT), strptime(i.headers["Date"], DATEFMT))
+        (i.status_code, strptime(i.headers["Date"], DATEFMT),
+         round(i.sent_at - start, 3), round(i.received_at - start, 3))
         for i in responses]
 
-    # it will be sorted by response Date header
-    report.sort(key=lambda k: k[2])
+    # it will be sorted by the time of the response
+    report.sort(key=lambda k: k[3])
 
-    logger.info("Request/Response Date headers:\n" + pformat(report))
+    logger.info("Response Date headers and timing:\n" + pformat(report))
 
     return responses
 
 
-def get(client, limit_me, relpath):
-    """Helper to make async request with correct Date header"""
-
-    # does this help apicast to handle all the concurrent requests?
-    # with no doubt it requires longer WAIT to make sure all the requests
-    # will be really concurrent
-    time.sleep(random.random()*(WAIT/4))
-
-    return client.get(
-        relpath, headers={
-            "X-Limit-Me": limit_me,
-            "Date": datetime.utcnow().strftime(DATEFMT)})
-
-
 @pytest.fixture
 def policy_settings(variation, key_scope, matching_rule, testconfig, logger):
     """Configure rate_limit policy
@@ -239,6 +209,18 @@ def app2(service_plus, custom_application, custom_app_plan, lifecycle_hooks, req
     return custom_application(rawobj.Application(blame(request, "app"), plan), hooks=lifecycle_hooks)
 
 
+@pytest.fixture
+def burst_clients(application, client, client2, request):  # pylint: disable=unused-argument
+    """
+    Async clients sending the concurrent requests, one for each application.
+    Sync clients are requested as they promote the configuration to production
+    """
+    clients = [async_api_client(application, endpoint="endpoint")]
+    if client2 is not None:
+        clients.append(async_api_client(request.getfixturevalue("app2"), endpoint="endpoint"))
+    return clients
+
+
 @pytest.fixture
 def client2(key_scope, request, prod_client):
     """A client of app2 to verify 'global' key_scope functionality"""
@@ -3,7 +3,6 @@
 import pytest
 from weakget import weakget
 
-from testsuite.gateways import gateway
 from testsuite.gateways.apicast.template import TemplateApicast
 from testsuite.utils import blame
 from testsuite.utils import warn_and_skip
@@ -17,10 +16,9 @@ def require_openshift(testconfig):
 
 
 @pytest.fixture(scope="module")
-def staging_gateway(request):
-    """Deploy self-managed template based apicast gateway."""
-    gw = gateway(kind=TemplateApicast, staging=True, name=blame(request, "gw"))
-    request.addfinalizer(gw.destroy)
-    gw.create()
+def staging_gateway(request, gateway_pool):
+    """Lease self-managed template based apicast gateway from the pool."""
+    gw = gateway_pool.lease(TemplateApicast, name=blame(request, "gw"))
+    request.addfinalizer(lambda: gateway_pool.release(gw))
 
     return gw
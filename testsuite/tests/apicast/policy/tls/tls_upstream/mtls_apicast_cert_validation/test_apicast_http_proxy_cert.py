@@ -43,10 +43,9 @@ def setup_gateway(request, mount_certificate_secret, staging_gateway, certificat
     path = f'/var/run/secrets/{blame(request, "http_proxy_cert")}'
     mount_certificate_secret(path, certificate)
 
-    staging_gateway.environ.set_many({
-        "APICAST_PROXY_HTTPS_CERTIFICATE_KEY": f"{path}/tls.key",
-        "APICAST_PROXY_HTTPS_CERTIFICATE": f"{path}/tls.crt"
-    })
+    with staging_gateway.environ.batch():
+        staging_gateway.environ["APICAST_PROXY_HTTPS_CERTIFICATE_KEY"] = f"{path}/tls.key"
+        staging_gateway.environ["APICAST_PROXY_HTTPS_CERTIFICATE"] = f"{path}/tls.crt"
 
 
 @pytest.fixture(scope="session")
@@ -1,14 +1,18 @@
 "top-level conftest"
 
 import inspect
+import json
 import logging
 import os
 import signal
 import time
+from datetime import datetime
+from typing import List
 
 import importlib_resources as resources
 import backoff
 import pytest
+from httpx import Limits
 from threescale_api import client, errors
 from weakget import weakget
 
@@ -21,13 +25,25 @@ from testsuite import rawobj, HTTP2, gateways, configuration
 from testsuite.capabilities import Capability, CapabilityRegistry
 from testsuite.config import settings
 from testsuite.prometheus import PrometheusClient
+from testsuite.prometheus_latency import snapshot_latency_report
+from testsuite.prometheus_scrape import MetricsScraper
 from testsuite.requestbin import RequestBinClient
-from testsuite.httpx import HttpxHook
+from testsuite.api_cache import CachedThreeScaleClient
+from testsuite.deletion import DeletionQueue
+from testsuite.gateways.apicast.log_parser import AccessLogHook
+from testsuite.gateways.pool import GatewayPool
+from testsuite.httpx import HttpxHook, TransportRegistry
+from testsuite.openshift.rest import stop_caches
 from testsuite.rhsso.objects import Realm
+from testsuite.timing import collector as request_timing
 from testsuite.utils import blame, blame_desc, warn_and_skip
 from testsuite.rhsso import RHSSOServiceConfiguration, RHSSO
 
-pytest_plugins = ("testsuite.gateway_logs",)
+pytest_plugins = ("testsuite.gateway_logs", "testsuite.httpx_logs", "testsuite.latency_report",
+                  "testsuite.wait_scheduler", "testsuite.duration_scheduler", "testsuite.tracer")
+
+# junit global properties with the server latency reports of the modules, see server_latency
+_server_latency: List[List[str]] = []
 
 
 @pytest.fixture(scope='session', autouse=True)
@@ -55,6 +71,12 @@ def pytest_addoption(parser):
     )
     parser.addoption(
         "--drop-sandbag", action="store_true", default=False, help="Skip demanding/slow tests (default: False)")
+    parser.addoption(
+        "--wait-aware", action="store_true", default=False,
+        help="Distribute modules to xdist workers by their expected waits (default: False)")
+    parser.addoption(
+        "--duration-aware", action="store_true", default=False,
+        help="Distribute modules to xdist workers by durations of the previous runs (default: False)")
 
 
 # there are many branches as there are many options to influence test selection
@@ -62,6 +84,7 @@ def pytest_addoption(parser):
 def pytest_runtest_setup(item):
     """Exclude disruptive tests by default, require explicit option"""
 
+    request_timing.enter(item.nodeid, "setup")
     marks = [i.name for i in item.iter_markers()]
     if "disruptive" in marks and not item.config.getoption("--disruptive"):
         pytest.skip("Excluding disruptive tests")
@@ -91,6 +114,51 @@ def pytest_runtest_setup(item):
             pytest.skip(f"Skipping test because current gateway doesn't have implicit capability {Capability.APICAST}")
 
 
+def pytest_runtest_call(item):
+    """Requests from now on are attributed to the test itself"""
+    request_timing.enter(item.nodeid, "call")
+
+
+def pytest_runtest_teardown(item):
+    """Requests from now on are attributed to the teardown of the test"""
+    request_timing.enter(item.nodeid, "teardown")
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """Add timing of the requests sent by the test to junit properties"""
+    if call.when == "teardown":
+        for name, value in request_timing.test_summary(item.nodeid).items():
+            item.user_properties.append((f"http-{name}", value))
+    yield
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_sessionfinish(session):
+    """
+    Add timing of all the requests to junit global properties and stop watches of openshift caches
+    xdist workers have no junit xml, they send the timings to the controller instead
+    """
+    if hasattr(session.config, "workerinput"):
+        session.config.workeroutput["request_timing"] = request_timing.export()
+        session.config.workeroutput["server_latency"] = _server_latency
+    else:
+        for endpoint, summary in request_timing.session_summary().items():
+            for name, value in summary.items():
+                _global_property(session.config, f"http-{endpoint}-{name}", value)
+        for name, value in _server_latency:
+            _global_property(session.config, name, value)
+    stop_caches()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):  # pylint: disable=unused-argument
+    """Collects timings of the requests and server latency reports of the finished xdist worker"""
+    workeroutput = getattr(node, "workeroutput", {})
+    request_timing.merge(workeroutput.get("request_timing", []))
+    _server_latency.extend(workeroutput.get("server_latency", []))
+
+
 # pylint: disable=unused-argument
 def pytest_collection_modifyitems(session, config, items):
     """
@@ -276,8 +344,20 @@ def testconfig():
 
 
 @pytest.fixture(scope="session")
-def threescale(testconfig):
-    "Threescale client"
+def threescale(request, testconfig):
+    """Threescale client, GET requests are cached if threescale_cache is enabled"""
+
+    cache = weakget(testconfig)["threescale_cache"] % {}
+    if cache.get("enabled", False):
+        cached = CachedThreeScaleClient(
+            testconfig["threescale"]["admin"]["url"],
+            testconfig["threescale"]["admin"]["token"],
+            ssl_verify=testconfig["ssl_verify"],
+            wait=True,
+            ttl=cache.get("ttl", 60)
+        )
+        request.addfinalizer(cached.log_stats)
+        return cached
 
     return client.ThreeScaleClient(
         testconfig["threescale"]["admin"]["url"],
@@ -318,7 +398,7 @@ def account(custom_account, request, testconfig, account_password):
 
 
 @pytest.fixture(scope="session")
-def custom_account(threescale, request, testconfig):
+def custom_account(threescale, request, testconfig, deletion_queue):
     """Parametrized custom Account
 
     Args:
@@ -327,7 +407,11 @@ def custom_account(threescale, request, testconfig):
     def _custom_account(params, autoclean=True, threescale_client=threescale):
         acc = threescale_client.accounts.create(params=params)
         if autoclean and not testconfig["skip_cleanup"]:
-            request.addfinalizer(acc.delete)
+            def finalizer():
+                # applications of the account may be still waiting for deletion
+                deletion_queue.join()
+                acc.delete()
+            request.addfinalizer(finalizer)
         return acc
 
     return _custom_account
@@ -395,6 +479,15 @@ def custom_provider_account_user(request, threescale, testconfig):
     return _custom_user
 
 
+@pytest.fixture(scope="session")
+def deletion_queue(request, testconfig):
+    """Deletes 3scale objects in background, failures are reported at the end of the session"""
+    queue = DeletionQueue(max_workers=weakget(testconfig)["deletion_queue"]["max_workers"] % 4,
+                          enabled=weakget(testconfig)["deletion_queue"]["enabled"] % True)
+    request.addfinalizer(queue.barrier)
+    return queue
+
+
 @pytest.fixture(scope="session")
 def staging_gateway(request):
     """Staging gateway"""
@@ -405,6 +498,15 @@ def staging_gateway(request):
     return gateway
 
 
+@pytest.fixture(scope="session")
+def gateway_pool(request, testconfig):
+    """Pool of self-managed staging gateways shared by modules that need their own gateway"""
+    pool = GatewayPool(max_idle=weakget(testconfig)["gateway_pool"]["max_idle"] % 3)
+    if not testconfig["skip_cleanup"]:
+        request.addfinalizer(pool.reap)
+    return pool
+
+
 @pytest.fixture(scope="session")
 def production_gateway(request, testconfig, openshift):
     """Production gateway"""
@@ -419,7 +521,7 @@ def production_gateway(request, testconfig, openshift):
 
 
 @pytest.fixture(scope="module")
-def rhsso_service_info(request, testconfig, tools):
+def rhsso_service_info(request, testconfig, tools, deletion_queue):
     """
     Set up client for zync
     :return: dict with all important details
@@ -432,7 +534,7 @@ def rhsso_service_info(request, testconfig, tools):
     realm: Realm = rhsso.create_realm(blame(request, "realm"), accessTokenLifespan=24*60*60)
 
     if not testconfig["skip_cleanup"]:
-        request.addfinalizer(realm.delete)
+        request.addfinalizer(lambda: deletion_queue.defer(request.node.nodeid, "realm", realm.delete))
 
     client = realm.create_client(
         name=blame(request, "client"),
@@ -491,15 +593,41 @@ def lifecycle_hooks(request, testconfig):
     or should inherit from that class"""
 
     defaults = testconfig.get("fixtures", {}).get("lifecycle_hooks", {}).get("defaults")
-    if defaults is not None:
-        return [request.getfixturevalue(i) for i in defaults]
-    return []
+    hooks = [request.getfixturevalue(i) for i in defaults] if defaults is not None else []
+    if weakget(testconfig)["reporting"]["latency_attribution"]["enabled"] % False:
+        hooks.append(request.getfixturevalue("access_log"))
+    return hooks
+
+
+@pytest.fixture(scope="session")
+def access_log():
+    """Lifecycle hook making services log access in the format parsed by latency attribution"""
+    return AccessLogHook()
+
+
+@pytest.fixture(scope="session")
+def httpx_transports(request, testconfig):
+    """Connection pools shared by httpx clients, None if disabled"""
+    config = weakget(testconfig)["httpx_transports"]
+    if not config["enabled"] % False:
+        return None
+    transports = TransportRegistry(Limits(
+        max_connections=config["max_connections"] % 100,
+        max_keepalive_connections=config["max_keepalive_connections"] % 20,
+        keepalive_expiry=config["keepalive_expiry"] % 5))
+
+    def _close():
+        transports.log_stats()
+        transports.close()
+
+    request.addfinalizer(_close)
+    return transports
 
 
 @pytest.fixture(scope="session")
-def httpx():
+def httpx(httpx_transports):
     """Httpx fixture that returns lifecycle hook for httpx"""
-    return HttpxHook(HTTP2)
+    return HttpxHook(HTTP2, httpx_transports)
 
 
 @pytest.fixture(scope="module")
@@ -535,7 +663,7 @@ def api_client(application, request):
 
 
 @pytest.fixture(scope="module")
-def custom_app_plan(custom_service, service_proxy_settings, request, testconfig):
+def custom_app_plan(custom_service, service_proxy_settings, request, testconfig, deletion_queue):
     """Parametrized custom Application Plan
 
     Args:
@@ -552,7 +680,8 @@ def custom_app_plan(custom_service, service_proxy_settings, request, testconfig)
         return plan
 
     if not testconfig["skip_cleanup"]:
-        request.addfinalizer(lambda: [item.delete() for item in plans])
+        request.addfinalizer(
+            lambda: [deletion_queue.defer(request.node.nodeid, "application plan", item.delete) for item in plans])
 
     return _custom_app_plan
 
@@ -571,7 +700,7 @@ def active_doc(request, service, oas3_body, custom_active_doc):
 
 
 @pytest.fixture(scope="module")
-def custom_active_doc(threescale, testconfig, request):
+def custom_active_doc(threescale, testconfig, request, deletion_queue):
     """Parametrized custom Active document
 
     Args:
@@ -588,7 +717,8 @@ def custom_active_doc(threescale, testconfig, request):
         return acd
 
     if not testconfig["skip_cleanup"]:
-        request.addfinalizer(lambda: [item.delete() for item in ads])
+        request.addfinalizer(
+            lambda: [deletion_queue.defer(request.node.nodeid, "active doc", item.delete) for item in ads])
 
     return _custom_active_doc
 
@@ -603,7 +733,8 @@ def _select_hooks(hook, hooks):
 
 # custom_app_plan dependency is needed to ensure cleanup in correct order
 @pytest.fixture(scope="module")
-def custom_application(account, custom_app_plan, request, testconfig):  # pylint: disable=unused-argument
+# pylint: disable=unused-argument
+def custom_application(account, custom_app_plan, request, testconfig, deletion_queue):
     """Parametrized custom Application
 
     Args:
@@ -632,7 +763,7 @@ def custom_application(account, custom_app_plan, request, testconfig):  # pylint
                         hook(app)
                     except Exception:  # pylint: disable=broad-except
                         pass
-                app.delete()
+                deletion_queue.defer(request.node.nodeid, "application", app.delete)
             request.addfinalizer(finalizer)
 
         app.api_client_verify = testconfig["ssl_verify"]
@@ -640,6 +771,7 @@ def custom_application(account, custom_app_plan, request, testconfig):  # pylint
         for hook in _select_hooks("on_application_create", hooks):
             hook(app)
 
+        request_timing.instrument_application(app)
         return app
 
     return _custom_application
@@ -655,17 +787,18 @@ def backends_mapping():
 
 
 @pytest.fixture(scope="module")
-def custom_service(threescale, request, testconfig, logger):
+def custom_service(threescale, request, testconfig, logger, deletion_queue):
     """Parametrized custom Service
 
     Args:
         :param params: dict for remote call
         :param proxy_params: dict of proxy options for remote call, rawobj.Proxy should be used
-        :param hooks: List of objects implementing necessary methods from testsuite.lifecycle_hook.LifecycleHook"""
+        :param hooks: List of objects implementing necessary methods from testsuite.lifecycle_hook.LifecycleHook
+        :param deploy: If False, the proxy is not deployed and it is up to the caller"""
 
     # pylint: disable=too-many-arguments
     def _custom_service(params, proxy_params=None, backends=None, autoclean=True,
-                        hooks=None, annotate=True, threescale_client=threescale):
+                        hooks=None, annotate=True, threescale_client=threescale, deploy=True):
         params = params.copy()
         for hook in _select_hooks("before_service", hooks):
             params = hook(params)
@@ -682,7 +815,9 @@ def custom_service(threescale, request, testconfig, logger):
                         hook(svc)
                     except Exception:  # pylint: disable=broad-except
                         pass
+                deletion_queue.defer(request.node.nodeid, "service", delete)
 
+            def delete():
                 implicit = []
                 if not backends and proxy_params:  # implicit backend created
                     bindings = svc.backend_usages.list()
@@ -720,7 +855,8 @@ def custom_service(threescale, request, testconfig, logger):
                 proxy_params = hook(svc, proxy_params)
 
             svc.proxy.update(params=proxy_params)
-        svc.proxy.deploy()
+        if deploy:
+            svc.proxy.deploy()
 
         for hook in _select_hooks("on_service_create", hooks):
             hook(svc)
@@ -739,7 +875,7 @@ def _backend_delete(backend):
 
 @pytest.fixture(scope="module")
 # pylint: disable=too-many-arguments
-def custom_backend(threescale, request, testconfig, private_base_url):
+def custom_backend(threescale, request, testconfig, private_base_url, deletion_queue):
     """
     Parametrized custom Backend
     Args:
@@ -769,7 +905,7 @@ def custom_backend(threescale, request, testconfig, private_base_url):
                         hook(backend)
                     except Exception:  # pylint: disable=broad-except
                         pass
-                _backend_delete(backend)
+                deletion_queue.defer(request.node.nodeid, "backend", _backend_delete, backend)
             request.addfinalizer(finalizer)
 
         for hook in _select_hooks("on_backend_create", hooks):
@@ -789,7 +925,7 @@ def requestbin(testconfig, tools):
 
 
 @pytest.fixture(scope="session")
-def custom_tenant(testconfig, master_threescale, request):
+def custom_tenant(testconfig, master_threescale, request, deletion_queue):
     """
     Custom Tenant
     """
@@ -798,7 +934,11 @@ def custom_tenant(testconfig, master_threescale, request):
         tenant = master_threescale.tenants.create(rawobj.CustomTennant(user_name))
 
         if autoclean and not testconfig["skip_cleanup"]:
-            request.addfinalizer(tenant.delete)
+            def finalizer():
+                # objects of the tenant may be still waiting for deletion
+                deletion_queue.join()
+                tenant.delete()
+            request.addfinalizer(finalizer)
 
         master_threescale.accounts.read_by_name(user_name).users.read_by_name(user_name).activate()
 
@@ -813,17 +953,48 @@ def prometheus(testconfig, openshift):
     Returns an instance of Prometheus client.
     Skips the tests when Prometheus is not present in the project.
     """
-    if "prometheus" in testconfig:
-        return PrometheusClient(testconfig["prometheus"]["url"])
+    config = weakget(testconfig)["prometheus"]
+    scraper = None
+    if config["direct_scrape"]["enabled"] % False:
+        scraper = MetricsScraper(openshift(), ports=config["direct_scrape"]["ports"] % None)
+
+    if config["url"] % None:
+        return PrometheusClient(testconfig["prometheus"]["url"], scraper)
 
     routes = openshift().routes.for_service('prometheus-operated')
     if len(routes) == 0:
         routes = openshift().routes.for_service('prometheus')
 
     if len(routes) == 0:
+        if scraper is not None:
+            return PrometheusClient(None, scraper)
         warn_and_skip("Prometheus is not present in this project. Prometheus tests have been skipped.")
 
     protocol = "https://" if "tls" in routes[0]["spec"] else "http://"
     prometheus_url = protocol + routes[0]['spec']['host']
 
-    return PrometheusClient(prometheus_url)
+    return PrometheusClient(prometheus_url, scraper)
+
+
+@pytest.fixture(scope="module")
+def server_latency(request, prometheus, logger):
+    """
+    Latency percentiles of APIcast and backend histograms of the requests served during the module,
+    e.g. Hyperfoil run, to compare with the latency observed by the client.
+    Returns function giving the report so far, report of the whole module is added to junit global properties
+    at the end of the session if it can be obtained.
+    """
+    start = datetime.utcnow()
+    # without Prometheus the window is measured by two snapshots of directly scraped metrics
+    before = prometheus.snapshot(prometheus.scraper.containers) if prometheus.endpoint is None else None
+
+    def _report():
+        if before is not None:
+            return snapshot_latency_report(before, prometheus.snapshot(prometheus.scraper.containers))
+        return prometheus.latency_report(start)
+
+    yield _report
+    try:
+        _server_latency.extend([f"server-latency {request.module.__name__}", json.dumps(row)] for row in _report())
+    except Exception as error:  # pylint: disable=broad-except
+        logger.warning("Server latency report of %s failed: %s", request.module.__name__, error)
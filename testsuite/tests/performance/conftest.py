@@ -1,9 +1,7 @@
 """
 Conftest for performance tests
 """
-import asyncio
 import os
-from concurrent.futures.thread import ThreadPoolExecutor
 from pathlib import Path
 
 import pytest
@@ -12,7 +10,7 @@ from hyperfoil import HyperfoilClient
 
 from testsuite.perf_utils import HyperfoilUtils
 
-from testsuite import rawobj
+from testsuite.provisioning import ProvisioningPlanner, ProvisioningSpec
 from testsuite.utils import randomize, blame
 
 
@@ -63,48 +61,32 @@ def shared_template(testconfig):
 
 
 @pytest.fixture(scope='module')
-def applications(services, custom_application, lifecycle_hooks, number_of_apps):
-    """Create multiple application for each service"""
+def provisioning_spec(number_of_products, number_of_backends, number_of_apps, private_base_url):
+    """Description of 3scale objects created for the test"""
+    return ProvisioningSpec(products=number_of_products, backends=number_of_backends,
+                            applications=number_of_apps, backend_endpoint=private_base_url("httpbin"))
 
-    def _create_apps(svc):
-        plan = svc.app_plans.list()[0]
-        return custom_application(rawobj.Application(randomize("App"), plan), hooks=lifecycle_hooks)
 
-    loop = asyncio.get_event_loop()
-    apps = []
-    futures = []
-    with ThreadPoolExecutor() as pool:
-        for svc in services:
-            futures += [
-                loop.run_in_executor(pool, _create_apps, svc)
-                for _ in range(number_of_apps)]
-        apps = loop.run_until_complete(asyncio.gather(*futures))
-    return apps
+# pylint: disable=too-many-arguments
+@pytest.fixture(scope='module')
+def provisioned(request, provisioning_spec, custom_backend, custom_service, custom_app_plan, custom_application,
+                service_proxy_settings, service_settings, lifecycle_hooks):
+    """Create all the services with backends, mapping rules and applications at once"""
+    planner = ProvisioningPlanner(custom_backend, custom_service, custom_app_plan, custom_application)
+    return planner.provision(provisioning_spec, service_settings, service_proxy_settings,
+                             name=lambda: blame(request, randomize("perf")), hooks=lifecycle_hooks)
 
 
-# pylint: disable=too-many-arguments
 @pytest.fixture(scope='module')
-def services(request, custom_backend, custom_service, custom_app_plan, number_of_products,
-             number_of_backends, service_proxy_settings, service_settings, private_base_url, lifecycle_hooks):
-    """Create multiple services with multiple backends"""
+def applications(provisioned):
+    """Create multiple application for each service"""
+    return provisioned.applications
 
-    def _create_services():
-        backends_mapping = {}
-        for j in range(number_of_backends):
-            backends_mapping[f"/{j}"] = custom_backend(endpoint=private_base_url("httpbin"))
-        service_settings.update({"name": blame(request, randomize("perf"))})
-        svc = custom_service(service_settings, service_proxy_settings, backends_mapping, hooks=lifecycle_hooks)
-        custom_app_plan(rawobj.ApplicationPlan(randomize("AppPlan")), svc)
-        return svc
-
-    loop = asyncio.get_event_loop()
-    services = []
-    with ThreadPoolExecutor() as pool:
-        futures = [
-            loop.run_in_executor(pool, _create_services)
-            for _ in range(number_of_products)]
-        services = loop.run_until_complete(asyncio.gather(*futures))
-    return services
+
+@pytest.fixture(scope='module')
+def services(provisioned):
+    """Create multiple services with multiple backends"""
+    return provisioned.services
 
 
 @pytest.fixture(scope='module')
@@ -115,3 +97,18 @@ def promoted_services(services, production_gateway):
         svc.proxy.list().promote(version=version)
     production_gateway.reload()
     return services
+
+
+@pytest.fixture(scope='module', autouse=True)
+def hyperfoil_server_latency(request, logger):
+    """
+    Adds server latency of the requests sent by Hyperfoil to junit global properties, if Prometheus is present.
+    It is just reporting, the tests run even if it fails.
+    """
+    try:
+        request.getfixturevalue("server_latency")
+    except pytest.skip.Exception:
+        pass
+    # pylint: disable=broad-except
+    except Exception as error:
+        logger.warning("Server latency is not reported: %s", error)
@@ -1,15 +1,12 @@
 """
     Performance test for managed services with multiple 3scale entities (products, backends,...)
 """
-import asyncio
 import os
-from concurrent.futures.thread import ThreadPoolExecutor
 from urllib.parse import urlparse
 
 import backoff
 import pytest
 
-from testsuite import rawobj
 from testsuite.rhsso.rhsso import OIDCClientAuthHook
 
 MAX_RUN_TIME = 210 * 60
@@ -54,40 +51,15 @@ def number_of_apps():
 
 
 @pytest.fixture(scope='module')
-def create_mapping_rules():
-    """
-    Returns function that will be run for each backend usage
-    """
-
-    def _create(i, be_usage):
-        metric = be_usage.backend.metrics.list()[0]
-        be_usage.backend.mapping_rules.create(rawobj.Mapping(metric, f"/anything/{i}"))
-        be_usage.backend.mapping_rules.create(rawobj.Mapping(metric, f"/anything/{i}", "POST"))
-
-    return _create
-
-
-@pytest.fixture(scope='module')
-def services(services, create_mapping_rules):
+def provisioning_spec(provisioning_spec):
     """
     Removes default mapping rule of each product.
-    For each backend creates 10 mapping rules
+    For each backend creates 10 GET and 10 POST mapping rules
     """
-    loop = asyncio.get_event_loop()
-    for svc in services:
-        proxy = svc.proxy.list()
-        proxy.mapping_rules.delete(proxy.mapping_rules.list()[0]["id"])
-    with ThreadPoolExecutor() as pool:
-        for svc in services:
-            proxy = svc.proxy.list()
-            futures = []
-            for be_usage in svc.backend_usages.list():
-                futures += [
-                    loop.run_in_executor(pool, create_mapping_rules, i, be_usage)
-                    for i in range(NUMBER_OF_MAPPING_RULES_PER_BACKEND)]
-            loop.run_until_complete(asyncio.gather(*futures))
-            proxy.update()
-    return services
+    provisioning_spec.delete_default_mapping = True
+    provisioning_spec.mapping_rules = NUMBER_OF_MAPPING_RULES_PER_BACKEND
+    provisioning_spec.mapping_methods = ("GET", "POST")
+    return provisioning_spec
 
 
 @pytest.fixture(scope='module')
@@ -10,7 +10,6 @@ from urllib.parse import urlparse
 import backoff
 import pytest
 
-from testsuite import rawobj
 from testsuite.rhsso.rhsso import OIDCClientAuthHook
 
 MAX_RUN_TIME = 610 * 60
@@ -32,13 +31,10 @@ def rhsso_setup(lifecycle_hooks, rhsso_service_info):
 
 
 @pytest.fixture(scope='module')
-def services(services):
-    """Service fixture will add '/' POST mapping rule, so we can make such requests in perf-test"""
-    for svc in services:
-        metric = svc.metrics.list()[0]
-        svc.proxy.list().mapping_rules.create(rawobj.Mapping(metric, "/", "POST"))
-        svc.proxy.deploy()
-    return services
+def provisioning_spec(provisioning_spec):
+    """Services will have '/' POST mapping rule, so we can make such requests in perf-test"""
+    provisioning_spec.proxy_mapping_rules = [("/", "POST")]
+    return provisioning_spec
 
 
 @pytest.fixture(scope='module')
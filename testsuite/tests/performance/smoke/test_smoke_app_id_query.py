@@ -5,15 +5,12 @@
     This test shows usage how to write test where 3scale product is secured with app id
     and app key combination.
 """
-import asyncio
 import os
-from concurrent.futures.thread import ThreadPoolExecutor
 
 import backoff
 import pytest
 from threescale_api.resources import Service
 
-from testsuite import rawobj
 from testsuite.perf_utils import HyperfoilUtils
 
 MAX_RUN_TIME = 5 * 60
@@ -39,18 +36,6 @@ def number_of_apps():
     return 1
 
 
-@pytest.fixture(scope='module')
-def create_mapping_rules():
-    """
-    Returns function that will be run for each backend usage
-    """
-    def _create(i, be_usage):
-        metric = be_usage.backend.metrics.list()[0]
-        be_usage.backend.mapping_rules.create(rawobj.Mapping(metric, f"/anything/{i}"))
-        be_usage.backend.mapping_rules.create(rawobj.Mapping(metric, f"/anything/{i}", "POST"))
-    return _create
-
-
 @pytest.fixture(scope='module')
 def service_settings(service_settings):
     """
@@ -61,26 +46,15 @@ def service_settings(service_settings):
 
 
 @pytest.fixture(scope='module')
-def services(services, create_mapping_rules):
+def provisioning_spec(provisioning_spec):
     """
     Removes default mapping rule of each product.
-    For each backend creates 20 mapping rules
+    For each backend creates 10 GET and 10 POST mapping rules
     """
-    loop = asyncio.get_event_loop()
-    for svc in services:
-        proxy = svc.proxy.list()
-        proxy.mapping_rules.delete(proxy.mapping_rules.list()[0]["id"])
-    with ThreadPoolExecutor() as pool:
-        for svc in services:
-            proxy = svc.proxy.list()
-            futures = []
-            for be_usage in svc.backend_usages.list():
-                futures += [
-                    loop.run_in_executor(pool, create_mapping_rules, i, be_usage)
-                    for i in range(10)]
-            loop.run_until_complete(asyncio.gather(*futures))
-            proxy.deploy()
-    return services
+    provisioning_spec.delete_default_mapping = True
+    provisioning_spec.mapping_rules = 10
+    provisioning_spec.mapping_methods = ("GET", "POST")
+    return provisioning_spec
 
 
 @pytest.fixture(scope='module')
@@ -0,0 +1,59 @@
+"""
+    Smoke test running the user key benchmark with in-process load generator instead of Hyperfoil.
+    The same template and csv data are used, only the subset of Hyperfoil syntax supported by loadgen.
+"""
+import os
+
+import importlib_resources as resources
+import pytest
+
+from testsuite.loadgen import LoadGenerator, load_benchmark, run_parallel, user_key_rows
+
+pytestmark = [pytest.mark.performance]
+
+
+@pytest.fixture(scope='module')
+def number_of_backends():
+    """Number of created backends for single service (product)"""
+    return 10
+
+
+@pytest.fixture(scope='module')
+def provisioning_spec(provisioning_spec):
+    """
+    Removes default mapping rule of each product.
+    For each backend creates 10 GET and 10 POST mapping rules
+    """
+    provisioning_spec.delete_default_mapping = True
+    provisioning_spec.mapping_rules = 10
+    provisioning_spec.mapping_methods = ("GET", "POST")
+    return provisioning_spec
+
+
+@pytest.fixture(scope='module')
+def load_generator(root_path, applications, promoted_services, testconfig):
+    """Load generator with phases of the template, hosts and csv data"""
+    phases = load_benchmark(os.path.join(root_path, 'smoke/template_user_key_query.hf.yaml'))
+    generator = LoadGenerator(phases, verify=testconfig["ssl_verify"])
+    generator.add_hosts(promoted_services)
+    generator.add_csv('auth_user_key.csv', user_key_rows(applications))
+    generator.add_file(resources.files('testsuite.resources.performance.files').joinpath('message_1kb.txt'))
+    return generator
+
+
+def test_smoke_loadgen_user_key(applications, prod_client, load_generator):
+    """
+        Test checks that application is setup correctly.
+        Runs the benchmark with two processes.
+        Asserts all the requests were successful.
+    """
+    for app in applications:
+        client = prod_client(app, promote=False, redeploy=False)
+        assert client.get("/0/anything/0").status_code == 200
+        assert client.post("/0/anything/0").status_code == 200
+
+    result = run_parallel(load_generator, processes=2)
+
+    assert result.failures == []
+    assert set(result.phases) == {"rampUp", "steadyLoad", "steadyLoadGet"}
+    assert all(stats.requests > 0 for stats in result.phases.values())
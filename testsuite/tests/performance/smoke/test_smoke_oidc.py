@@ -9,7 +9,6 @@ import os
 import backoff
 import pytest
 
-from testsuite import rawobj
 from testsuite.perf_utils import HyperfoilUtils
 from testsuite.rhsso.rhsso import OIDCClientAuthHook
 
@@ -25,13 +24,10 @@ def rhsso_setup(lifecycle_hooks, rhsso_service_info):
 
 
 @pytest.fixture(scope='module')
-def services(services):
-    """Service fixture will add '/' POST mapping rule, so we can make such requests in perf-test"""
-    for svc in services:
-        metric = svc.metrics.list()[0]
-        svc.proxy.list().mapping_rules.create(rawobj.Mapping(metric, "/", "POST"))
-        svc.proxy.deploy()
-    return services
+def provisioning_spec(provisioning_spec):
+    """Services will have '/' POST mapping rule, so we can make such requests in perf-test"""
+    provisioning_spec.proxy_mapping_rules = [("/", "POST")]
+    return provisioning_spec
 
 
 @pytest.fixture(scope='module')
@@ -35,20 +35,3 @@ def service_token(application):
     """
     return application.service.proxy.list().configs.list(
         env="sandbox")[0]["proxy_config"]['content']["backend_authentication_value"]
-
-
-@pytest.fixture(scope="module")
-def prometheus_response_codes_for_metric(prometheus):
-    """
-    Given a prometheus query, returns dict with response
-    codes and counts associated with the response code
-    """
-    def response_codes_for_metric(query):
-        metric_response_codes = prometheus.get_metric(query)
-        response_codes_count = {}
-        for response_code_metric in metric_response_codes:
-            response_codes_count[response_code_metric['metric']['resp_code']] \
-                = response_code_metric['value'][1]
-        return response_codes_count
-
-    return response_codes_for_metric
@@ -9,6 +9,7 @@ import pytest
 import requests
 from packaging.version import Version  # noqa # pylint: disable=unused-import
 
+from testsuite.prometheus_snapshot import assert_delta
 from testsuite.rhsso.rhsso import OIDCClientAuthHook
 from testsuite.utils import blame, randomize
 from testsuite import rawobj, TESTED_VERSION  # noqa # pylint: disable=unused-import
@@ -136,12 +137,12 @@ def auth_request(backend_listener_url):
     return _auth_request
 
 
-def authrep_backend_api_query(request_type):
+def authrep_backend_api_query(request_type, response_code):
     """
     Returns prometheus backend listener enpoint codes
-    query for given request type
+    query for given request type and response code
     """
-    return f"apisonator_listener_response_codes{{request_type=\"{request_type}\"}}"
+    return f"apisonator_listener_response_codes{{request_type=\"{request_type}\",resp_code=\"{response_code}\"}}"
 
 
 @pytest.fixture(scope="module")
@@ -160,8 +161,7 @@ def data(standard_auth, transaction_auth, oauth_params):
     }
 
 
-# pylint: disable=too-many-locals
-def test_authrep(data, prometheus_response_codes_for_metric, auth_request, prometheus):
+def test_authrep(data, auth_request, prometheus):
     """
     Sends NUM_OF_REQUESTS requests returning 2xx response and 403 response
     to each backend-listener authorization endpoint.
@@ -172,10 +172,9 @@ def test_authrep(data, prometheus_response_codes_for_metric, auth_request, prome
 
     # wait to update metrics triggered by previous tests
     prometheus.wait_on_next_scrape("backend-listener")
+    before = prometheus.snapshot(["backend-listener"])
 
-    count_before = {}
     for request_type in data:
-        count_before[request_type] = prometheus_response_codes_for_metric(authrep_backend_api_query(request_type))
         method, endpoint, params = data[request_type]
         for _ in range(NUM_OF_REQUESTS):
             response_2xx, response_403 = auth_request(method, endpoint, params)
@@ -185,19 +184,8 @@ def test_authrep(data, prometheus_response_codes_for_metric, auth_request, prome
 
     # wait for prometheus to collect the metrics
     prometheus.wait_on_next_scrape("backend-listener")
+    after = prometheus.snapshot(["backend-listener"])
 
-    count_after = {}
-    results = {}
-
-    for request_type in data:
-        count_after[request_type] = prometheus_response_codes_for_metric(authrep_backend_api_query(request_type))
-        for response_code in ["2xx", "403"]:
-            results[request_type + response_code] = \
-                response_code in count_after[request_type] and \
-                ((response_code not in count_before[request_type] and
-                  int(count_after[request_type][response_code]) == NUM_OF_REQUESTS) or
-                 int(count_after[request_type][response_code])
-                 - int(count_before[request_type][response_code]) == NUM_OF_REQUESTS)
-
-    for request_type_response_code in results.values():
-        assert request_type_response_code, f"{results}"
+    assert_delta(before, after, {
+        authrep_backend_api_query(request_type, response_code): NUM_OF_REQUESTS
+        for request_type in data for response_code in ["2xx", "403"]})
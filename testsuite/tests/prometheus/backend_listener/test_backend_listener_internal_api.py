@@ -11,6 +11,7 @@ from packaging.version import Version  # noqa # pylint: disable=unused-import
 
 from threescale_api.resources import Service
 from testsuite import TESTED_VERSION  # noqa # pylint: disable=unused-import
+from testsuite.prometheus_snapshot import assert_delta
 
 
 NUM_OF_REQUESTS = 10
@@ -85,12 +86,13 @@ def backend_listener_internal_api_endpoint(backend_listener_url, service, applic
     return _backend_listener_internal_api_endpoint
 
 
-def internal_backend_api_query(request_type):
+def internal_backend_api_query(request_type, response_code):
     """
     Returns prometheus query for the apisonator_listener_internal_api_response_codes metric
-    with the request type passed in the parameters
+    with the request type and response code passed in the parameters
     """
-    return f"apisonator_listener_internal_api_response_codes{{request_type=\"{request_type}\"}}"
+    return f"apisonator_listener_internal_api_response_codes{{request_type=\"{request_type}\"," \
+           f"resp_code=\"{response_code}\"}}"
 
 
 @pytest.fixture(scope="module")
@@ -169,9 +171,7 @@ def data_xfail():
         }
 
 
-# pylint: disable=too-many-locals
-def test_internal_backend_listener(data, prometheus_response_codes_for_metric,
-                                   auth_headers, backend_listener_internal_api_endpoint, prometheus):
+def test_internal_backend_listener(data, auth_headers, backend_listener_internal_api_endpoint, prometheus):
     """
     Sends a number of requests to each backend internal api endpoint.
     Asserts that the metric for the number of requests to the endpoint in prometheus is increased
@@ -181,10 +181,9 @@ def test_internal_backend_listener(data, prometheus_response_codes_for_metric,
     """
     # wait to update metrics triggered by previous tests
     prometheus.wait_on_next_scrape("backend-listener")
+    before = prometheus.snapshot(["backend-listener"])
 
-    count_before = {}
     for request_type in data:
-        count_before[request_type] = prometheus_response_codes_for_metric(internal_backend_api_query(request_type))
         for method, endpoint, response_code in data[request_type]:
             formatted_endpoint = backend_listener_internal_api_endpoint(endpoint)
 
@@ -198,20 +197,9 @@ def test_internal_backend_listener(data, prometheus_response_codes_for_metric,
 
     # wait to update metrics in prometheus
     prometheus.wait_on_next_scrape("backend-listener")
+    after = prometheus.snapshot(["backend-listener"])
 
-    count_after = {}
-    results = {}
-
-    for request_type in data:
-        count_after[request_type] = prometheus_response_codes_for_metric(internal_backend_api_query(request_type))
-        for _, _, response_code in data[request_type]:
-            # assertion is not used here to collect results for all metrics to better investigate potential errors
-            results[request_type+response_code] = \
-                response_code in count_after[request_type] and \
-                ((response_code not in count_before[request_type] and int(count_after[request_type][response_code]) ==
-                  NUM_OF_REQUESTS) or
-                    int(count_after[request_type][response_code]) - int(count_before[request_type][response_code])
-                 == NUM_OF_REQUESTS)
-
-    for request_type_response_code in results.values():
-        assert request_type_response_code, f"{results}"
+    # all the metrics are checked at once to better investigate potential errors
+    assert_delta(before, after, {
+        internal_backend_api_query(request_type, response_code): NUM_OF_REQUESTS
+        for request_type in data for _, _, response_code in data[request_type]})
@@ -0,0 +1,226 @@
+"""
+Timing of requests sent by api clients of the applications
+
+Clients of the applications are instrumented to measure connect, TLS handshake,
+time to first byte and total time of every request. Measurements are tagged
+with the test (and its phase) being executed, endpoint and status code and
+aggregated per test to percentiles which are attached to the junit report.
+xdist workers send their measurements to the controller, which reports the
+summary of the whole session.
+Connect and TLS times are known only for HttpxClient and only for requests
+that opened new connection, requests based HttpClient provides TTFB and total.
+When request ids are enabled (reporting.correlation or latency attribution,
+both off by default) every request gets unique X-Request-Id header
+(unless it has one already) and the same id as Jaeger baggage, so it can be
+found in the gateway logs and traces, see testsuite.correlation.
+"""
+import functools
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from weakget import weakget
+
+from testsuite.config import settings
+from testsuite.jaeger import BAGGAGE_PREFIX
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+PHASES = ("connect", "tls", "ttfb", "total")
+
+# Request extension with the httpcore trace callback
+TRACE = "trace"
+
+REQUEST_ID_HEADER = "X-Request-Id"
+# Baggage item of the request id in Jaeger traces, it is sent in testctx-request-id header
+REQUEST_ID_BAGGAGE = "request-id"
+
+
+# pylint: disable=too-many-instance-attributes,too-few-public-methods
+class RequestTiming:
+    """Timing of single request in seconds, None if the phase didn't happen or isn't known"""
+
+    def __init__(self, nodeid: Optional[str], when: Optional[str], endpoint: Optional[str], method: str,
+                 status: Optional[int]) -> None:
+        self.nodeid = nodeid
+        self.when = when
+        self.endpoint = endpoint
+        self.method = method
+        self.status = status
+        self.request_id: Optional[str] = None
+        # wall clock time the request was sent at, to align it with the gateway logs and traces
+        self.started: Optional[float] = None
+        self.connect: Optional[float] = None
+        self.tls: Optional[float] = None
+        self.ttfb: Optional[float] = None
+        self.total: Optional[float] = None
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    index = max(0, min(len(values) - 1, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def summarize(timings: List[RequestTiming]) -> Dict[str, float]:
+    """Number of requests and p50/p95/max of each phase in milliseconds"""
+    summary: Dict[str, float] = {"requests": len(timings)}
+    for phase in PHASES:
+        values = sorted(getattr(i, phase) for i in timings if getattr(i, phase) is not None)
+        if values:
+            summary[f"{phase}-p50"] = round(percentile(values, 0.5) * 1000, 1)
+            summary[f"{phase}-p95"] = round(percentile(values, 0.95) * 1000, 1)
+            summary[f"{phase}-max"] = round(values[-1] * 1000, 1)
+    return summary
+
+
+class TimingCollector:
+    """
+    Collects timings of requests, current test is set by the pytest hooks
+
+    Usage:
+        app.api_client().get("/")  # client of app instrumented by collector.instrument_application(app)
+        collector.test_summary(item.nodeid)
+    """
+
+    def __init__(self, enabled: bool = True, request_ids: bool = False) -> None:
+        self.enabled = enabled
+        self.request_ids = request_ids
+        self.nodeid: Optional[str] = None
+        self.when: Optional[str] = None
+        self._lock = threading.Lock()
+        self._tests: Dict[str, List[RequestTiming]] = {}
+        self._session: List[RequestTiming] = []
+
+    def enter(self, nodeid: str, when: str):
+        """Requests sent from now on belong to the test phase"""
+        self.nodeid, self.when = nodeid, when
+
+    def record(self, timing: RequestTiming):
+        """Stores single measurement"""
+        with self._lock:
+            self._session.append(timing)
+            if timing.nodeid is not None:
+                self._tests.setdefault(timing.nodeid, []).append(timing)
+
+    def test_summary(self, nodeid: str, when: str = "call") -> Dict[str, float]:
+        """Aggregated timing of requests of the test phase, the test is forgotten afterwards"""
+        with self._lock:
+            timings = self._tests.pop(nodeid, [])
+        timings = [i for i in timings if i.when == when]
+        return summarize(timings) if timings else {}
+
+    def timings(self) -> List[RequestTiming]:
+        """All the measurements of the session"""
+        with self._lock:
+            return list(self._session)
+
+    def export(self) -> List[Dict[str, Any]]:
+        """Measurements of the session as plain dicts, xdist workers send them to the controller"""
+        return [dict(vars(i)) for i in self.timings()]
+
+    def merge(self, timings: List[Dict[str, Any]]):
+        """Adds measurements exported by xdist worker to the session"""
+        merged = []
+        for values in timings:
+            timing = RequestTiming(values["nodeid"], values["when"], values["endpoint"], values["method"],
+                                   values["status"])
+            vars(timing).update(values)
+            merged.append(timing)
+        with self._lock:
+            self._session.extend(merged)
+
+    def session_summary(self) -> Dict[str, Dict[str, float]]:
+        """Aggregated timing of all requests per endpoint"""
+        timings = self.timings()
+        endpoints: Dict[str, List[RequestTiming]] = {}
+        for timing in timings:
+            endpoints.setdefault(timing.endpoint or "unknown", []).append(timing)
+        return {endpoint: summarize(values) for endpoint, values in endpoints.items()}
+
+    def instrument_application(self, application):
+        """Every api client created by the application from now on is instrumented"""
+        # pylint: disable=protected-access
+        factory = application._client_factory
+        if not (self.enabled or self.request_ids) or getattr(factory, "timed", False):
+            return
+
+        def _factory(*args, **kwargs):
+            return self.instrument(factory(*args, **kwargs))
+
+        _factory.timed = True  # type: ignore
+        application._client_factory = _factory
+
+    def instrument(self, client):
+        """Wraps sending of HttpxClient or requests based HttpClient to measure the requests"""
+        # pylint: disable=protected-access
+        endpoint = getattr(client, "_endpoint", None)
+        if hasattr(client, "session"):
+            client.session.send = self._timed_requests(client.session.send, endpoint)
+        elif hasattr(client, "_client"):
+            client._client.send = self._timed_httpx(client._client.send, endpoint)
+        else:
+            log.debug("Unable to measure requests of %s", type(client).__name__)
+        return client
+
+    def _tag(self, timing: RequestTiming, headers):
+        """Sets request id of the request, new unique one is added if it has none"""
+        if self.request_ids and REQUEST_ID_HEADER not in headers:
+            headers[REQUEST_ID_HEADER] = uuid.uuid4().hex
+        timing.request_id = headers.get(REQUEST_ID_HEADER)
+        if self.request_ids and timing.request_id is not None:
+            headers.setdefault(BAGGAGE_PREFIX + REQUEST_ID_BAGGAGE, timing.request_id)
+        timing.started = time.time()
+
+    def _timed_requests(self, send: Callable, endpoint: Optional[str]) -> Callable:
+        @functools.wraps(send)
+        def _send(request, **kwargs):
+            timing = RequestTiming(self.nodeid, self.when, endpoint, request.method, None)
+            self._tag(timing, request.headers)
+            start = time.perf_counter()
+            response = send(request, **kwargs)
+            # requests measure time until the headers are parsed
+            timing.ttfb = response.elapsed.total_seconds()
+            timing.total = time.perf_counter() - start
+            timing.status = response.status_code
+            self.record(timing)
+            return response
+        return _send
+
+    def _timed_httpx(self, send: Callable, endpoint: Optional[str]) -> Callable:
+        @functools.wraps(send)
+        def _send(request, **kwargs):
+            timing = RequestTiming(self.nodeid, self.when, endpoint, request.method, None)
+            self._tag(timing, request.headers)
+            events: List[Tuple[str, float]] = []
+            request.extensions[TRACE] = lambda name, info: events.append((name, time.perf_counter()))
+            start = time.perf_counter()
+            response = send(request, **kwargs)
+            timing.total = time.perf_counter() - start
+            timing.status = response.status_code
+            _apply_trace(timing, start, events)
+            self.record(timing)
+            return response
+        return _send
+
+
+def _apply_trace(timing: RequestTiming, start: float, events: List[Tuple[str, float]]):
+    """Fills connect, tls and ttfb from httpcore trace events"""
+    stamps = dict(events)
+    for name, phase in (("connect_tcp", "connect"), ("start_tls", "tls")):
+        started = stamps.get(f"connection.{name}.started")
+        complete = stamps.get(f"connection.{name}.complete")
+        if started is not None and complete is not None:
+            setattr(timing, phase, complete - started)
+    for name, stamp in events:
+        if name.endswith("receive_response_headers.complete"):
+            timing.ttfb = stamp - start
+            break
+
+
+# pylint: disable=invalid-name
+collector = TimingCollector(weakget(settings)["reporting"]["request_timing"] % True,
+                            weakget(settings)["reporting"]["correlation"] % False
+                            or weakget(settings)["reporting"]["latency_attribution"]["enabled"] % False)
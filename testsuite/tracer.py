@@ -0,0 +1,408 @@
+"""
+Pytest plugin tracing calls to 3scale admin API, OpenShift, RHSSO and toolbox
+
+When enabled, the clients are instrumented at the layer where the calls leave
+the process:
+    3scale api - RestApiClient.request of threescale_api
+    oc - oc_action of openshift-client (everything invoked through oc) and RestOpenShiftClient.request
+    keycloak - public methods of KeycloakAdmin and KeycloakOpenID, sizes from their HTTP connection
+    toolbox - testsuite.toolbox.toolbox.run_cmd
+Every call is attributed to the fixture being set up or the test phase being
+executed, calls made by other threads (e.g. deletion queue) are attributed to
+whatever runs in the main thread. Nested calls of the same kind (e.g. Keycloak
+method calling another one) are counted once as the outermost call.
+
+At the end of the session calls and owners ranked by the total time are
+printed, the full report can be written as json and the timeline of the whole
+session as a speedscope (https://www.speedscope.app) file. xdist workers send
+their spans to the controller, threads of the workers are prefixed by the worker
+id and their times are aligned by the wall clock.
+"""
+import functools
+import inspect
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import pytest
+from weakget import weakget
+
+from testsuite.config import settings
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+ENABLED = weakget(settings)["reporting"]["tracer"]["enabled"] % False
+REPORT_PATH = weakget(settings)["reporting"]["tracer"]["path"] % ""
+SPEEDSCOPE_PATH = weakget(settings)["reporting"]["tracer"]["speedscope"] % ""
+TOP = weakget(settings)["reporting"]["tracer"]["top"] % 20
+
+_ID = re.compile(r"/\d+(?=/|$)")
+
+
+class Span(NamedTuple):
+    """Single traced interval, times are relative to the start of the tracer in seconds"""
+    thread: str
+    category: str
+    name: str
+    owner: str
+    start: float
+    end: float
+    size: int
+
+
+class Tracer:
+    """
+    Records calls and the fixtures and test phases they belong to
+
+    Usage:
+        with tracer.span("oc", "get dc"):
+            ...
+        tracer.report()
+    """
+
+    def __init__(self) -> None:
+        self.origin = time.perf_counter()
+        self.epoch = time.time()
+        self.spans: List[Span] = []
+        self.owner = "session"
+        self._owners: List[str] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> List[Dict[str, Any]]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def enter_owner(self, owner: str):
+        """Calls from now on belong to the owner, e.g. fixture being set up"""
+        self._owners.append(self.owner)
+        self.owner = owner
+
+    def exit_owner(self):
+        """Calls belong to the previous owner again"""
+        self.owner = self._owners.pop() if self._owners else "session"
+
+    def call(self, category: str, name: str, function: Callable, *args, size: Optional[Callable] = None, **kwargs):
+        """Calls the function within span, size(result) is added to the payload size of the span"""
+        stack = self._stack()
+        if any(i["category"] == category for i in stack):
+            return function(*args, **kwargs)
+        frame: Dict[str, Any] = {"category": category, "size": 0}
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+            if size is not None:
+                frame["size"] += size(result)
+            return result
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            self.record(category, name, start, end, frame["size"])
+
+    def add_size(self, size: int):
+        """Adds payload size to the innermost open span of the current thread"""
+        stack = self._stack()
+        if stack:
+            stack[-1]["size"] += size
+
+    def record(self, category: str, name: str, start: float, end: float, size: int = 0):
+        """Stores span with perf_counter times"""
+        span = Span(threading.current_thread().name, category, name, self.owner,
+                    start - self.origin, end - self.origin, size)
+        with self._lock:
+            self.spans.append(span)
+
+    def export(self) -> Dict[str, Any]:
+        """Spans as plain lists with the wall clock time of the origin, xdist workers send them to the controller"""
+        with self._lock:
+            return {"epoch": self.epoch, "spans": [list(i) for i in self.spans]}
+
+    def merge(self, data: Dict[str, Any], worker: str):
+        """Adds spans exported by xdist worker, its threads are prefixed by the worker id"""
+        shift = data["epoch"] - self.epoch
+        spans = [Span(f"{worker} {thread}", category, name, owner, start + shift, end + shift, size)
+                 for thread, category, name, owner, start, end, size in data["spans"]]
+        with self._lock:
+            self.spans.extend(spans)
+
+    def report(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Calls and owners ranked by total time"""
+        calls: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        owners: Dict[str, Dict[str, Any]] = {}
+        for span in self.spans:
+            duration = span.end - span.start
+            if span.category in ("fixture", "test"):
+                owner = owners.setdefault(span.name, {"owner": span.name, "time": 0.0, "runs": 0, "calls": {}})
+                owner["time"] += duration
+                owner["runs"] += 1
+                continue
+            call = calls.setdefault((span.category, span.name), {
+                "category": span.category, "name": span.name, "count": 0, "time": 0.0, "max": 0.0, "bytes": 0})
+            call["count"] += 1
+            call["time"] += duration
+            call["max"] = max(call["max"], duration)
+            call["bytes"] += span.size
+            owner = owners.setdefault(span.owner, {"owner": span.owner, "time": 0.0, "runs": 0, "calls": {}})
+            per_category = owner["calls"].setdefault(span.category, {"count": 0, "time": 0.0, "bytes": 0})
+            per_category["count"] += 1
+            per_category["time"] += duration
+            per_category["bytes"] += span.size
+        for call in calls.values():
+            call["mean"] = call["time"] / call["count"]
+        return {
+            "calls": sorted(calls.values(), key=lambda i: i["time"], reverse=True),
+            "owners": sorted(owners.values(), key=lambda i: sum(c["time"] for c in i["calls"].values()), reverse=True),
+        }
+
+    def speedscope(self) -> Dict[str, Any]:
+        """Evented speedscope profile of every thread"""
+        frames: Dict[str, int] = {}
+        threads: Dict[str, List[Span]] = {}
+        for span in self.spans:
+            threads.setdefault(span.thread, []).append(span)
+        profiles = []
+        for thread, spans in threads.items():
+            events: List[Dict[str, Any]] = []
+            stack: List[Tuple[int, float]] = []
+            for span in sorted(spans, key=lambda i: (i.start, -i.end)):
+                while stack and stack[-1][1] <= span.start:
+                    frame, end = stack.pop()
+                    events.append({"type": "C", "frame": frame, "at": end})
+                # spans of different kinds can overlap by rounding only, child is clamped into its parent
+                end = min(span.end, stack[-1][1]) if stack else span.end
+                frame = frames.setdefault(f"{span.category} {span.name}", len(frames))
+                events.append({"type": "O", "frame": frame, "at": span.start})
+                stack.append((frame, end))
+            while stack:
+                frame, end = stack.pop()
+                events.append({"type": "C", "frame": frame, "at": end})
+            profiles.append({"type": "evented", "name": thread, "unit": "seconds",
+                             "startValue": events[0]["at"], "endValue": events[-1]["at"], "events": events})
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": "3scale tests",
+            "shared": {"frames": [{"name": name} for name in frames]},
+            "profiles": profiles,
+        }
+
+
+tracer = Tracer()  # pylint: disable=invalid-name
+
+
+def _response_size(response) -> int:
+    """Size of request and response bodies"""
+    body = getattr(response.request, "body", None) or b""
+    return len(response.content or b"") + len(body)
+
+
+def _api_name(client, method="GET", url=None, path="", *_, **__) -> str:  # pylint: disable=keyword-arg-before-vararg
+    full_url = url if url else urljoin(client.url, path)
+    path = urlparse(full_url).path
+    path = path[:-len(".json")] if path.endswith(".json") else path
+    return f"{method} {_ID.sub('/{id}', path)}"
+
+
+def _oc_name(_context, verb, cmd_args=None, *_, **__) -> str:  # pylint: disable=keyword-arg-before-vararg
+    for arg in cmd_args or []:
+        if isinstance(arg, str) and arg and not arg.startswith("-"):
+            return f"{verb} {arg.split('/')[0]}"
+    return verb
+
+
+def _rest_name(_client, method, url, *_, **__) -> str:
+    """Kind and subresource of the API server url, names of the resources are left out"""
+    segments = urlparse(url).path.strip("/").split("/")
+    if "namespaces" in segments:
+        rest = segments[segments.index("namespaces") + 2:]
+        return f"{method} {'/'.join(rest[:1] + rest[2:3])}" if rest else f"{method} namespace"
+    return f"{method} {segments[-1]}"
+
+
+def _toolbox_name(cmd_input, *_, **__) -> str:
+    command = cmd_input if isinstance(cmd_input, str) else next(iter(cmd_input), "")
+    return f"run_cmd {command.split()[0]}" if command.split() else "run_cmd"
+
+
+class Instrumentation:
+    """Replaced functions, so they can be restored"""
+
+    def __init__(self) -> None:
+        self.patched: List[Tuple[Any, str, Any]] = []
+
+    def patch(self, owner, attribute: str, category: str, name: Callable[..., str],
+              size: Optional[Callable[[Any], int]] = None):
+        """Replaces function by its traced version"""
+        original = getattr(owner, attribute)
+
+        @functools.wraps(original)
+        def _traced(*args, **kwargs):
+            return tracer.call(category, name(*args, **kwargs), original, *args, size=size, **kwargs)
+
+        setattr(owner, attribute, _traced)
+        self.patched.append((owner, attribute, original))
+
+    def patch_sizes(self, owner, attribute: str):
+        """Replaces function returning response, so its size is added to the open span"""
+        original = getattr(owner, attribute)
+
+        @functools.wraps(original)
+        def _sized(*args, **kwargs):
+            response = original(*args, **kwargs)
+            tracer.add_size(_response_size(response))
+            return response
+
+        setattr(owner, attribute, _sized)
+        self.patched.append((owner, attribute, original))
+
+    def restore(self):
+        """Puts the original functions back"""
+        for owner, attribute, original in reversed(self.patched):
+            setattr(owner, attribute, original)
+        self.patched.clear()
+
+    def install(self):
+        """Instruments all the supported clients"""
+        # pylint: disable=import-outside-toplevel
+        from threescale_api.client import RestApiClient
+        from keycloak import KeycloakAdmin, KeycloakOpenID
+        from keycloak.connection import ConnectionManager
+        import openshift.action
+
+        from testsuite.openshift.rest import RestOpenShiftClient
+
+        self.patch(RestApiClient, "request", "3scale api", _api_name, _response_size)
+        self.patch(RestOpenShiftClient, "request", "oc", _rest_name, _response_size)
+
+        # oc_action is imported by name to the modules of openshift-client
+        oc_action = openshift.action.oc_action
+        for module in [i for name, i in sys.modules.items() if name == "openshift" or name.startswith("openshift.")]:
+            if getattr(module, "oc_action", None) is oc_action:
+                self.patch(module, "oc_action", "oc", _oc_name,
+                           lambda action: len(action.out or "") + len(action.err or ""))
+
+        for cls in (KeycloakAdmin, KeycloakOpenID):
+            for attribute, value in list(vars(cls).items()):
+                if inspect.isfunction(value) and not attribute.startswith("_"):
+                    self.patch(cls, attribute, "keycloak", lambda *_, _name=attribute, **__: _name)
+        for method in ("raw_get", "raw_post", "raw_put", "raw_delete"):
+            self.patch_sizes(ConnectionManager, method)
+
+        try:
+            from testsuite.toolbox import toolbox
+        except ImportError as error:
+            log.debug("Toolbox calls are not traced: %s", error)
+        else:
+            self.patch(toolbox, "run_cmd", "toolbox", _toolbox_name,
+                       lambda result: len(json.dumps(result, default=str)))
+
+
+instrumentation = Instrumentation()  # pylint: disable=invalid-name
+
+
+def pytest_configure(config):  # pylint: disable=unused-argument
+    """Instruments the clients"""
+    if ENABLED:
+        instrumentation.install()
+
+
+def pytest_unconfigure(config):  # pylint: disable=unused-argument
+    """Restores the clients"""
+    instrumentation.restore()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_fixture_setup(fixturedef):
+    """Calls made while the fixture is set up belong to it"""
+    if not ENABLED:
+        yield
+        return
+    name = f"{fixturedef.argname} ({fixturedef.scope})"
+    tracer.enter_owner(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.record("fixture", name, start, time.perf_counter())
+        tracer.exit_owner()
+
+
+def _phase(item, when: str):
+    if not ENABLED:
+        yield
+        return
+    name = f"{item.nodeid} [{when}]"
+    tracer.enter_owner(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.record("test", name, start, time.perf_counter())
+        tracer.exit_owner()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_setup(item):
+    """Calls made in setup outside of fixtures belong to the test setup"""
+    yield from _phase(item, "setup")
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    """Calls made by the test itself"""
+    yield from _phase(item, "call")
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_teardown(item):
+    """Calls made by finalizers belong to the test teardown"""
+    yield from _phase(item, "teardown")
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_sessionfinish(session):
+    """xdist workers send the spans to the controller"""
+    if ENABLED and hasattr(session.config, "workerinput"):
+        session.config.workeroutput["tracer"] = tracer.export()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):  # pylint: disable=unused-argument
+    """Collects spans of the finished xdist worker"""
+    data = getattr(node, "workeroutput", {}).get("tracer")
+    if data is not None:
+        tracer.merge(data, node.gateway.id)
+
+
+def _format(owner: Dict[str, Any]) -> str:
+    calls = ", ".join(f"{category} {value['count']}x {value['time']:.1f}s"
+                      for category, value in sorted(owner["calls"].items()))
+    return f"{owner['owner']}: {calls}" + (f" (wall {owner['time']:.1f}s)" if owner["runs"] else "")
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Prints the most expensive calls and owners and writes the report and trace files"""
+    if not ENABLED or not tracer.spans:
+        return
+    report = tracer.report()
+    if REPORT_PATH:
+        with open(REPORT_PATH, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if SPEEDSCOPE_PATH:
+        with open(SPEEDSCOPE_PATH, "w", encoding="utf-8") as file:
+            json.dump(tracer.speedscope(), file)
+
+    terminalreporter.section("traced calls")
+    for call in report["calls"][:TOP]:
+        terminalreporter.write_line(
+            f"{call['time']:8.1f}s {call['count']:6}x mean {call['mean'] * 1000:7.1f}ms "
+            f"max {call['max'] * 1000:7.1f}ms {call['bytes'] / 1024:9.1f}KiB  {call['category']} {call['name']}")
+    terminalreporter.write_line("")
+    for owner in [i for i in report["owners"] if i["calls"]][:TOP]:
+        terminalreporter.write_line(_format(owner))
@@ -0,0 +1,167 @@
+"""
+Pytest plugin scheduling wait-heavy test modules first across xdist workers
+
+Many modules spend most of their time in fixed waits (batcher report interval,
+rate limit windows, Prometheus scrapes), default xdist load balancing doesn't
+know about them and a wait-heavy module picked late makes the long tail of the
+run. With --wait-aware the tests are distributed by modules (like --dist
+loadfile) and the modules are handed out by their expected wait, the longest
+first, so the waits of different modules run at the same time on different
+workers. Modules aligned to the minute boundary (wait_until_next_minute(),
+wait_interval()) are dispatched together before everything else, so their
+waits share the same minute windows instead of each module waiting for its own.
+
+Expected wait of a module is detected from its source: time.sleep() with a
+constant argument (or module level constant expression) and the wait helpers
+of testsuite.utils and PrometheusClient. It can be set explicitly by the
+module marker, which takes precedence over the detection:
+    pytestmark = [pytest.mark.waits(120, minute_aligned=True)]
+"""
+import ast
+import functools
+import logging
+import operator
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+import pytest
+from xdist.scheduler import LoadFileScheduling
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# Expected duration in seconds of the wait helpers and whether they are aligned to the minute
+WAIT_CALLS = {
+    "wait_interval": (8, True),
+    "wait_until_next_minute": (40, True),
+    "wait_interval_hour": (0, False),
+    "wait_on_next_scrape": (32, False),
+}
+# Expected duration of sleep with argument that can't be evaluated statically
+UNKNOWN_SLEEP = 5
+
+_OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+
+
+class WaitProfile(NamedTuple):
+    """Expected time the module spends waiting in seconds and number of minute aligned waits"""
+    seconds: float
+    minute_aligned: int
+
+
+def _evaluate(node: ast.AST, constants: Dict[str, float]) -> Optional[float]:
+    """Value of numeric constant expression, None if it can't be evaluated statically"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return float(node.value)
+    if isinstance(node, ast.Name):
+        return constants.get(node.id)
+    if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+        left, right = _evaluate(node.left, constants), _evaluate(node.right, constants)
+        if left is None or right is None or (isinstance(node.op, ast.Div) and right == 0):
+            return None
+        return _OPERATORS[type(node.op)](left, right)
+    return None
+
+
+def _called(node: ast.Call) -> str:
+    function = node.func
+    if isinstance(function, ast.Attribute):
+        return function.attr
+    if isinstance(function, ast.Name):
+        return function.id
+    return ""
+
+
+def _marker(node: ast.Call) -> Optional[WaitProfile]:
+    """Profile of pytest.mark.waits(seconds, minute_aligned=False) call"""
+    function = node.func
+    if not (isinstance(function, ast.Attribute) and function.attr == "waits"
+            and isinstance(function.value, ast.Attribute) and function.value.attr == "mark"):
+        return None
+    seconds = _evaluate(node.args[0], {}) if node.args else None
+    aligned = any(i.arg == "minute_aligned" and isinstance(i.value, ast.Constant) and i.value.value
+                  for i in node.keywords)
+    return WaitProfile(seconds or 0.0, int(aligned))
+
+
+def analyze(source: str) -> WaitProfile:
+    """Expected waits of the module source, markers take precedence over the detected calls"""
+    tree = ast.parse(source)
+    constants: Dict[str, float] = {}
+    for statement in tree.body:
+        if isinstance(statement, ast.Assign) and len(statement.targets) == 1 \
+                and isinstance(statement.targets[0], ast.Name):
+            value = _evaluate(statement.value, constants)
+            if value is not None:
+                constants[statement.targets[0].id] = value
+
+    seconds, aligned = 0.0, 0
+    markers = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        marker = _marker(node)
+        if marker is not None:
+            markers.append(marker)
+            continue
+        name = _called(node)
+        if name == "sleep" and node.args:
+            value = _evaluate(node.args[0], constants)
+            seconds += UNKNOWN_SLEEP if value is None else value
+        elif name in WAIT_CALLS:
+            duration, minute = WAIT_CALLS[name]
+            seconds += duration
+            aligned += minute
+    if markers:
+        return WaitProfile(sum(i.seconds for i in markers), sum(i.minute_aligned for i in markers))
+    return WaitProfile(seconds, aligned)
+
+
+@functools.lru_cache(maxsize=None)
+def wait_profile(path: Path) -> WaitProfile:
+    """Expected waits of the test module, modules that can't be read or parsed don't wait"""
+    try:
+        return analyze(path.read_text(encoding="utf-8"))
+    except (OSError, SyntaxError, ValueError) as error:
+        log.debug("Unable to analyze waits of %s: %s", path, error)
+        return WaitProfile(0.0, 0)
+
+
+class WaitAwareScheduling(LoadFileScheduling):  # pylint: disable=abstract-method
+    """
+    Distributes modules to the workers, minute aligned modules first, then the longest waits first
+    Relies on the work queue of LoadScopeScheduling, every unit is moved to its front before assigning.
+    """
+
+    def __init__(self, config, log=None):  # pylint: disable=redefined-outer-name
+        super().__init__(config, log)
+        self.rootpath = Path(config.rootpath)
+
+    def profile(self, scope: str) -> WaitProfile:
+        """Expected waits of the module of the work unit"""
+        return wait_profile(self.rootpath / scope)
+
+    def _priority(self, scope: str):
+        profile = self.profile(scope)
+        return profile.minute_aligned > 0, profile.seconds
+
+    def _next_scope(self, node) -> Optional[str]:  # pylint: disable=unused-argument
+        """Work unit the node gets next, None to leave the node without new work"""
+        return max(self.workqueue, key=self._priority)
+
+    def _assign_work_unit(self, node):
+        scope = self._next_scope(node)
+        if scope is None:
+            return
+        self.workqueue.move_to_end(scope, last=False)
+        profile = self.profile(scope)
+        if profile.seconds:
+            self.log(f"Assigning {scope} expected to wait {profile.seconds:.0f}s to {node.gateway.id}")
+        super()._assign_work_unit(node)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_make_scheduler(config, log):  # pylint: disable=redefined-outer-name
+    """Wait aware scheduler when --wait-aware is set"""
+    if not config.getoption("--wait-aware", default=False):
+        return None
+    return WaitAwareScheduling(config, log)